@@ -16,8 +16,10 @@ It can be used to perform manual administrative actions as the bot, or to test J
 """
 
 import asyncio
+import contextlib
 import logging
 import sys
+import time
 import typing
 import uuid
 
@@ -25,6 +27,8 @@ import click
 import discord
 from discord.ext import commands
 
+from jishaku.profiling import ImportProfiler, ImportRecord, format_load_profile
+
 LOG_FORMAT: logging.Formatter = logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s')
 LOG_STREAM: logging.Handler = logging.StreamHandler(stream=sys.stdout)
 LOG_STREAM.setFormatter(LOG_FORMAT)
@@ -39,13 +43,22 @@ async def entry(bot: commands.Bot, *args: typing.Any, **kwargs: typing.Any):
 
     LOGGER.critical("Beginning async context")
     async with bot:
-        LOGGER.critical("Loading jishaku")
-        await bot.load_extension('jishaku')
+        profiler = ImportProfiler() if bot.profile_imports else None  # type: ignore
+        loads: typing.List[typing.Tuple[str, float, typing.Optional[ImportRecord]]] = []
 
-        for extension in bot.extensions_to_load:  # type: ignore
+        for extension in ('jishaku', *bot.extensions_to_load):  # type: ignore
             extension: str
             LOGGER.critical("Loading %s", extension)
-            await bot.load_extension(extension)
+
+            start = time.perf_counter()
+
+            with profiler or contextlib.nullcontext():
+                await bot.load_extension(extension)
+
+            loads.append((extension, time.perf_counter() - start, profiler.find(extension) if profiler else None))
+
+        if profiler is not None:
+            LOGGER.critical("Extension load profile:\n%s", format_load_profile(loads, profiler.roots))
 
         LOGGER.critical(
             'Generated a unique UUID for this session: %s'
@@ -89,13 +102,15 @@ async def entry(bot: commands.Bot, *args: typing.Any, **kwargs: typing.Any):
 @click.option('--log-file', '-l', default=None)
 @click.option('--load-extension', '-e', multiple=True)
 @click.option('--skip-wait', '-s', default=False, is_flag=True)
+@click.option('--profile-imports', '-p', default=False, is_flag=True)
 def entrypoint(
     intents: typing.Iterable[str],
     token: str,
     log_level: str,
     log_file: typing.Optional[str] = None,
     load_extension: typing.Iterable[str] = (),
-    skip_wait: bool = False
+    skip_wait: bool = False,
+    profile_imports: bool = False
 ):
     """
     Entrypoint accessible through `python -m jishaku <TOKEN>`
@@ -106,6 +121,8 @@ def entrypoint(
     Arguments are applied in order.
     You can also set log level and output to a file:
         -m jishaku --log-level INFO --log-file bot.log -- +all <TOKEN>
+    To log how long each extension takes to import and set up:
+        -m jishaku --profile-imports -e cogs.example -- +all <TOKEN>
     """
 
     logger = logging.getLogger()
@@ -167,6 +184,7 @@ def entrypoint(
     bot.unique_id = str(uuid.uuid4())  # type: ignore
     bot.extensions_to_load = load_extension  # type: ignore
     bot.skip_wait = skip_wait  # type: ignore
+    bot.profile_imports = profile_imports  # type: ignore
 
     asyncio.run(entry(bot, token))
 
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.budget
+~~~~~~~~~~~~~~
+
+Resource budgets for jishaku command-tasks, and the supervisor that enforces them.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import time
+import typing
+
+from jishaku.flags import Flags
+from jishaku.math import natural_size
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+__all__ = ('TaskBudget', 'ResourceSample', 'sample_resources', 'budget_exceeded', 'TaskSupervisor')
+
+
+class TaskBudget(typing.NamedTuple):
+    """
+    The limits a command-task is allowed to reach before it is cancelled. A limit of 0 means no limit.
+
+    ``cpu_time`` is in seconds of CPU time used by the whole process since the task started,
+    and ``memory`` is in bytes of resident memory the process grew by since the task started.
+    As neither can be attributed to a single asyncio task, tasks running at the same time are charged for each other's use.
+    """
+
+    timeout: float = 0.0
+    cpu_time: float = 0.0
+    memory: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.timeout or self.cpu_time or self.memory)
+
+    @classmethod
+    def from_flags(cls) -> 'TaskBudget':
+        """
+        Creates a budget from the JISHAKU_TASK_TIMEOUT, JISHAKU_TASK_CPU_LIMIT and JISHAKU_TASK_MEMORY_LIMIT flags.
+        """
+
+        return cls(
+            timeout=float(Flags.TASK_TIMEOUT),
+            cpu_time=float(Flags.TASK_CPU_LIMIT),
+            memory=Flags.TASK_MEMORY_LIMIT * 1024 * 1024,
+        )
+
+
+class ResourceSample(typing.NamedTuple):
+    """
+    The CPU time and resident memory of this process at a point in time.
+
+    ``rss`` is None when psutil isn't installed.
+    """
+
+    cpu_time: float
+    rss: typing.Optional[int]
+
+
+def sample_resources() -> ResourceSample:
+    """
+    Samples the CPU time and resident memory of this process.
+    """
+
+    return ResourceSample(time.process_time(), psutil.Process().memory_info().rss if psutil else None)
+
+
+def budget_exceeded(
+    budget: TaskBudget,
+    elapsed: float,
+    baseline: ResourceSample,
+    sample: ResourceSample
+) -> typing.Optional[str]:
+    """
+    Returns which limit of a budget was exceeded, given how long a task has been running,
+    and samples from when it started and from now. Returns None if no limit was exceeded.
+
+    The memory limit is ignored when either sample lacks a resident memory size.
+    """
+
+    if budget.timeout and elapsed > budget.timeout:
+        return f"timeout of {budget.timeout:g}s (ran for {elapsed:.2f}s)"
+
+    cpu_time = sample.cpu_time - baseline.cpu_time
+
+    if budget.cpu_time and cpu_time > budget.cpu_time:
+        return f"CPU time limit of {budget.cpu_time:g}s (used {cpu_time:.2f}s)"
+
+    if budget.memory and sample.rss is not None and baseline.rss is not None:
+        growth = sample.rss - baseline.rss
+
+        if growth > budget.memory:
+            return f"memory growth limit of {natural_size(budget.memory)} (grew by {natural_size(growth)})"
+
+    return None
+
+
+class TaskSupervisor:
+    """
+    Periodically checks the budgeted command-tasks in a task registry, cancelling any that exceed their budget.
+
+    The supervisor only runs while there are budgeted tasks, so it should be started again whenever one is submitted.
+    A task that blocks the event loop can't be checked or cancelled until it yields back to it.
+
+    Parameters
+    -----------
+    tasks: Dict[int, CommandTask]
+        The registry of running command-tasks. Cancelled tasks are removed from it.
+    on_exceeded: Callable[[CommandTask, str], Awaitable[Any]]
+        Called with each cancelled task and a description of the limit it exceeded.
+        Each call is run in a task of its own, so a slow report doesn't hold up checking the other tasks.
+    interval: float
+        How often to check tasks, in seconds.
+    """
+
+    def __init__(
+        self,
+        tasks: typing.Dict[int, typing.Any],
+        on_exceeded: typing.Callable[[typing.Any, str], typing.Awaitable[typing.Any]],
+        interval: float = 1.0
+    ):
+        self.tasks = tasks
+        self.on_exceeded = on_exceeded
+        self.interval = interval
+        self.task: typing.Optional['asyncio.Task[None]'] = None
+        # Reports in progress, kept so they aren't garbage collected before they finish
+        self.reports: typing.Set['asyncio.Task[typing.Any]'] = set()
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the supervisor is currently checking tasks.
+        """
+
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        """
+        Starts supervising tasks, if not already doing so. Must be called with an event loop running.
+        """
+
+        if not self.running:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self):
+        """
+        Stops supervising tasks. Tasks that are already running are left alone.
+        """
+
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def check(self) -> typing.List[typing.Tuple[typing.Any, str]]:
+        """
+        Checks every budgeted task once, cancelling and removing those over budget.
+
+        Returns each cancelled task along with the limit it exceeded.
+        """
+
+        sample = sample_resources()
+        exceeded: typing.List[typing.Tuple[typing.Any, str]] = []
+
+        for cmdtask in list(self.tasks.values()):
+            if not cmdtask.budget:
+                continue
+
+            reason = budget_exceeded(cmdtask.budget, cmdtask.elapsed, cmdtask.baseline, sample)
+
+            if reason is None:
+                continue
+
+            self.tasks.pop(cmdtask.index, None)
+
+            if cmdtask.task:
+                cmdtask.task.cancel()
+
+            exceeded.append((cmdtask, reason))
+
+        return exceeded
+
+    async def run(self):
+        """
+        Checks tasks every interval until no budgeted tasks remain.
+        """
+
+        while any(cmdtask.budget for cmdtask in self.tasks.values()):
+            await asyncio.sleep(self.interval)
+
+            for cmdtask, reason in self.check():
+                report = asyncio.get_running_loop().create_task(self.on_exceeded(cmdtask, reason))
+                self.reports.add(report)
+                report.add_done_callback(self.reports.discard)
@@ -20,7 +20,11 @@ from jishaku.features.baseclass import Feature
 from jishaku.features.filesystem import FilesystemFeature
 from jishaku.features.guild import GuildFeature
 from jishaku.features.invocation import InvocationFeature
+from jishaku.features.latency import LatencyFeature
 from jishaku.features.management import ManagementFeature
+from jishaku.features.memory import MemoryFeature
+from jishaku.features.metrics import MetricsFeature
+from jishaku.features.profiling import ProfilingFeature
 from jishaku.features.python import PythonFeature
 from jishaku.features.root_command import RootCommand
 from jishaku.features.shell import ShellFeature
@@ -34,7 +38,11 @@ __all__ = (
     "setup",
 )
 
-STANDARD_FEATURES = (VoiceFeature, GuildFeature, FilesystemFeature, InvocationFeature, ShellFeature, SQLFeature, PythonFeature, ManagementFeature, RootCommand)
+STANDARD_FEATURES = (
+    VoiceFeature, GuildFeature, FilesystemFeature, InvocationFeature, ShellFeature, SQLFeature, PythonFeature,
+    ProfilingFeature, MemoryFeature, MetricsFeature, LatencyFeature, ManagementFeature,
+    RootCommand
+)
 
 OPTIONAL_FEATURES: typing.List[typing.Type[Feature]] = []
 
@@ -14,12 +14,15 @@ The base Feature class that serves as the superclass of all feature components.
 import asyncio
 import collections
 import contextlib
+import time
 import typing
 from datetime import datetime, timezone
 
+import discord
 from discord.ext import commands
 from typing_extensions import Concatenate, ParamSpec
 
+from jishaku.budget import ResourceSample, TaskBudget, TaskSupervisor, sample_resources
 from jishaku.types import BotT, ContextA
 
 __all__ = (
@@ -55,11 +58,27 @@ GenericFeature = typing.TypeVar('GenericFeature', bound='Feature')
 class CommandTask(typing.NamedTuple):
     """
     A running Jishaku task, wrapping asyncio.Task
+
+    ``started_at`` is a :func:`time.monotonic` reading, and ``resources`` holds anything the task
+    has acquired that's worth showing in the task list, such as a subprocess ID.
+    ``baseline`` is the process' resource use when the task started, which ``budget`` is measured from.
     """
 
     index: int  # type: ignore
     ctx: ContextA
     task: typing.Optional['asyncio.Task[typing.Any]']
+    started_at: float
+    resources: typing.Dict[str, typing.Any]
+    budget: TaskBudget
+    baseline: ResourceSample
+
+    @property
+    def elapsed(self) -> float:
+        """
+        How long this task has been running for, in seconds.
+        """
+
+        return time.monotonic() - self.started_at
 
 
 class Feature(commands.Cog):
@@ -141,8 +160,10 @@ class Feature(commands.Cog):
     def __init__(self, *args: typing.Any, **kwargs: typing.Any):
         self.bot: BotT = kwargs.pop('bot')
         self.start_time: datetime = datetime.now(timezone.utc)
-        self.tasks: typing.Deque[CommandTask] = collections.deque()
+        # Running tasks by index, in submission order
+        self.tasks: typing.OrderedDict[int, CommandTask] = collections.OrderedDict()
         self.task_count: int = 0
+        self.task_supervisor: TaskSupervisor = TaskSupervisor(self.tasks, self.report_budget_exceeded)
 
         # Generate and attach commands
         command_lookup: typing.Dict[str, Feature.Command['Feature', typing.Any, typing.Any]] = {}
@@ -217,16 +238,34 @@ class Feature(commands.Cog):
             raise commands.NotOwner("You must own this bot to use Jishaku.")
         return True
 
+    def cog_unload(self):  # pylint: disable=invalid-overridden-method
+        self.task_supervisor.stop()
+        return super().cog_unload()
+
+    async def report_budget_exceeded(self, cmdtask: CommandTask, reason: str):
+        """
+        Tells the invoker of a command-task that it was cancelled for exceeding its budget.
+        """
+
+        name = f"`{cmdtask.ctx.command.qualified_name}`" if cmdtask.ctx.command else "unknown"
+
+        with contextlib.suppress(discord.HTTPException):
+            await cmdtask.ctx.send(f"Cancelled task {cmdtask.index}: {name}, as it exceeded its {reason}.")
+
     @contextlib.contextmanager
-    def submit(self, ctx: ContextA):
+    def submit(self, ctx: ContextA, budget: typing.Optional[TaskBudget] = None):
         """
         A context-manager that submits the current task to jishaku's task list
         and removes it afterwards.
 
+        If the task has a budget, it is cancelled by the task supervisor when it exceeds it.
+
         Parameters
         -----------
         ctx: commands.Context
             A Context object used to derive information about this command task.
+        budget: Optional[TaskBudget]
+            The limits this task is allowed to reach. Defaults to the limits set by flags.
         """
 
         self.task_count += 1
@@ -240,12 +279,18 @@ class Feature(commands.Cog):
             #  asyncio.Task.current_task() would have just returned None in this case.
             current_task = None
 
-        cmdtask = CommandTask(self.task_count, ctx, current_task)
+        budget = TaskBudget.from_flags() if budget is None else budget
+        # Sampling isn't free, so unbudgeted tasks skip it
+        baseline = sample_resources() if budget else ResourceSample(0.0, None)
+        cmdtask = CommandTask(self.task_count, ctx, current_task, time.monotonic(), {}, budget, baseline)
+
+        self.tasks[cmdtask.index] = cmdtask
 
-        self.tasks.append(cmdtask)
+        # The supervisor needs a running loop, which there always is when there's a current task
+        if budget and current_task is not None:
+            self.task_supervisor.start()
 
         try:
             yield cmdtask
         finally:
-            if cmdtask in self.tasks:
-                self.tasks.remove(cmdtask)
+            self.tasks.pop(cmdtask.index, None)
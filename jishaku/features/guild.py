@@ -11,11 +11,22 @@ The jishaku guild-related commands.
 
 """
 
+import csv
+import gzip
+import io
+import json
+import os
+import time
 import typing
 
 import discord
+from discord.ext import commands
 
+from jishaku.exception_handling import ReplResponseReactor
 from jishaku.features.baseclass import Feature
+from jishaku.flags import Flags
+from jishaku.functools import executor_function
+from jishaku.permissions import PermissionIndex, PermissionResolver, audit_permissions
 from jishaku.types import ContextA
 
 T = typing.TypeVar('T')
@@ -26,34 +37,87 @@ class GuildFeature(Feature):
     Feature containing the guild-related commands
     """
 
-    @staticmethod
-    def apply_overwrites(
-        permissions: typing.Dict[str, typing.Tuple[bool, str]],
-        allow: int,
-        deny: int,
-        name: str
-    ):
+    def __init__(self, *args: typing.Any, **kwargs: typing.Any):
+        super().__init__(*args, **kwargs)
+        # Always kept up to date by the listeners below, but only used when Flags.PERMISSION_INDEX is set
+        self.permission_index: PermissionIndex = PermissionIndex()
+
+    @property
+    def active_permission_index(self) -> typing.Optional[PermissionIndex]:
         """
-        Applies overwrites to the permissions dictionary (see permtrace),
-        based on an allow and deny mask.
+        The permission index, if caching permission results is enabled.
         """
 
-        allow_p: discord.Permissions = discord.Permissions(allow)
-        deny_p: discord.Permissions = discord.Permissions(deny)
+        return self.permission_index if Flags.PERMISSION_INDEX else None
 
-        # Denies first..
-        for key, value in dict(deny_p).items():
-            # Check that this is denied and it is not already denied
-            # (we want to show the lowest-level reason for the denial)
-            if value and permissions[key][0]:
-                permissions[key] = (False, f"it is the channel's {name} overwrite")
+    @Feature.listener('on_guild_role_create')
+    @Feature.listener('on_guild_role_delete')
+    async def jsk_permission_index_role_change(self, role: discord.Role):
+        """
+        Drops cached permissions for a guild when a role is created or deleted.
+        """
+
+        self.permission_index.invalidate(role.guild.id)
+
+    @Feature.listener('on_guild_role_update')
+    async def jsk_permission_index_role_update(self, before: discord.Role, after: discord.Role):
+        """
+        Drops cached permissions for a guild when the permissions or position of one of its roles change.
+        """
+
+        if before.permissions != after.permissions or before.position != after.position or before.name != after.name:
+            self.permission_index.invalidate(after.guild.id)
+
+    @Feature.listener('on_guild_channel_update')
+    async def jsk_permission_index_channel_update(self, _before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        """
+        Drops cached permissions for a channel when it is updated.
+        """
+
+        self.permission_index.invalidate(after.guild.id, after.id)
+
+    @Feature.listener('on_guild_channel_delete')
+    async def jsk_permission_index_channel_delete(self, channel: discord.abc.GuildChannel):
+        """
+        Drops cached permissions for a channel when it is deleted.
+        """
+
+        self.permission_index.invalidate(channel.guild.id, channel.id)
+
+    @Feature.listener('on_guild_update')
+    async def jsk_permission_index_guild_update(self, before: discord.Guild, after: discord.Guild):
+        """
+        Drops cached permissions for a guild when its ownership changes.
+        """
+
+        if before.owner_id != after.owner_id:
+            self.permission_index.invalidate(after.id)
+
+    @Feature.listener('on_guild_remove')
+    async def jsk_permission_index_guild_remove(self, guild: discord.Guild):
+        """
+        Drops cached permissions for a guild the bot has left.
+        """
+
+        self.permission_index.invalidate(guild.id)
+
+    @Feature.listener('on_member_update')
+    async def jsk_permission_index_member_update(self, before: discord.Member, after: discord.Member):
+        """
+        Drops the cached member groups of a guild when a member's roles change.
+        """
+
+        if before._roles != after._roles:  # pylint: disable=protected-access
+            self.permission_index.invalidate_members(after.guild.id)
+
+    @Feature.listener('on_member_join')
+    @Feature.listener('on_member_remove')
+    async def jsk_permission_index_member_change(self, member: discord.Member):
+        """
+        Drops the cached member groups of a guild when a member joins or leaves.
+        """
 
-        # Then allows
-        for key, value in dict(allow_p).items():
-            # Check that this is allowed and it is not already allowed
-            # (we want to show the lowest-level reason for the allowance)
-            if value and not permissions[key][0]:
-                permissions[key] = (True, f"it is the channel's {name} overwrite")
+        self.permission_index.invalidate_members(member.guild.id)
 
     @staticmethod
     def chunks(array: typing.List[T], chunk_size: int) -> typing.Generator[typing.List[T], None, None]:
@@ -78,91 +142,18 @@ class GuildFeature(Feature):
         It calculates permissions the same way Discord does, while keeping track of the source.
         """
 
-        member_ids = {target.id: target for target in targets if isinstance(target, discord.Member)}
-        roles: typing.List[discord.Role] = []
+        members = {target.id: target.mention for target in targets if isinstance(target, discord.Member)}
+        role_ids: typing.Set[int] = set()
 
         for target in targets:
             if isinstance(target, discord.Member):
-                roles.extend(list(target.roles))
+                role_ids.update(role.id for role in target.roles)
             else:
-                roles.append(target)
-
-        # Remove duplicates
-        roles = list(set(roles))
-
-        # Dictionary to store the current permission state and reason
-        # Stores <perm name>: (<perm allowed>, <reason>)
-        permissions: typing.Dict[str, typing.Tuple[bool, str]] = {}
-
-        if member_ids and channel.guild.owner_id in member_ids:
-            # Is owner, has all perms
-            for key in dict(discord.Permissions.all()).keys():
-                permissions[key] = (True, f"<@{channel.guild.owner_id}> owns the server")
-        else:
-            # Otherwise, either not a member or not the guild owner, calculate perms manually
-            is_administrator = False
-
-            # Handle guild-level perms first
-            for key, value in dict(channel.guild.default_role.permissions).items():
-                permissions[key] = (value, "it is the server-wide @everyone permission")
-
-            for role in roles:
-                for key, value in dict(role.permissions).items():
-                    # Roles can only ever allow permissions
-                    # Denying a permission does nothing if a lower role allows it
-                    if value and not permissions[key][0]:
-                        permissions[key] = (value, f"it is the server-wide {role.name} permission")
-
-                # Then administrator handling
-                if role.permissions.administrator:
-                    is_administrator = True
-
-                    for key in dict(discord.Permissions.all()).keys():
-                        if not permissions[key][0]:
-                            permissions[key] = (True, f"it is granted by Administrator on the server-wide {role.name} permission")
-
-            # If Administrator was granted, there is no reason to even do channel permissions
-            if not is_administrator:
-                # Now channel-level permissions
-
-                # Special case for @everyone
-                # pylint: disable=protected-access
-                try:
-                    maybe_everyone = channel._overwrites[0]  # type: ignore
-                    if maybe_everyone.id == channel.guild.default_role.id:
-                        self.apply_overwrites(permissions, allow=maybe_everyone.allow, deny=maybe_everyone.deny, name="@everyone")
-                        remaining_overwrites = channel._overwrites[1:]  # type: ignore
-                    else:
-                        remaining_overwrites = channel._overwrites  # type: ignore
-                except IndexError:
-                    remaining_overwrites = channel._overwrites  # type: ignore
-                # pylint: enable=protected-access
-
-                role_lookup = {r.id: r for r in roles}
-
-                def is_role(overwrite: discord.abc._Overwrites) -> bool:  # type: ignore
-                    return overwrite.is_role()
-
-                def is_member(overwrite: discord.abc._Overwrites) -> bool:  # type: ignore
-                    return overwrite.is_member()
-
-                # Denies are applied BEFORE allows, always
-                # Handle denies
-                for overwrite in remaining_overwrites:
-                    if is_role(overwrite) and overwrite.id in role_lookup:
-                        self.apply_overwrites(permissions, allow=0, deny=overwrite.deny, name=role_lookup[overwrite.id].name)
-
-                # Handle allows
-                for overwrite in remaining_overwrites:
-                    if is_role(overwrite) and overwrite.id in role_lookup:
-                        self.apply_overwrites(permissions, allow=overwrite.allow, deny=0, name=role_lookup[overwrite.id].name)
-
-                if member_ids:
-                    # Handle member-specific overwrites
-                    for overwrite in remaining_overwrites:
-                        if is_member(overwrite) and overwrite.id in member_ids:
-                            self.apply_overwrites(permissions, allow=overwrite.allow, deny=overwrite.deny, name=f"{member_ids[overwrite.id].mention}")
-                            break
+                role_ids.add(target.id)
+
+        index = self.active_permission_index
+        resolver = PermissionResolver(channel.guild) if index is None else index
+        permissions = resolver.resolve(channel, role_ids, members)
 
         # Construct embed
         description = f"This is the permissions calculation for the following targets in {channel.mention}:\n"
@@ -178,13 +169,118 @@ class GuildFeature(Feature):
         allows: typing.List[str] = []
         denies: typing.List[str] = []
 
-        for key, value in permissions.items():
-            if value[0]:
-                allows.append(f"\N{WHITE HEAVY CHECK MARK} {key} (because {value[1]})")
+        for key, allowed, reason in permissions.explain():
+            if allowed:
+                allows.append(f"\N{WHITE HEAVY CHECK MARK} {key} (because {reason})")
             else:
-                denies.append(f"\N{CROSS MARK} {key} (because {value[1]})")
+                denies.append(f"\N{CROSS MARK} {key} (because {reason})")
 
         for chunk in self.chunks(sorted(allows) + sorted(denies), 8):
             embed.add_field(name="...", value="\n".join(chunk), inline=False)
 
         await ctx.send(embed=embed)
+
+    @Feature.Command(parent="jsk", name="permaudit")
+    async def jsk_permaudit(
+        self,
+        ctx: ContextA,
+        export_format: typing.Optional[typing.Literal['csv', 'json']],
+        *permissions: str
+    ):
+        """
+        Calculates the effective permissions of every member in every channel of this server.
+
+        If permission names are given, only members that have any of them are included,
+        e.g. `jsk permaudit manage_webhooks` shows everyone who can manage webhooks anywhere.
+        The result is uploaded as a CSV (the default) or JSON file, gzipped if it is too large to upload as is,
+        or written to the working directory if it is too large even then.
+        """
+
+        if not ctx.guild:
+            return await ctx.send("This command can only be used in a server.")
+
+        guild = ctx.guild
+        mask = 0
+
+        for permission in permissions:
+            if not isinstance(getattr(discord.Permissions, permission, None), discord.flags.flag_value):
+                raise commands.BadArgument(f"Invalid permission: {permission}")
+
+            mask |= getattr(discord.Permissions, permission).flag
+
+        matrix: typing.List[typing.Tuple[discord.abc.GuildChannel, typing.Dict[int, int]]] = []
+        matched_members: typing.Set[int] = set()
+
+        start = time.perf_counter()
+
+        async with ReplResponseReactor(ctx.message):
+            with self.submit(ctx):
+                async for channel, results in audit_permissions(guild, index=self.active_permission_index):
+                    if mask:
+                        results = {member_id: value for member_id, value in results.items() if value & mask}
+                        matched_members.update(results)
+
+                    matrix.append((channel, results))
+
+        end = time.perf_counter()
+
+        # Names are read here rather than in the executor, so that it doesn't read the member cache while it changes
+        member_names = {member.id: str(member) for member in guild.members}
+
+        @executor_function
+        def serialize() -> bytes:
+            if export_format == 'json':
+                return json.dumps({
+                    "guild": guild.id,
+                    "permissions": list(permissions),
+                    "channels": [
+                        {
+                            "id": channel.id,
+                            "name": channel.name,
+                            "members": {str(member_id): value for member_id, value in results.items()}
+                        }
+                        for channel, results in matrix
+                    ]
+                }, indent=1).encode('utf-8')
+
+            stream = io.StringIO()
+            writer = csv.writer(stream)
+            writer.writerow(["channel_id", "channel", "member_id", "member", "permissions", *permissions])
+
+            for channel, results in matrix:
+                for member_id, value in results.items():
+                    writer.writerow([
+                        channel.id, channel.name, member_id, member_names.get(member_id, str(member_id)), value,
+                        *(int(bool(value & getattr(discord.Permissions, permission).flag)) for permission in permissions)
+                    ])
+
+            return stream.getvalue().encode('utf-8')
+
+        filename = f"permaudit.{export_format or 'csv'}"
+        path: typing.Optional[str] = None
+
+        async with ReplResponseReactor(ctx.message):
+            data = await serialize()
+
+            if len(data) > guild.filesize_limit:
+                filename += ".gz"
+                data = await executor_function(gzip.compress)(data)
+
+            if len(data) > guild.filesize_limit:
+                path = os.path.abspath(f"{guild.id}-{filename}")
+
+                with open(path, "wb") as file:
+                    await executor_function(file.write)(data)
+
+        summary = f"Audited {len(guild.members)} cached members across {len(matrix)} channels in {end - start:.2f}s."
+
+        if self.active_permission_index is not None:
+            summary += f" ({len(self.permission_index)} permission results cached)"
+
+        if mask:
+            summary += f"\n{len(matched_members)} members have {' or '.join(f'`{p}`' for p in permissions)} in at least one channel."
+
+        if path is not None:
+            return await ctx.send(f"{summary}\nThe result is too large to upload, so it was written to `{path}`.")
+
+        await ctx.send(summary, file=discord.File(filename=filename, fp=io.BytesIO(data)))
@@ -12,6 +12,7 @@ The jishaku command invocation related commands.
 """
 
 import contextlib
+import cProfile
 import inspect
 import io
 import pathlib
@@ -24,8 +25,12 @@ from discord.ext import commands
 
 from jishaku.exception_handling import ReplResponseReactor
 from jishaku.features.baseclass import Feature
-from jishaku.models import copy_context_with
+from jishaku.loadtest import format_load_result, run_load
+from jishaku.math import natural_time
+from jishaku.models import ContextTemplate, copy_context_with
 from jishaku.paginators import PaginatorInterface, WrappedPaginator, use_file_check
+from jishaku.profiling import ProfiledCoroutine, dump_profile_stats, format_profile_stats
+from jishaku.recording import CommandRecorder, RecordedInvocation, format_replay_result, load_recording, replay
 from jishaku.types import ContextA, ContextT
 
 UserIDConverter = commands.IDConverter[typing.Union[discord.Member, discord.User]]
@@ -88,6 +93,10 @@ class InvocationFeature(Feature):
 
     OVERRIDE_SIGNATURE = typing.Union[SlimUserConverter, SlimChannelConverter]
 
+    def __init__(self, *args: typing.Any, **kwargs: typing.Any):
+        super().__init__(*args, **kwargs)
+        self.recorder: CommandRecorder = CommandRecorder()
+
     @Feature.Command(parent="jsk", name="override", aliases=["execute", "exec", "override!", "execute!", "exec!"])
     async def jsk_override(self, ctx: ContextT, overrides: commands.Greedy[OVERRIDE_SIGNATURE], *, command_string: str):
         """
@@ -139,6 +148,9 @@ class InvocationFeature(Feature):
         await alt_ctx.command.invoke(alt_ctx)
         return
 
+    # Options jsk repeat takes before the command, e.g. `--concurrency 10`
+    REPEAT_OPTION = re.compile(r"--(?:(concurrency|rate)[= ]([0-9]*\.?[0-9]+)|(stats))\s+")
+
     @Feature.Command(parent="jsk", name="repeat")
     async def jsk_repeat(self, ctx: ContextT, times: int, *, command_string: str):
         """
@@ -146,27 +158,262 @@ class InvocationFeature(Feature):
 
         This acts like the command was invoked several times manually, so it obeys cooldowns.
         You can use this in conjunction with `jsk sudo` to bypass this.
+
+        Prefix the command with `--concurrency <n>` to run up to n invocations at once,
+        `--rate <n>` to start no more than n invocations per second, or `--stats` to report latency statistics.
+        Any of these count errors instead of stopping at the first, and report statistics when finished.
         """
 
+        concurrency, rate, load_test = 1, 0.0, False
+
+        while match := self.REPEAT_OPTION.match(command_string):
+            option, value, _stats = match.groups()
+            load_test = True
+
+            if option == 'concurrency':
+                concurrency = max(int(float(value)), 1)
+            elif option == 'rate':
+                rate = float(value)
+
+            command_string = command_string[match.end():]
+
+        if load_test:
+            return await self.repeat_load_test(ctx, times, command_string, concurrency, rate)
+
+        if not ctx.prefix:
+            return await ctx.send("Reparsing requires a prefix")
+
+        # The command is only resolved once, and each repetition gets a cheap clone of it
+        template = await ContextTemplate.from_context(ctx, content=ctx.prefix + command_string)
+
+        if template.ctx.command is None:
+            return await ctx.send(f'Command "{template.ctx.invoked_with}" is not found')
+
         with self.submit(ctx):  # allow repeats to be cancelled
             for _ in range(times):
-                if ctx.prefix:
-                    alt_ctx = await copy_context_with(ctx, content=ctx.prefix + command_string)
-                else:
-                    await ctx.send("Reparsing requires a prefix")
-                    return
+                alt_ctx = template.clone()
+                await alt_ctx.command.reinvoke(alt_ctx)  # type: ignore
+
+    async def repeat_load_test(self, ctx: ContextT, times: int, command_string: str, concurrency: int, rate: float):
+        """
+        Runs a command many times with the given concurrency and rate, then reports its latency and errors.
+        """
+
+        if not ctx.prefix:
+            return await ctx.send("Reparsing requires a prefix")
+
+        template = await ContextTemplate.from_context(ctx, content=ctx.prefix + command_string)
+        alt_ctx = template.ctx
+
+        if alt_ctx.command is None:
+            return await ctx.send(f'Command "{alt_ctx.invoked_with}" is not found')
+
+        async def invoke(_index: int):
+            invocation_ctx = template.clone()
+            await invocation_ctx.command.reinvoke(invocation_ctx)  # type: ignore
+
+        async with ReplResponseReactor(ctx.message):
+            with self.submit(ctx):  # allow load tests to be cancelled
+                result = await run_load(invoke, times, concurrency=concurrency, rate=rate)
+
+        paginator = WrappedPaginator(prefix='```', suffix='```', max_size=1980)
+        paginator.add_line(
+            f"{alt_ctx.command.qualified_name} x {times}, concurrency {concurrency}"
+            f"{f', rate {rate:g}/s' if rate else ''}",
+            empty=True
+        )
 
-                if alt_ctx.command is None:
-                    return await ctx.send(f'Command "{alt_ctx.invoked_with}" is not found')
+        for line in format_load_result(result):
+            paginator.add_line(line)
 
-                await alt_ctx.command.reinvoke(alt_ctx)
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        return await interface.send_to(ctx)
+
+    def should_record(self, ctx: ContextA, error: typing.Optional[commands.CommandError] = None) -> bool:
+        """
+        Returns whether an invocation should be recorded.
+
+        Application commands, jishaku's own commands and invocations rejected by checks or bad input aren't recorded,
+        so a replay never re-runs something that was refused, or code that was evaluated.
+        """
+
+        if ctx.interaction is not None or ctx.command is None:
+            return False
+
+        if isinstance(error, (commands.CheckFailure, commands.UserInputError)):
+            return False
+
+        # Every jishaku command is under its root command, which belongs to this cog
+        return (ctx.command.root_parent or ctx.command).cog is not self
+
+    @Feature.listener('on_command_completion')
+    async def jsk_record_command_completion(self, ctx: ContextA):
+        """
+        Records a finished prefix command invocation while recording.
+        """
+
+        if self.should_record(ctx):
+            self.recorder.record(ctx.message)
+
+    @Feature.listener('on_command_error')
+    async def jsk_record_command_error(self, ctx: ContextA, error: commands.CommandError):
+        """
+        Records a failed prefix command invocation while recording.
+        """
+
+        if self.should_record(ctx, error):
+            self.recorder.record(ctx.message)
+
+    @Feature.Command(parent="jsk", name="record", invoke_without_command=True, ignore_extra=False)
+    async def jsk_record(self, ctx: ContextA):
+        """
+        Shows whether prefix command invocations are being recorded, and how many have been.
+
+        Use `jsk record start` to start recording, and `jsk replay` to replay what was recorded.
+        """
+
+        recorder = self.recorder
+
+        if not recorder.recording and not recorder.invocations:
+            return await ctx.send("Invocations are not being recorded, use `jsk record start` to start.")
+
+        await ctx.send(
+            f"{len(recorder.invocations)} invocation(s) recorded in the last "
+            f"{natural_time(time.time() - recorder.started_at).strip()}"
+            f"{'' if recorder.recording else ' (not recording)'}."
+        )
+
+    @Feature.Command(parent="jsk_record", name="start")
+    async def jsk_record_start(self, ctx: ContextA):
+        """
+        Starts recording prefix command invocations, forgetting any recorded before.
+        """
+
+        if self.recorder.recording:
+            return await ctx.send("Invocations are already being recorded.")
+
+        self.recorder.start()
+        await ctx.send("Now recording invocations.")
+
+    @Feature.Command(parent="jsk_record", name="stop")
+    async def jsk_record_stop(self, ctx: ContextA):
+        """
+        Stops recording invocations. What was recorded so far is kept.
+        """
+
+        if not self.recorder.recording:
+            return await ctx.send("Invocations are not being recorded.")
+
+        self.recorder.stop()
+        await ctx.send(f"Stopped recording, {len(self.recorder.invocations)} invocation(s) recorded.")
+
+    @Feature.Command(parent="jsk_record", name="export", aliases=["save"])
+    async def jsk_record_export(self, ctx: ContextA, path: typing.Optional[str] = None):
+        """
+        Sends the recorded invocations as a JSON-lines file, or writes them to a path if one is given.
+        """
+
+        if not self.recorder.invocations:
+            return await ctx.send("No invocations have been recorded.")
+
+        text = self.recorder.export()
+
+        if path:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(text)
+
+            return await ctx.send(f"Wrote {len(self.recorder.invocations)} invocation(s) to `{path}`.")
+
+        await ctx.send(file=discord.File(filename="recording.jsonl", fp=io.BytesIO(text.encode("utf-8"))))
+
+    @Feature.Command(parent="jsk_record", name="clear", aliases=["reset"])
+    async def jsk_record_clear(self, ctx: ContextA):
+        """
+        Forgets the invocations recorded so far.
+        """
+
+        self.recorder.invocations.clear()
+        await ctx.send("Cleared recorded invocations.")
+
+    @Feature.Command(parent="jsk", name="replay")
+    async def jsk_replay(self, ctx: ContextT, *arguments: str):
+        """
+        Replays recorded invocations, then shows the latency and errors of each command.
+
+        Usage: `jsk replay [--original-channels] [speed] [path]`
+
+        Invocations are read from the path if one is given, otherwise from a JSON-lines file attached to the message,
+        otherwise from `jsk record`. They run in this channel, as their original author where they can be found,
+        with the same spacing as when they were recorded, divided by the speed. A speed of 0 runs them one at a time, as fast as possible.
+        With `--original-channels`, they run in the channels they were recorded in instead. Checks and cooldowns apply as usual.
+        """
+
+        original_channels = "--original-channels" in arguments
+        positional = [argument for argument in arguments if argument != "--original-channels"]
+
+        try:
+            speed = float(positional.pop(0)) if positional else 1.0
+        except ValueError:
+            return await ctx.send("The speed should be a number, e.g. `jsk replay 2 recording.jsonl`.")
+
+        if len(positional) > 1:
+            return await ctx.send("Expected at most a speed and a path.")
+
+        path = positional[0] if positional else None
+
+        try:
+            if path:
+                with open(path, "r", encoding="utf-8") as file:
+                    invocations = load_recording(file.read())
+            elif ctx.message.attachments:
+                invocations = load_recording((await ctx.message.attachments[0].read()).decode("utf-8"))
+            else:
+                invocations = sorted(self.recorder.invocations, key=lambda invocation: invocation.timestamp)
+        except (OSError, UnicodeDecodeError, ValueError) as error:
+            return await ctx.send(f"Couldn't read the recording: {error}")
+
+        if not invocations:
+            return await ctx.send("There are no invocations to replay.")
+
+        async def make_context(invocation: RecordedInvocation) -> ContextT:
+            channel = (original_channels and self.bot.get_channel(invocation.channel_id)) or ctx.channel
+            guild = getattr(channel, 'guild', None)
+            author = (
+                (guild and guild.get_member(invocation.author_id))
+                or self.bot.get_user(invocation.author_id)
+                or ctx.author
+            )
+
+            return await copy_context_with(ctx, author=author, channel=channel, content=invocation.content)  # type: ignore
+
+        async with ReplResponseReactor(ctx.message):
+            with self.submit(ctx):  # allow replays to be cancelled
+                result = await replay(invocations, make_context, speed=max(speed, 0.0))
+
+        paginator = WrappedPaginator(prefix='```', suffix='```', max_size=1980)
+        summary, *lines = format_replay_result(result)
+        paginator.add_line(summary, empty=True)
+
+        for line in lines:
+            paginator.add_line(line)
+
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        return await interface.send_to(ctx)
 
     @Feature.Command(parent="jsk", name="debug", aliases=["dbg"])
     async def jsk_debug(self, ctx: ContextT, *, command_string: str):
         """
         Run a command timing execution and catching exceptions.
+
+        Prefix the command with `--profile` to also profile it with cProfile.
         """
 
+        profiler: typing.Optional[cProfile.Profile] = None
+
+        if command_string.startswith("--profile "):
+            profiler = cProfile.Profile()
+            command_string = command_string[len("--profile "):].lstrip()
+
         if ctx.prefix:
             alt_ctx = await copy_context_with(ctx, content=ctx.prefix + command_string)
         else:
@@ -180,10 +427,21 @@ class InvocationFeature(Feature):
 
         async with ReplResponseReactor(ctx.message):
             with self.submit(ctx):
-                await alt_ctx.command.invoke(alt_ctx)
+                if profiler:
+                    await ProfiledCoroutine(alt_ctx.command.invoke(alt_ctx), profiler)
+                else:
+                    await alt_ctx.command.invoke(alt_ctx)
 
         end = time.perf_counter()
-        return await ctx.send(f"✅ Command `{alt_ctx.command.qualified_name}` finished in {end - start:.3f}s.")
+        summary = f"✅ Command `{alt_ctx.command.qualified_name}` finished in {end - start:.3f}s."
+
+        if not profiler:
+            return await ctx.send(summary)
+
+        return await ctx.send(summary, files=[
+            discord.File(filename="profile.txt", fp=io.BytesIO(format_profile_stats(profiler).encode('utf-8'))),
+            discord.File(filename="profile.pstats", fp=io.BytesIO(dump_profile_stats(profiler))),
+        ])
 
     @Feature.Command(parent="jsk", name="source", aliases=["src"])
     async def jsk_source(self, ctx: ContextA, *, command_name: str):
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.features.latency
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+The jishaku round-trip time commands.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import collections
+import time
+import typing
+
+import discord
+from discord.ext import commands
+
+from jishaku.exception_handling import ReplResponseReactor
+from jishaku.features.baseclass import Feature
+from jishaku.math import mean_stddev, natural_time, percentile
+from jishaku.paginators import PaginatorInterface, WrappedPaginator
+from jishaku.types import ContextA
+
+T = typing.TypeVar('T')
+
+
+class LatencyFeature(Feature):
+    """
+    Feature containing the round-trip time commands
+    """
+
+    # How many latency readings are kept for jsk rtt history
+    LATENCY_HISTORY_SIZE = 10_000
+    # The routes jsk rtt bench can time, and the most samples it will take
+    BENCHMARK_ROUTES = ('send', 'edit', 'typing', 'reaction')
+    MAX_BENCHMARK_SAMPLES = 50
+    # How often heartbeats are sampled when the gateway's own interval isn't known, in seconds
+    HEARTBEAT_INTERVAL = 41.25
+
+    def __init__(self, *args: typing.Any, **kwargs: typing.Any):
+        super().__init__(*args, **kwargs)
+        # (time taken, route, seconds) for every latency reading, from jsk rtt and gateway heartbeats
+        self.latency_history: typing.Deque[typing.Tuple[float, str, float]] = collections.deque(maxlen=self.LATENCY_HISTORY_SIZE)
+        self.last_heartbeat: float = 0.0
+        self.heartbeat_task: typing.Optional['asyncio.Task[None]'] = None
+
+    async def cog_load(self):
+        self.heartbeat_task = asyncio.get_running_loop().create_task(self.sample_heartbeats())
+        return await super().cog_load()
+
+    def cog_unload(self):  # pylint: disable=invalid-overridden-method
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+
+        return super().cog_unload()
+
+    def record_latency(self, route: str, seconds: float):
+        """
+        Adds a latency reading to the rolling history.
+        """
+
+        self.latency_history.append((time.time(), route, seconds))
+
+    def heartbeat_interval(self) -> float:
+        """
+        Returns how often the gateway is heartbeating, in seconds, or a typical interval if that isn't known yet.
+        """
+
+        websocket = getattr(self.bot, 'ws', None)
+        keep_alive = getattr(websocket, '_keep_alive', None)
+        return getattr(keep_alive, 'interval', None) or self.HEARTBEAT_INTERVAL
+
+    async def sample_heartbeats(self):
+        """
+        Records the heartbeat latency once every heartbeat interval, for as long as the cog is loaded.
+        """
+
+        while True:
+            await asyncio.sleep(self.heartbeat_interval())
+            latency = self.bot.latency
+
+            # The latency only changes when a heartbeat is acknowledged, so this skips readings already recorded
+            if latency != self.last_heartbeat and 0.0 < latency < float('inf'):
+                self.last_heartbeat = latency
+                self.record_latency('heartbeat', latency)
+
+    @staticmethod
+    def format_latencies(readings: typing.Dict[str, typing.List[float]]) -> typing.List[str]:
+        """
+        Formats the percentiles of latency readings by route as table rows.
+        """
+
+        lines = [f"{'Route':<10} {'Count':>5} {'p50':>9} {'p90':>9} {'p99':>9} {'Max':>9}"]
+
+        for route, values in readings.items():
+            if values:
+                lines.append(
+                    f"{route:<10} {len(values):>5} "
+                    + " ".join(f"{natural_time(percentile(values, fraction)):>9}" for fraction in (0.5, 0.9, 0.99, 1.0))
+                )
+
+        return lines
+
+    @Feature.Command(parent="jsk", name="rtt", aliases=["ping"], invoke_without_command=True, ignore_extra=False)
+    async def jsk_rtt(self, ctx: ContextA):
+        """
+        Calculates Round-Trip Time to the API.
+
+        Use `jsk rtt bench` for a longer benchmark of individual routes, and `jsk rtt history` for past readings.
+        """
+
+        message = None
+
+        # We'll show each of these readings as well as an average and standard deviation.
+        api_readings: typing.List[float] = []
+        # We'll also record websocket readings, but we'll only provide the average.
+        websocket_readings: typing.List[float] = []
+
+        # We do 6 iterations here.
+        # This gives us 5 visible readings, because a request can't include the stats for itself.
+        for _ in range(6):
+            # First generate the text
+            text = "Calculating round-trip time.\n\n"
+            text += "\n".join(f"`#{index + 1}` Reading: {reading * 1000:.2f}ms" for index, reading in enumerate(api_readings))
+
+            if api_readings:
+                average, stddev = mean_stddev(api_readings)
+
+                text += f"\n\nAverage Speed: {average * 1000:.2f} \N{PLUS-MINUS SIGN} {stddev * 1000:.2f}ms"
+            else:
+                text += "\n\nNo readings yet."
+
+            if websocket_readings:
+                average = sum(websocket_readings) / len(websocket_readings)
+
+                text += f"\nWebsocket latency: {average * 1000:.2f}ms"
+            else:
+                text += f"\nWebsocket latency: {self.bot.latency * 1000:.2f}ms 🏓"
+
+            # Now do the actual request and reading
+            if message:
+                before = time.perf_counter()
+                await message.edit(content=text)
+                after = time.perf_counter()
+
+                api_readings.append(after - before)
+            else:
+                before = time.perf_counter()
+                message = await ctx.send(content=text)
+                after = time.perf_counter()
+
+                api_readings.append(after - before)
+
+            self.record_latency('edit' if len(api_readings) > 1 else 'send', api_readings[-1])
+
+            # Ignore websocket latencies that are 0 or negative because they usually mean we've got bad heartbeats
+            if self.bot.latency > 0.0:
+                websocket_readings.append(self.bot.latency)
+
+    @Feature.Command(parent="jsk_rtt", name="bench", aliases=["benchmark"])
+    async def jsk_rtt_bench(self, ctx: ContextA, *arguments: str):
+        """
+        Times many requests to individual API routes, reporting percentiles of each.
+
+        Arguments are an optional amount of samples, and the routes to time: any of send, edit, typing and reaction,
+        defaulting to all of them. Samples are added to the rolling history shown by `jsk rtt history`.
+        """
+
+        samples = 10
+        routes: typing.List[str] = []
+
+        for argument in arguments:
+            if argument.isdigit():
+                samples = int(argument)
+            elif argument in self.BENCHMARK_ROUTES:
+                routes.append(argument)
+            else:
+                raise commands.BadArgument(f"Unknown route {argument!r}, expected any of {', '.join(self.BENCHMARK_ROUTES)}")
+
+        samples = max(min(samples or 10, self.MAX_BENCHMARK_SAMPLES), 1)
+
+        selected = set(routes or self.BENCHMARK_ROUTES)
+        readings: typing.Dict[str, typing.List[float]] = {route: [] for route in self.BENCHMARK_ROUTES if route in selected}
+
+        async def timed(route: str, awaitable: typing.Awaitable[T]) -> T:
+            before = time.perf_counter()
+            result = await awaitable
+            elapsed = time.perf_counter() - before
+
+            readings[route].append(elapsed)
+            self.record_latency(route, elapsed)
+            return result
+
+        heartbeat = self.bot.latency
+        start = time.perf_counter()
+
+        async with ReplResponseReactor(ctx.message):
+            message: typing.Optional[discord.Message] = None
+
+            try:
+                for index in range(samples):
+                    text = f"Benchmarking round-trip time: sample {index + 1} of {samples}"
+
+                    # Without the send route, a single message is reused for every sample
+                    if message is None or 'send' in selected:
+                        if message is not None:
+                            await message.delete()
+                            message = None
+
+                        message = await (timed('send', ctx.send(text)) if 'send' in selected else ctx.send(text))
+
+                    if 'edit' in selected:
+                        await timed('edit', message.edit(content=f"{text} (edited)"))
+                    if 'typing' in selected:
+                        await timed('typing', ctx.channel.typing())  # type: ignore
+                    if 'reaction' in selected:
+                        await timed('reaction', message.add_reaction("\N{STOPWATCH}"))
+            finally:
+                if message is not None:
+                    await message.delete()
+
+        lines = [
+            f"Took {samples} sample(s) of {len(readings)} route(s) in {natural_time(time.perf_counter() - start).strip()}",
+            f"Heartbeat latency: {heartbeat * 1000:.2f}ms",
+            "",
+            "```",
+            *self.format_latencies(readings),
+            "```",
+        ]
+
+        await ctx.send("\n".join(lines))
+
+    @Feature.Command(parent="jsk_rtt", name="history")
+    async def jsk_rtt_history(self, ctx: ContextA, minutes: float = 10.0):
+        """
+        Shows past latency readings grouped into windows of the given amount of minutes, most recent first.
+
+        Readings come from `jsk rtt`, `jsk rtt bench`, and the gateway heartbeats received since the cog was loaded.
+        """
+
+        if not self.latency_history:
+            return await ctx.send("No latency readings have been recorded yet.")
+
+        window = max(minutes, 0.1) * 60
+        now = time.time()
+        buckets: typing.Dict[int, typing.Dict[str, typing.List[float]]] = collections.defaultdict(
+            lambda: collections.defaultdict(list)
+        )
+
+        for taken_at, route, seconds in self.latency_history:
+            buckets[int((now - taken_at) // window)][route].append(seconds)
+
+        paginator = WrappedPaginator(prefix='```', suffix='```', max_size=1980)
+
+        for bucket in sorted(buckets):
+            start, end = bucket * window / 60, (bucket + 1) * window / 60
+            paginator.add_line(f"{start:g} to {end:g} minutes ago:")
+
+            for line in self.format_latencies(dict(sorted(buckets[bucket].items()))):
+                paginator.add_line(f"  {line}")
+
+            paginator.add_line()
+
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        return await interface.send_to(ctx)
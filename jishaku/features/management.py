@@ -11,8 +11,13 @@ The jishaku extension and bot control commands.
 
 """
 
+import asyncio
+import contextlib
+import io
 import itertools
+import logging
 import re
+import sys
 import time
 import traceback
 import typing
@@ -23,59 +28,322 @@ from discord.ext import commands
 
 from jishaku.features.baseclass import Feature
 from jishaku.flags import Flags
-from jishaku.math import mean_stddev
-from jishaku.modules import ExtensionConverter
+from jishaku.functools import executor_function
+from jishaku.math import natural_time
+from jishaku.modules import ExtensionConverter, ExtensionLoadResult, ExtensionTracker, add_load_results, load_extensions, watch_files
+from jishaku.paginators import PaginatorInterface, WrappedPaginator, use_file_check
+from jishaku.profiling import ImportProfiler, format_load_profile
 from jishaku.repl import inspections
+from jishaku.sync import SyncEvent, SyncHashStore, SyncScheduler, payload_hash
 from jishaku.types import ContextA
 
+LOGGER = logging.getLogger('jishaku.features.management')
+
 
 class ManagementFeature(Feature):
     """
     Feature containing the extension and bot control commands
     """
 
+    # How often the extension watcher checks for changes, in seconds
+    WATCH_INTERVAL = 1.0
+    # How long a burst of changes must settle before the watcher reloads, in seconds
+    WATCH_DEBOUNCE = 0.5
+
+    def __init__(self, *args: typing.Any, **kwargs: typing.Any):
+        super().__init__(*args, **kwargs)
+        self.extension_tracker: ExtensionTracker = ExtensionTracker()
+        self.watch_task: typing.Optional[asyncio.Task[None]] = None
+        self.watch_extensions: typing.List[str] = []
+        self.watch_reloads: int = 0
+        self.load_profile: typing.Optional[str] = None
+        self._sync_hashes: typing.Optional[SyncHashStore] = None
+
+    async def load_and_track(self, extensions: typing.Iterable[str]) -> typing.List[ExtensionLoadResult]:
+        """
+        Loads or reloads extensions, recording the sources of those that loaded successfully.
+        """
+
+        results = await load_extensions(self.bot, extensions, concurrency=Flags.LOAD_CONCURRENCY)
+        loaded = [result.extension for result in results if result.error is None]
+
+        await executor_function(self.extension_tracker.record)(*loaded)
+        return results
+
+    async def reload_changed(
+        self,
+        names: typing.List[str]
+    ) -> typing.Tuple[typing.Dict[str, typing.List[str]], typing.List[ExtensionLoadResult]]:
+        """
+        Reloads those of the given extensions whose sources changed since they were last recorded.
+
+        Returns the changed modules of every extension, and the results of reloading the changed ones.
+        """
+
+        @executor_function
+        def find_changes() -> typing.Dict[str, typing.List[str]]:
+            return {name: self.extension_tracker.changes(name) for name in names}
+
+        changes = await find_changes()
+
+        # Changed modules that aren't extensions themselves won't be re-imported on reload unless they're evicted first
+        for name in {module for modules in changes.values() for module in modules}:
+            if name not in self.bot.extensions and not name.startswith('jishaku'):
+                sys.modules.pop(name, None)
+
+        return changes, await self.load_and_track([name for name in names if changes[name]])
+
     @Feature.Command(parent="jsk", name="load", aliases=["reload"])
     async def jsk_load(self, ctx: ContextA, *extensions: ExtensionConverter):  # type: ignore
         """
         Loads or reloads the given extension names.
 
-        Reports any extensions that failed to load.
+        Reports any extensions that failed to load, and how long each one took.
+        If JISHAKU_LOAD_CONCURRENCY is set above 1, that many extensions are loaded at once,
+        with extensions waiting for any dependencies they declare in `__extension_dependencies__`.
         """
 
-        extensions: typing.Iterable[typing.List[str]] = extensions  # type: ignore
+        extensions: typing.Tuple[typing.List[str], ...] = extensions  # type: ignore
 
         paginator = commands.Paginator(prefix='', suffix='')
+        profiler: typing.Optional[ImportProfiler] = None
+
+        if extensions and extensions[0] == ['--profile']:
+            extensions = extensions[1:]
+            profiler = ImportProfiler()
 
         # 'jsk reload' on its own just reloads jishaku
         if ctx.invoked_with == 'reload' and not extensions:
-            extensions = [['jishaku']]
+            extensions = (['jishaku'],)
 
-        for extension in itertools.chain(*extensions):
-            method, icon = (
-                (self.bot.reload_extension, "\N{CLOCKWISE RIGHTWARDS AND LEFTWARDS OPEN CIRCLE ARROWS}")
-                if extension in self.bot.extensions else
-                (self.bot.load_extension, "\N{INBOX TRAY}")
+        start = time.perf_counter()
+
+        with profiler or contextlib.nullcontext():
+            results = await self.load_and_track(itertools.chain(*extensions))
+
+        end = time.perf_counter()
+
+        add_load_results(paginator, results)
+
+        if len(results) > 1:
+            paginator.add_line(f"{len(results)} extensions in {natural_time(end - start).strip()}")
+
+        for page in paginator.pages:
+            await ctx.send(page)
+
+        if profiler is not None:
+            self.load_profile = format_load_profile(
+                [(result.extension, result.elapsed, profiler.find(result.extension)) for result in results],
+                profiler.roots
             )
 
-            try:
-                await discord.utils.maybe_coroutine(method, extension)
-            except Exception as exc:  # pylint: disable=broad-except
-                if isinstance(exc, commands.ExtensionFailed) and exc.__cause__:
-                    cause = exc.__cause__
-                    traceback_data = ''.join(traceback.format_exception(type(cause), cause, cause.__traceback__, 8))
-                else:
-                    traceback_data = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__, 2))
+            await self.send_load_profile(ctx)
 
-                paginator.add_line(
-                    f"{icon}\N{WARNING SIGN} `{extension}`\n```py\n{traceback_data}\n```",
-                    empty=True
-                )
-            else:
-                paginator.add_line(f"{icon} `{extension}`", empty=True)
+    async def send_load_profile(self, ctx: ContextA):
+        """
+        Sends the most recent extension load profile, as a file if possible.
+        """
+
+        if self.load_profile is None:
+            return await ctx.send("No extension loads have been profiled yet, use `jsk load --profile <extensions>`.")
+
+        if use_file_check(ctx, len(self.load_profile)):
+            return await ctx.send(file=discord.File(
+                filename="load_profile.txt",
+                fp=io.BytesIO(self.load_profile.encode('utf-8'))
+            ))
+
+        paginator = WrappedPaginator(prefix='```prolog', max_size=1980)
+        paginator.add_line(self.load_profile)
+
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        return await interface.send_to(ctx)
+
+    @Feature.Command(parent="jsk", name="loadprofile", aliases=["importtime"])
+    async def jsk_loadprofile(self, ctx: ContextA):
+        """
+        Shows the most recent profile taken by `jsk load --profile`.
+
+        This lists how long each extension took to import and set up,
+        and the tree of modules imported while loading them, slowest first.
+        """
+
+        await self.send_load_profile(ctx)
+
+    @Feature.Command(parent="jsk", name="refresh", aliases=["reload_changed"])
+    async def jsk_refresh(self, ctx: ContextA, *extensions: ExtensionConverter):  # type: ignore
+        """
+        Reloads only the loaded extensions whose source changed since they were last loaded.
+
+        An extension counts as changed if its own file changed, or any module from its package it imports does.
+        If no extensions are given, every loaded extension is checked.
+        """
+
+        names: typing.List[str] = list(itertools.chain(*extensions)) or list(self.bot.extensions)  # type: ignore
+        names = [name for name in names if name in self.bot.extensions]
+
+        paginator = commands.Paginator(prefix='', suffix='')
+
+        start = time.perf_counter()
+        changes, results = await self.reload_changed(names)
+        end = time.perf_counter()
+
+        changed = [name for name in names if changes[name]]
+
+        add_load_results(paginator, results)
+
+        for name in changed:
+            dependencies = [module for module in changes[name] if module != name]
+
+            if dependencies:
+                paginator.add_line(f"`{name}` changed through {', '.join(f'`{module}`' for module in dependencies)}")
+
+        skipped = len(names) - len(changed)
+        summary = f"Reloaded {len(changed)} changed extension(s) in {natural_time(end - start).strip()}, skipped {skipped} unchanged."
+
+        if 0 < skipped <= 20:
+            summary += f"\nUnchanged: {', '.join(f'`{name}`' for name in names if name not in changed)}"
+
+        paginator.add_line(summary)
 
         for page in paginator.pages:
             await ctx.send(page)
 
+    async def watch_loop(self, channel: discord.abc.Messageable):
+        """
+        Reloads watched extensions as their sources change, posting failures to the channel.
+
+        Errors are logged and posted rather than raised, so a failed reload doesn't stop the watcher,
+        and the watcher stopping is never silent.
+        """
+
+        async def post(paginator: commands.Paginator):
+            try:
+                for page in paginator.pages:
+                    await channel.send(page)
+            except discord.HTTPException:
+                # Keep watching even if the channel can't be posted in
+                pass
+
+        def error_paginator(heading: str, error: BaseException) -> commands.Paginator:
+            paginator = commands.Paginator(prefix='', suffix='')
+            traceback_data = ''.join(traceback.format_exception(type(error), error, error.__traceback__, 8))
+            paginator.add_line(f"{heading}\n```py\n{traceback_data}\n```")
+            return paginator
+
+        try:
+            async for paths in watch_files(
+                lambda: self.extension_tracker.directories(self.watch_extensions),
+                interval=self.WATCH_INTERVAL,
+                debounce=self.WATCH_DEBOUNCE
+            ):
+                try:
+                    names = [name for name in self.watch_extensions if name in self.bot.extensions]
+                    changes, results = await self.reload_changed(names)
+                except Exception as error:  # pylint: disable=broad-except
+                    LOGGER.exception("Automatically reloading extensions failed")
+                    await post(error_paginator(f"Automatic reload after changes to {len(paths)} file(s) raised an error:", error))
+                    continue
+
+                self.watch_reloads += len(results)
+                failures = [result for result in results if result.error is not None]
+
+                if not failures:
+                    continue
+
+                paginator = commands.Paginator(prefix='', suffix='')
+                paginator.add_line(f"Automatic reload after changes to {len(paths)} file(s) failed:", empty=True)
+                add_load_results(paginator, failures)
+
+                for result in failures:
+                    changed = [module for module in changes[result.extension] if module != result.extension]
+
+                    if changed:
+                        paginator.add_line(f"`{result.extension}` changed through {', '.join(f'`{module}`' for module in changed)}")
+
+                await post(paginator)
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.exception("The extension watcher stopped")
+            await post(error_paginator("The extension watcher stopped after an error:", error))
+
+    async def cog_load(self):
+        # Extensions loaded before this cog are recorded as they are now, so changes made from here on are found
+        await executor_function(self.extension_tracker.record)(*self.bot.extensions)
+        return await super().cog_load()
+
+    def cog_unload(self):
+        if self.watch_task is not None:
+            self.watch_task.cancel()
+
+        return super().cog_unload()
+
+    @Feature.Command(parent="jsk", name="watch", invoke_without_command=True, ignore_extra=False)
+    async def jsk_watch(self, ctx: ContextA):
+        """
+        Automatic extension reloading commands.
+
+        If invoked without subcommand, shows whether the watcher is running and what it is watching.
+        """
+
+        if self.watch_task is None or self.watch_task.done():
+            return await ctx.send("The extension watcher is not running.")
+
+        directories = await executor_function(self.extension_tracker.directories)(self.watch_extensions)
+
+        await ctx.send(
+            f"Watching {len(self.watch_extensions)} extension(s) in {len(directories)} directories, "
+            f"{self.watch_reloads} reload(s) so far."
+        )
+
+    @Feature.Command(parent="jsk_watch", name="start")
+    async def jsk_watch_start(
+        self,
+        ctx: ContextA,
+        channel: typing.Optional[discord.TextChannel],
+        *extensions: ExtensionConverter  # type: ignore
+    ):
+        """
+        Starts watching extensions, reloading them when their source changes.
+
+        Failed reloads are posted to the given channel, or this one.
+        If no extensions are given, every loaded extension is watched.
+        The extension this cog belongs to is never watched, as reloading it would stop the watcher.
+        """
+
+        if self.watch_task is not None and not self.watch_task.done():
+            return await ctx.send("The extension watcher is already running, stop it first.")
+
+        names: typing.List[str] = list(itertools.chain(*extensions)) or list(self.bot.extensions)  # type: ignore
+        # Reloading the extension this cog was defined in would unload the cog and cancel the watcher with it
+        module = type(self).__module__
+        self.watch_extensions = [
+            name for name in names
+            if name in self.bot.extensions and module != name and not module.startswith(name + '.')
+        ]
+
+        if not self.watch_extensions:
+            return await ctx.send("None of those extensions can be watched, as they are not loaded or contain this cog.")
+
+        self.watch_reloads = 0
+        self.watch_task = self.bot.loop.create_task(self.watch_loop(channel or ctx.channel))
+        directories = await executor_function(self.extension_tracker.directories)(self.watch_extensions)
+
+        await ctx.send(f"Watching {len(self.watch_extensions)} extension(s) in {len(directories)} directories.")
+
+    @Feature.Command(parent="jsk_watch", name="stop")
+    async def jsk_watch_stop(self, ctx: ContextA):
+        """
+        Stops watching extensions.
+        """
+
+        if self.watch_task is None or self.watch_task.done():
+            return await ctx.send("The extension watcher is not running.")
+
+        self.watch_task.cancel()
+        self.watch_task = None
+
+        await ctx.send(f"Stopped watching extensions after {self.watch_reloads} reload(s).")
+
     @Feature.Command(parent="jsk", name="unload")
     async def jsk_unload(self, ctx: ContextA, *extensions: ExtensionConverter):  # type: ignore
         """
@@ -100,6 +368,7 @@ class ManagementFeature(Feature):
                     empty=True
                 )
             else:
+                self.extension_tracker.forget(extension)
                 paginator.add_line(f"{icon} `{extension}`", empty=True)
 
         for page in paginator.pages:
@@ -145,71 +414,173 @@ class ManagementFeature(Feature):
             f"Your Bot Invite Link:\n<https://discordapp.com/oauth2/authorize?{urlencode(query, safe='+')}>"
         )
 
-    @Feature.Command(parent="jsk", name="rtt", aliases=["ping"])
-    async def jsk_rtt(self, ctx: ContextA):
+    SLASH_COMMAND_ERROR = re.compile(r"In ((?:\d+\.[a-z]+\.?)+)")
+    # The amount of targets jsk sync will sync at once
+    SYNC_CONCURRENCY = 4
+    # How many times jsk sync retries a target after a rate limit or server error
+    SYNC_RETRIES = 3
+
+    def diagnose_sync_error(self, error: discord.HTTPException, slash_commands: typing.List[typing.Any]) -> str:
         """
-        Calculates Round-Trip Time to the API.
+        Explains a failed sync, pointing out the commands the error refers to where possible.
         """
 
-        message = None
+        # It's diagnosis time
+        error_lines: typing.List[str] = []
+        for line in str(error).split("\n"):
+            error_lines.append(line)
 
-        # We'll show each of these readings as well as an average and standard deviation.
-        api_readings: typing.List[float] = []
-        # We'll also record websocket readings, but we'll only provide the average.
-        websocket_readings: typing.List[float] = []
+            try:
+                match = self.SLASH_COMMAND_ERROR.match(line)
+                if not match:
+                    continue
+
+                pool = slash_commands
+                selected_command = None
+                name = ""
+                parts = match.group(1).split('.')
+                assert len(parts) % 2 == 0
+
+                for part_index in range(0, len(parts), 2):
+                    index = int(parts[part_index])
+                    # prop = parts[part_index + 1]
+
+                    if pool:
+                        # If the pool exists, this should be a subcommand
+                        selected_command = pool[index]  # type: ignore
+                        name += selected_command.name + " "
+
+                        if hasattr(selected_command, '_children'):  # type: ignore
+                            pool = list(selected_command._children.values())  # type: ignore  # pylint: disable=protected-access
+                        else:
+                            pool = None
+                    else:
+                        # Otherwise, the pool has been exhausted, and this likely is referring to a parameter
+                        param = list(selected_command._params.keys())[index]  # type: ignore  # pylint: disable=protected-access
+                        name += f"(parameter: {param}) "
+
+                if selected_command:
+                    to_inspect: typing.Any = None
+
+                    if hasattr(selected_command, 'callback'):  # type: ignore
+                        to_inspect = selected_command.callback  # type: ignore
+                    elif isinstance(selected_command, commands.Cog):
+                        to_inspect = type(selected_command)
 
-        # We do 6 iterations here.
-        # This gives us 5 visible readings, because a request can't include the stats for itself.
-        for _ in range(6):
-            # First generate the text
-            text = "Calculating round-trip time.\n\n"
-            text += "\n".join(f"`#{index + 1}` Reading: {reading * 1000:.2f}ms" for index, reading in enumerate(api_readings))
+                    try:
+                        error_lines.append(''.join([
+                            "\N{MAGNET} This is likely caused by: `",
+                            name,
+                            "` at ",
+                            str(inspections.file_loc_inspection(to_inspect)),  # type: ignore
+                            ":",
+                            str(inspections.line_span_inspection(to_inspect)),  # type: ignore
+                        ]))
+                    except Exception:  # pylint: disable=broad-except
+                        error_lines.append(f"\N{MAGNET} This is likely caused by: `{name}`")
+
+            except Exception as diag_error:  # pylint: disable=broad-except
+                error_lines.append(f"\N{MAGNET} Couldn't determine cause: {type(diag_error).__name__}: {diag_error}")
+
+        return '\n'.join(error_lines)
+
+    async def sync_payload(self, guild: typing.Optional[int]) -> typing.Tuple[typing.List[typing.Any], typing.List[typing.Any]]:
+        """
+        Builds the application commands and the payload that would be synced to a guild, or globally if None.
+        """
 
-            if api_readings:
-                average, stddev = mean_stddev(api_readings)
+        slash_commands = self.bot.tree._get_all_commands(  # type: ignore  # pylint: disable=protected-access
+            guild=discord.Object(guild) if guild else None
+        )
+        translator = getattr(self.bot.tree, 'translator', None)
+        needs_dpy_2_4_signature_changes = discord.version_info.major >= 2 and discord.version_info.minor >= 4
 
-                text += f"\n\nAverage Speed: {average * 1000:.2f} \N{PLUS-MINUS SIGN} {stddev * 1000:.2f}ms"
+        if needs_dpy_2_4_signature_changes:
+            if translator:
+                payload = [await command.get_translated_payload(self.bot.tree, translator) for command in slash_commands]
+            else:
+                payload = [command.to_dict(self.bot.tree) for command in slash_commands]
+        else:
+            if translator:
+                payload = [await command.get_translated_payload(translator) for command in slash_commands]
             else:
-                text += "\n\nNo readings yet."
+                payload = [command.to_dict() for command in slash_commands]
 
-            if websocket_readings:
-                average = sum(websocket_readings) / len(websocket_readings)
+        return slash_commands, payload
 
-                text += f"\nWebsocket latency: {average * 1000:.2f}ms"
-            else:
-                text += f"\nWebsocket latency: {self.bot.latency * 1000:.2f}ms 🏓"
+    @property
+    def sync_hashes(self) -> SyncHashStore:
+        """
+        The store of last-synced payload hashes, following the JISHAKU_SYNC_HASH_FILE flag.
+        """
 
-            # Now do the actual request and reading
-            if message:
-                before = time.perf_counter()
-                await message.edit(content=text)
-                after = time.perf_counter()
+        path = Flags.SYNC_HASH_FILE or None
 
-                api_readings.append(after - before)
-            else:
-                before = time.perf_counter()
-                message = await ctx.send(content=text)
-                after = time.perf_counter()
+        if self._sync_hashes is None or self._sync_hashes.path != path:
+            self._sync_hashes = SyncHashStore(path)
 
-                api_readings.append(after - before)
+        return self._sync_hashes
 
-            # Ignore websocket latencies that are 0 or negative because they usually mean we've got bad heartbeats
-            if self.bot.latency > 0.0:
-                websocket_readings.append(self.bot.latency)
+    async def report_sync_event(
+        self,
+        interface: PaginatorInterface,
+        ctx: ContextA,
+        event: SyncEvent,
+        slash_commands: typing.List[typing.Any],
+        digest: str
+    ):
+        """
+        Records the outcome of a sync job, and adds its progress to the interface.
+        """
 
-    SLASH_COMMAND_ERROR = re.compile(r"In ((?:\d+\.[a-z]+\.?)+)")
+        target = "Global" if event.target is None else f"`{event.target}`"
 
-    @Feature.Command(parent="jsk", name="sync")
+        if event.status == 'retrying':
+            await interface.add_line(
+                f"\N{HOURGLASS WITH FLOWING SAND} {target}: attempt {event.attempt} failed "
+                f"({event.error}), retrying in {event.delay:.1f}s",
+                empty=True
+            )
+        elif event.status == 'failed':
+            self.sync_hashes.discard(ctx.bot.application_id, event.target)
+            error = event.error
+
+            if isinstance(error, discord.HTTPException):
+                error_text = self.diagnose_sync_error(error, slash_commands)
+            else:
+                error_text = f"{type(error).__name__}: {error}"
+
+            await interface.add_line(f"\N{WARNING SIGN} {target}: {error_text}", empty=True)
+        else:
+            self.sync_hashes.set(ctx.bot.application_id, event.target, digest)
+            synced = [
+                discord.app_commands.AppCommand(data=d, state=ctx._state)  # type: ignore  # pylint: disable=protected-access,no-member
+                for d in event.result
+            ]
+
+            if event.target:
+                await interface.add_line(
+                    f"\N{SATELLITE ANTENNA} `{event.target}` Synced {len(synced)} guild commands successfully.", empty=True
+                )
+            else:
+                await interface.add_line(f"\N{SATELLITE ANTENNA} Synced {len(synced)} global commands", empty=True)
+
+    @Feature.Command(parent="jsk", name="sync", aliases=["sync!"])
     async def jsk_sync(self, ctx: ContextA, *targets: str):
         """
         Sync global or guild application commands to Discord.
+
+        Targets whose commands haven't changed since they were last synced are skipped.
+        Use `jsk sync!` to sync them anyway.
         """
 
         if not self.bot.application_id:
             await ctx.send("Cannot sync when application info not fetched")
             return
 
-        paginator = commands.Paginator(prefix='', suffix='')
+        application_id = self.bot.application_id
+        force = ctx.invoked_with == 'sync!'
+        paginator = WrappedPaginator(prefix='', suffix='', max_size=1980)
 
         guilds_set: typing.Set[typing.Optional[int]] = set()
         for target in targets:
@@ -235,104 +606,54 @@ class ManagementFeature(Feature):
         guilds: typing.List[typing.Optional[int]] = list(guilds_set)
         guilds.sort(key=lambda g: (g is not None, g))
 
+        store = self.sync_hashes
+        skipped: typing.List[typing.Optional[int]] = []
+        pending: typing.List[typing.Tuple[typing.Optional[int], typing.List[typing.Any], typing.List[typing.Any], str]] = []
+
         for guild in guilds:
-            slash_commands = self.bot.tree._get_all_commands(  # type: ignore  # pylint: disable=protected-access
-                guild=discord.Object(guild) if guild else None
-            )
-            translator = getattr(self.bot.tree, 'translator', None)
-            needs_dpy_2_4_signature_changes = discord.version_info.major >= 2 and discord.version_info.minor >= 4
+            slash_commands, payload = await self.sync_payload(guild)
+            digest = payload_hash(payload)
 
-            if needs_dpy_2_4_signature_changes:
-                if translator:
-                    payload = [await command.get_translated_payload(self.bot.tree, translator) for command in slash_commands]
-                else:
-                    payload = [command.to_dict(self.bot.tree) for command in slash_commands]
+            if not force and store.get(application_id, guild) == digest:
+                skipped.append(guild)
             else:
-                if translator:
-                    payload = [await command.get_translated_payload(translator) for command in slash_commands]
-                else:
-                    payload = [command.to_dict() for command in slash_commands]
+                pending.append((guild, slash_commands, payload, digest))
 
-            try:
-                if guild is None:
-                    data = await self.bot.http.bulk_upsert_global_commands(self.bot.application_id, payload=payload)
-                else:
-                    data = await self.bot.http.bulk_upsert_guild_commands(self.bot.application_id, guild, payload=payload)
+        paginator.add_line(f"Syncing {len(pending)} of {len(guilds)} target(s)", empty=True)
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        # Sent alongside the sync so progress shows as it happens, and awaited at the end so failures aren't lost
+        send_task = self.bot.loop.create_task(interface.send_to(ctx))
 
-                synced = [
-                    discord.app_commands.AppCommand(data=d, state=ctx._state)  # type: ignore  # pylint: disable=protected-access,no-member
-                    for d in data
-                ]
+        def make_job(guild: typing.Optional[int], payload: typing.List[typing.Any]):
+            if guild is None:
+                return lambda: self.bot.http.bulk_upsert_global_commands(application_id, payload=payload)
+            return lambda: self.bot.http.bulk_upsert_guild_commands(application_id, guild, payload=payload)
 
-            except discord.HTTPException as error:
-                # It's diagnosis time
-                error_lines: typing.List[str] = []
-                for line in str(error).split("\n"):
-                    error_lines.append(line)
+        prepared = {guild: (slash_commands, digest) for guild, slash_commands, _, digest in pending}
+        scheduler = SyncScheduler(concurrency=self.SYNC_CONCURRENCY, retries=self.SYNC_RETRIES)
 
-                    try:
-                        match = self.SLASH_COMMAND_ERROR.match(line)
-                        if not match:
-                            continue
-
-                        pool = slash_commands
-                        selected_command = None
-                        name = ""
-                        parts = match.group(1).split('.')
-                        assert len(parts) % 2 == 0
-
-                        for part_index in range(0, len(parts), 2):
-                            index = int(parts[part_index])
-                            # prop = parts[part_index + 1]
-
-                            if pool:
-                                # If the pool exists, this should be a subcommand
-                                selected_command = pool[index]  # type: ignore
-                                name += selected_command.name + " "
-
-                                if hasattr(selected_command, '_children'):  # type: ignore
-                                    pool = list(selected_command._children.values())  # type: ignore  # pylint: disable=protected-access
-                                else:
-                                    pool = None
-                            else:
-                                # Otherwise, the pool has been exhausted, and this likely is referring to a parameter
-                                param = list(selected_command._params.keys())[index]  # type: ignore  # pylint: disable=protected-access
-                                name += f"(parameter: {param}) "
-
-                        if selected_command:
-                            to_inspect: typing.Any = None
-
-                            if hasattr(selected_command, 'callback'):  # type: ignore
-                                to_inspect = selected_command.callback  # type: ignore
-                            elif isinstance(selected_command, commands.Cog):
-                                to_inspect = type(selected_command)
-
-                            try:
-                                error_lines.append(''.join([
-                                    "\N{MAGNET} This is likely caused by: `",
-                                    name,
-                                    "` at ",
-                                    str(inspections.file_loc_inspection(to_inspect)),  # type: ignore
-                                    ":",
-                                    str(inspections.line_span_inspection(to_inspect)),  # type: ignore
-                                ]))
-                            except Exception:  # pylint: disable=broad-except
-                                error_lines.append(f"\N{MAGNET} This is likely caused by: `{name}`")
-
-                    except Exception as diag_error:  # pylint: disable=broad-except
-                        error_lines.append(f"\N{MAGNET} Couldn't determine cause: {type(diag_error).__name__}: {diag_error}")
-
-                error_text = '\n'.join(error_lines)
-
-                if guild:
-                    paginator.add_line(f"\N{WARNING SIGN} `{guild}`: {error_text}", empty=True)
-                else:
-                    paginator.add_line(f"\N{WARNING SIGN} Global: {error_text}", empty=True)
-            else:
-                if guild:
-                    paginator.add_line(f"\N{SATELLITE ANTENNA} `{guild}` Synced {len(synced)} guild commands successfully.", empty=True)
-                else:
-                    paginator.add_line(f"\N{SATELLITE ANTENNA} Synced {len(synced)} global commands", empty=True)
+        events = scheduler.run((guild, make_job(guild, payload)) for guild, _, payload, _ in pending)
 
-        for page in paginator.pages:
-            await ctx.send(page)
+        try:
+            async for event in events:
+                if interface.closed:
+                    break
+
+                await self.report_sync_event(interface, ctx, event, *prepared[event.target])
+        finally:
+            await events.aclose()
+
+        if pending:
+            try:
+                store.save()
+            except OSError as error:
+                await interface.add_line(f"\N{WARNING SIGN} Couldn't save sync hashes: {error}", empty=True)
+
+        if skipped:
+            names = ', '.join('global' if guild is None else f'`{guild}`' for guild in skipped)
+            await interface.add_line(
+                f"\N{BLACK RIGHT-POINTING DOUBLE TRIANGLE} Skipped {len(skipped)} unchanged target(s): {names} (use `jsk sync!` to force)",
+                empty=True
+            )
+
+        await send_task
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.features.memory
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+The jishaku memory inspection commands.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import collections
+import io
+import tracemalloc
+import typing
+
+import discord
+from discord.ext import commands
+
+from jishaku.exception_handling import ReplResponseReactor
+from jishaku.features.baseclass import Feature
+from jishaku.functools import executor_function
+from jishaku.math import natural_size
+from jishaku.memory import SNAPSHOT_GROUPINGS, Census, census_growth, format_snapshot_diff, take_census, take_snapshot
+from jishaku.paginators import PaginatorInterface, WrappedPaginator, use_file_check
+from jishaku.types import ContextA
+
+
+class MemoryFeature(Feature):
+    """
+    Feature containing the memory inspection commands
+    """
+
+    # The maximum amount of named tracemalloc snapshots kept at once
+    MAX_SNAPSHOTS = 8
+    # The maximum amount of object censuses kept at once
+    MAX_CENSUSES = 8
+
+    def __init__(self, *args: typing.Any, **kwargs: typing.Any):
+        super().__init__(*args, **kwargs)
+        self.snapshots: typing.OrderedDict[str, tracemalloc.Snapshot] = collections.OrderedDict()
+        # How many snapshots have been taken, used to name unnamed snapshots
+        self.snapshot_count: int = 0
+        self.censuses: typing.Deque[Census] = collections.deque(maxlen=self.MAX_CENSUSES)
+
+    async def send_memory_report(self, ctx: ContextA, text: str, filename: str):
+        """
+        Sends a text report as a file if possible, otherwise through a paginator.
+        """
+
+        if use_file_check(ctx, len(text)):
+            return await ctx.send(file=discord.File(
+                filename=filename,
+                fp=io.BytesIO(text.encode('utf-8'))
+            ))
+
+        paginator = WrappedPaginator(prefix='```prolog', max_size=1980)
+        paginator.add_line(text)
+
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        return await interface.send_to(ctx)
+
+    @Feature.Command(parent="jsk", name="tracemalloc", aliases=["tm"], invoke_without_command=True, ignore_extra=False)
+    async def jsk_tracemalloc(self, ctx: ContextA):
+        """
+        Allocation tracing commands.
+
+        If invoked without subcommand, shows the tracing status and stored snapshots.
+        """
+
+        if not tracemalloc.is_tracing():
+            lines = ["tracemalloc is not tracing."]
+        else:
+            current, peak = tracemalloc.get_traced_memory()
+            lines = [
+                f"tracemalloc is tracing {tracemalloc.get_traceback_limit()} frame(s) per allocation.",
+                f"Traced memory: {natural_size(current)} (peak {natural_size(peak)}), "
+                f"tracing overhead: {natural_size(tracemalloc.get_tracemalloc_memory())}",
+            ]
+
+        if self.snapshots:
+            lines.append(f"Snapshots: {', '.join(f'`{name}`' for name in self.snapshots)}")
+
+        await ctx.send("\n".join(lines))
+
+    @Feature.Command(parent="jsk_tracemalloc", name="start")
+    async def jsk_tracemalloc_start(self, ctx: ContextA, frames: int = 1):
+        """
+        Starts tracing allocations, storing the given amount of frames per allocation.
+
+        More frames give more useful tracebacks, but use more memory and slow allocations down further.
+        """
+
+        if tracemalloc.is_tracing():
+            return await ctx.send("tracemalloc is already tracing.")
+
+        if not 1 <= frames <= 100:
+            raise commands.BadArgument("Frame count must be between 1 and 100.")
+
+        tracemalloc.start(frames)
+        await ctx.send(f"tracemalloc is now tracing {frames} frame(s) per allocation.")
+
+    @Feature.Command(parent="jsk_tracemalloc", name="stop")
+    async def jsk_tracemalloc_stop(self, ctx: ContextA):
+        """
+        Stops tracing allocations. Stored snapshots are kept.
+        """
+
+        if not tracemalloc.is_tracing():
+            return await ctx.send("tracemalloc is not tracing.")
+
+        tracemalloc.stop()
+        await ctx.send("tracemalloc has stopped tracing.")
+
+    @Feature.Command(parent="jsk_tracemalloc", name="snapshot", aliases=["snap"])
+    async def jsk_tracemalloc_snapshot(self, ctx: ContextA, name: typing.Optional[str] = None):
+        """
+        Takes and stores a named snapshot of the currently traced allocations.
+
+        Only the most recent snapshots are kept.
+        """
+
+        if not tracemalloc.is_tracing():
+            return await ctx.send("tracemalloc is not tracing, use `jsk tracemalloc start` first.")
+
+        self.snapshot_count += 1
+        name = name or f"snapshot{self.snapshot_count}"
+
+        @executor_function
+        def take_snapshot_and_size() -> typing.Tuple[tracemalloc.Snapshot, int]:
+            snapshot = take_snapshot()
+            return snapshot, sum(stat.size for stat in snapshot.statistics('filename'))
+
+        async with ReplResponseReactor(ctx.message):
+            snapshot, size = await take_snapshot_and_size()
+
+        self.snapshots.pop(name, None)
+        self.snapshots[name] = snapshot
+
+        while len(self.snapshots) > self.MAX_SNAPSHOTS:
+            self.snapshots.popitem(last=False)
+
+        await ctx.send(f"Stored snapshot `{name}` ({natural_size(size)} traced).")
+
+    @Feature.Command(parent="jsk_tracemalloc", name="diff", aliases=["compare"])
+    async def jsk_tracemalloc_diff(self, ctx: ContextA, old: str, *arguments: str):
+        """
+        Compares two stored snapshots.
+
+        If the second snapshot is not given, a new snapshot is taken to compare against.
+        Results can be grouped by 'lineno', 'filename' or 'traceback', given after the snapshots.
+        """
+
+        if len(arguments) > 2:
+            raise commands.BadArgument("Expected at most a snapshot name and a grouping after the first snapshot.")
+
+        new: typing.Optional[str] = None
+        group_by = 'lineno'
+
+        # A grouping can be given without a second snapshot, so it is recognized before treating it as a snapshot name
+        if arguments and arguments[-1] in SNAPSHOT_GROUPINGS:
+            group_by = arguments[-1]
+            arguments = arguments[:-1]
+
+        if len(arguments) == 2:
+            raise commands.BadArgument(f"Grouping must be one of {', '.join(SNAPSHOT_GROUPINGS)}")
+
+        if arguments:
+            new = arguments[0]
+
+        try:
+            old_snapshot = self.snapshots[old]
+            new_snapshot = self.snapshots[new] if new else None
+        except KeyError as error:
+            return await ctx.send(f"No snapshot named `{error.args[0]}`.")
+
+        async with ReplResponseReactor(ctx.message):
+            if new_snapshot is None:
+                if not tracemalloc.is_tracing():
+                    return await ctx.send("tracemalloc is not tracing, so a new snapshot can't be taken.")
+
+                new_snapshot = await executor_function(take_snapshot)()
+
+            text = await executor_function(format_snapshot_diff)(old_snapshot, new_snapshot, group_by)
+
+        await self.send_memory_report(ctx, text, "tracemalloc.txt")
+
+    @Feature.Command(parent="jsk", name="census", aliases=["objects"])
+    async def jsk_census(self, ctx: ContextA, limit: int = 20):
+        """
+        Counts live objects by type, showing which types grew since the last census.
+
+        Objects are counted in an executor so the bot keeps responding while the census runs.
+        """
+
+        async with ReplResponseReactor(ctx.message):
+            census = await executor_function(take_census)()
+
+        previous = self.censuses[-1] if self.censuses else None
+        self.censuses.append(census)
+
+        generations = ", ".join(
+            f"gen {index}: count {count}, {collected} collections"
+            for index, (count, collected) in enumerate(zip(census.gc_counts, census.collections))
+        )
+        lines = [f"{census.total} tracked objects ({generations})", ""]
+
+        if previous is None:
+            lines.append("Most common types (run again to see growth):")
+            lines.extend(f"{count:>10} {name}" for name, count in census.counts.most_common(limit))
+            discord_types = [
+                (name, count, 0) for name, count in census.counts.most_common()
+                if name.startswith('discord.')
+            ]
+        else:
+            growth = census_growth(previous, census)
+            lines.append(
+                f"Change since the census {census.taken_at - previous.taken_at:.0f}s ago: "
+                f"{census.total - previous.total:+} objects"
+            )
+            lines.extend(f"{count:>10} {delta:>+8} {name}" for name, count, delta in growth[:limit] if delta > 0)
+            discord_types = sorted(
+                (
+                    (name, count, count - previous.counts[name]) for name, count in census.counts.items()
+                    if name.startswith('discord.')
+                ),
+                key=lambda entry: entry[1],
+                reverse=True
+            )
+
+        if discord_types:
+            lines.extend(["", "discord.py objects:"])
+            lines.extend(f"{count:>10} {delta:>+8} {name}" for name, count, delta in discord_types[:limit])
+
+        await self.send_memory_report(ctx, "\n".join(lines), "census.txt")
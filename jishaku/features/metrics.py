@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.features.metrics
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+The jishaku metrics commands.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import io
+import time
+import typing
+
+import discord
+from discord.ext import commands
+
+from jishaku.features.baseclass import Feature
+from jishaku.flags import Flags
+from jishaku.math import natural_time
+from jishaku.metrics import CommandMetrics, HTTPMetrics, LoopLagMonitor, MetricsServer, bot_metrics, process_metrics
+from jishaku.paginators import PaginatorInterface, WrappedPaginator
+from jishaku.types import ContextA
+
+
+class MetricsFeature(Feature):
+    """
+    Feature containing the metrics commands
+    """
+
+    # Ways jsk http can order routes by
+    HTTP_ORDERINGS = ('mean', 'p90', 'max', 'count', 'errors', 'ratelimited')
+    # Ways jsk stats can order commands by
+    COMMAND_ORDERINGS = ('count', 'mean', 'p90', 'max', 'errors', 'peak')
+
+    def __init__(self, *args: typing.Any, **kwargs: typing.Any):
+        super().__init__(*args, **kwargs)
+        self.http_metrics: HTTPMetrics = HTTPMetrics()
+        self.command_metrics: CommandMetrics = CommandMetrics()
+        self.loop_lag: LoopLagMonitor = LoopLagMonitor()
+        self.metrics_server: MetricsServer = MetricsServer(self.prometheus_export)
+
+        if Flags.HTTP_METRICS:
+            self.http_metrics.install(self.bot.http)
+
+    async def cog_load(self):
+        if Flags.METRICS_PORT:
+            self.loop_lag.start()
+            await self.metrics_server.start(Flags.METRICS_HOST, Flags.METRICS_PORT)
+
+        return await super().cog_load()
+
+    def cog_unload(self):
+        self.http_metrics.uninstall()
+        self.loop_lag.stop()
+
+        if self.metrics_server.runner is not None:
+            self.bot.loop.create_task(self.metrics_server.stop())
+
+        return super().cog_unload()
+
+    @Feature.Command(parent="jsk", name="http", invoke_without_command=True, ignore_extra=False)
+    async def jsk_http(self, ctx: ContextA, order: str = 'mean', limit: int = 15):
+        """
+        Shows the slowest REST routes the bot has made requests to, and how long was spent rate limited.
+
+        Routes can be ordered by mean, p90, max, count, errors or ratelimited.
+        Use `jsk http start` to start recording requests.
+        """
+
+        if order not in self.HTTP_ORDERINGS:
+            return await ctx.send(f"Can't order by {order!r}, expected any of {', '.join(self.HTTP_ORDERINGS)}.")
+
+        metrics = self.http_metrics
+
+        if not metrics.installed and not metrics.routes:
+            return await ctx.send("HTTP requests are not being recorded, use `jsk http start` to start.")
+
+        sort_keys: typing.Dict[str, typing.Callable[[typing.Any], float]] = {
+            'mean': lambda stats: stats.latency.mean,
+            'p90': lambda stats: stats.latency.quantile(0.9),
+            'max': lambda stats: stats.latency.maximum,
+            'count': lambda stats: stats.latency.count,
+            'errors': lambda stats: stats.errors,
+            'ratelimited': lambda stats: stats.rate_limited,
+        }
+
+        routes = sorted(metrics.routes.items(), key=lambda item: sort_keys[order](item[1]), reverse=True)
+        requests = sum(stats.latency.count for stats in metrics.routes.values())
+        rate_limits = sum(stats.rate_limits for stats in metrics.routes.values())
+
+        paginator = WrappedPaginator(prefix='```', suffix='```', max_size=1980)
+        paginator.add_line(
+            f"{requests} request(s) to {len(routes)} route(s) in the last "
+            f"{natural_time(time.time() - metrics.started_at).strip()}"
+            f"{'' if metrics.installed else ' (not recording)'}"
+        )
+        paginator.add_line(
+            f"Rate limited {rate_limits} time(s), waiting {natural_time(metrics.rate_limited).strip()} in total",
+            empty=True
+        )
+
+        for key, stats in routes[:max(limit, 1)]:
+            statuses = ", ".join(f"{status}: {count}" for status, count in stats.statuses.most_common())
+            paginator.add_line(key)
+            paginator.add_line(
+                f"  {stats.latency.count} request(s), mean {natural_time(stats.latency.mean).strip()}, "
+                f"p90 {natural_time(stats.latency.quantile(0.9)).strip()}, max {natural_time(stats.latency.maximum).strip()}"
+            )
+            paginator.add_line(f"  Statuses: {statuses or 'none'}")
+
+            if stats.rate_limits:
+                paginator.add_line(
+                    f"  Rate limited {stats.rate_limits} time(s), waiting {natural_time(stats.rate_limited).strip()}"
+                )
+
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        return await interface.send_to(ctx)
+
+    @Feature.Command(parent="jsk_http", name="start")
+    async def jsk_http_start(self, ctx: ContextA):
+        """
+        Starts recording the latency and status of every request the bot makes.
+        """
+
+        if self.http_metrics.installed:
+            return await ctx.send("HTTP requests are already being recorded.")
+
+        self.http_metrics.install(self.bot.http)
+        await ctx.send("Now recording HTTP requests.")
+
+    @Feature.Command(parent="jsk_http", name="stop")
+    async def jsk_http_stop(self, ctx: ContextA):
+        """
+        Stops recording requests. What was recorded so far is kept.
+        """
+
+        if not self.http_metrics.installed:
+            return await ctx.send("HTTP requests are not being recorded.")
+
+        self.http_metrics.uninstall()
+        await ctx.send("Stopped recording HTTP requests.")
+
+    @Feature.Command(parent="jsk_http", name="reset", aliases=["clear"])
+    async def jsk_http_reset(self, ctx: ContextA):
+        """
+        Forgets the requests recorded so far.
+        """
+
+        self.http_metrics.reset()
+        await ctx.send("Cleared recorded HTTP requests.")
+
+    @Feature.listener('on_command')
+    async def jsk_metrics_command(self, ctx: ContextA):
+        """
+        Records the start of a prefix command invocation.
+        """
+
+        self.command_metrics.start_context(ctx)
+
+    @Feature.listener('on_command_completion')
+    async def jsk_metrics_command_completion(self, ctx: ContextA):
+        """
+        Records the successful end of a prefix command invocation.
+        """
+
+        self.command_metrics.finish_context(ctx)
+
+    @Feature.listener('on_command_error')
+    async def jsk_metrics_command_error(self, ctx: ContextA, error: commands.CommandError):
+        """
+        Records the failed end of a prefix command invocation.
+        """
+
+        self.command_metrics.finish_context(ctx, error)
+
+    @Feature.listener('on_interaction')
+    async def jsk_metrics_interaction(self, interaction: discord.Interaction):
+        """
+        Records the start of an application command invocation.
+        """
+
+        if interaction.type == discord.InteractionType.application_command:
+            self.command_metrics.start_interaction(interaction)
+
+    @Feature.listener('on_app_command_completion')
+    async def jsk_metrics_app_command_completion(self, interaction: discord.Interaction, _command: typing.Any):
+        """
+        Records the successful end of an application command invocation.
+        """
+
+        self.command_metrics.finish_interaction(interaction)
+
+    def prometheus_export(self) -> str:
+        """
+        Returns every recorded metric in the Prometheus text format,
+        along with the current state of the bot and process.
+        """
+
+        lines = self.command_metrics.prometheus()
+
+        if self.http_metrics.routes:
+            lines.extend(self.http_metrics.prometheus())
+
+        if self.loop_lag.task is not None:
+            lines.extend(self.loop_lag.prometheus())
+
+        lines.extend(bot_metrics(self.bot))
+        lines.extend(process_metrics())
+
+        return "\n".join(lines) + "\n"
+
+    @Feature.Command(parent="jsk", name="stats", invoke_without_command=True, ignore_extra=False)
+    async def jsk_stats(self, ctx: ContextA, order: str = 'count', limit: int = 15):
+        """
+        Shows the latency, errors and concurrency of commands invoked since the cog was loaded.
+
+        Commands can be ordered by count, mean, p90, max, errors or peak (concurrency).
+        Application commands are prefixed with a slash.
+        """
+
+        if order not in self.COMMAND_ORDERINGS:
+            return await ctx.send(f"Can't order by {order!r}, expected any of {', '.join(self.COMMAND_ORDERINGS)}.")
+
+        metrics = self.command_metrics
+        metrics.sweep()
+
+        sort_keys: typing.Dict[str, typing.Callable[[typing.Any], float]] = {
+            'count': lambda stats: stats.invocations,
+            'mean': lambda stats: stats.latency.mean,
+            'p90': lambda stats: stats.latency.quantile(0.9),
+            'max': lambda stats: stats.latency.maximum,
+            'errors': lambda stats: sum(stats.errors.values()),
+            'peak': lambda stats: stats.peak_active,
+        }
+
+        stats_list = sorted(metrics.commands.items(), key=lambda item: sort_keys[order](item[1]), reverse=True)
+        active = metrics.active()
+        invocations = sum(stats.invocations for _, stats in stats_list)
+        errors = sum(sum(stats.errors.values()) for _, stats in stats_list)
+
+        paginator = WrappedPaginator(prefix='```', suffix='```', max_size=1980)
+        paginator.add_line(
+            f"{invocations} invocation(s) of {len(stats_list)} command(s), {errors} failed, in the last "
+            f"{natural_time(time.time() - metrics.started_at).strip()}",
+            empty=not self.metrics_server.url
+        )
+
+        if self.metrics_server.url:
+            paginator.add_line(f"Serving metrics at {self.metrics_server.url}", empty=True)
+
+        for name, stats in stats_list[:max(limit, 1)]:
+            paginator.add_line(name)
+            paginator.add_line(
+                f"  {stats.invocations} invocation(s), mean {natural_time(stats.latency.mean).strip()}, "
+                f"p90 {natural_time(stats.latency.quantile(0.9)).strip()}, max {natural_time(stats.latency.maximum).strip()}"
+            )
+            paginator.add_line(f"  {active[name]} running, at most {stats.peak_active} at once")
+
+            if stats.errors:
+                paginator.add_line(
+                    "  Errors: " + ", ".join(f"{error}: {count}" for error, count in stats.errors.most_common())
+                )
+
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        return await interface.send_to(ctx)
+
+    @Feature.Command(parent="jsk_stats", name="export", aliases=["prometheus"])
+    async def jsk_stats_export(self, ctx: ContextA):
+        """
+        Sends the recorded command and HTTP metrics, along with bot and process metrics, as a file in the Prometheus text format.
+        """
+
+        await ctx.send(file=discord.File(
+            filename="metrics.prom",
+            fp=io.BytesIO(self.prometheus_export().encode('utf-8'))
+        ))
+
+    @Feature.Command(parent="jsk_stats", name="reset", aliases=["clear"])
+    async def jsk_stats_reset(self, ctx: ContextA):
+        """
+        Forgets the command invocations recorded so far.
+        """
+
+        self.command_metrics.reset()
+        await ctx.send("Cleared recorded command invocations.")
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.features.profiling
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+The jishaku profiling commands.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import io
+
+import discord
+from discord.ext import commands
+
+from jishaku.exception_handling import ReplResponseReactor
+from jishaku.features.baseclass import Feature
+from jishaku.paginators import PaginatorInterface, WrappedPaginator
+from jishaku.profiling import StackSampler
+from jishaku.types import ContextA
+
+
+class ProfilingFeature(Feature):
+    """
+    Feature containing the profiling commands
+    """
+
+    @Feature.Command(parent="jsk", name="profile")
+    async def jsk_profile(self, ctx: ContextA, seconds: float = 10.0, rate: int = 200):
+        """
+        Profiles the whole running bot for a number of seconds.
+
+        This samples the stack of every thread `rate` times per second, labelling
+        samples from the event loop with the asyncio task that was running.
+        The result is uploaded in the collapsed stack format used by flamegraph tools.
+        """
+
+        if not 0 < seconds <= 600:
+            raise commands.BadArgument("Profiling duration must be between 0 and 600 seconds.")
+
+        if not 1 <= rate <= 1000:
+            raise commands.BadArgument("Sampling rate must be between 1 and 1000 samples per second.")
+
+        sampler = StackSampler(interval=1 / rate)
+
+        async with ReplResponseReactor(ctx.message):
+            with self.submit(ctx):
+                with sampler:
+                    await asyncio.sleep(seconds)
+
+        if not sampler.samples:
+            return await ctx.send("No samples were collected.")
+
+        await ctx.send(
+            f"Collected {sampler.sample_count} samples over {seconds:.1f}s.",
+            file=discord.File(
+                filename="profile.collapsed",
+                fp=io.BytesIO(sampler.collapsed().encode('utf-8'))
+            )
+        )
+
+        paginator = WrappedPaginator(prefix='```prolog', max_size=1980)
+        paginator.add_line(f"{'own':>7} {'total':>7}  frame")
+
+        for entry in sampler.summary()[:50]:
+            own = entry.own / sampler.sample_count
+            total = entry.total / sampler.sample_count
+            paginator.add_line(f"{own:7.2%} {total:7.2%}  {entry.frame}")
+
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        return await interface.send_to(ctx)
@@ -8,6 +8,8 @@ The jishaku root command.
 
 """
 
+import collections
+import gc
 import sys
 import typing
 import os
@@ -15,9 +17,12 @@ import zipfile
 import discord
 from discord.ext import commands
 from jishaku.features.baseclass import Feature
-from jishaku.math import natural_size
+from jishaku.functools import executor_function
+from jishaku.math import natural_size, natural_time
+from jishaku.memory import collect_garbage
 from jishaku.modules import package_version
-from jishaku.paginators import PaginatorInterface
+from jishaku.paginators import PaginatorInterface, WrappedPaginator
+from jishaku.tasks import TaskSnapshot, format_task_groups, take_task_snapshot, task_growth
 from jishaku.types import ContextA
 
 try:
@@ -27,9 +32,13 @@ except ImportError:
 
 
 class RootCommand(Feature):
+    # The maximum amount of task snapshots kept for jsk tasks diff
+    MAX_TASK_SNAPSHOTS = 8
+
     def __init__(self, *args: typing.Any, **kwargs: typing.Any):
         super().__init__(*args, **kwargs)
         self.jsk.hidden = True
+        self.task_snapshots: typing.Deque[TaskSnapshot] = collections.deque(maxlen=self.MAX_TASK_SNAPSHOTS)
 
     @Feature.Command(name="aniflax", aliases=["ani"], invoke_without_command=True, ignore_extra=False)
     async def jsk(self, ctx: ContextA):
@@ -78,20 +87,85 @@ class RootCommand(Feature):
         self.jsk.hidden = False
         await ctx.send("Aniflax is now visible.")
 
-    @Feature.Command(parent="jsk", name="tasks")
+    @Feature.Command(parent="jsk", name="tasks", invoke_without_command=True, ignore_extra=False)
     async def jsk_tasks(self, ctx: ContextA):
         if not self.tasks:
             return await ctx.send("No currently running tasks.")
 
         paginator = commands.Paginator(max_size=1980)
 
-        for task in self.tasks:
-            if task.ctx.command:
-                paginator.add_line(f"{task.index}: `{task.ctx.command.qualified_name}`, invoked at "
-                                   f"{task.ctx.message.created_at.strftime('%Y-%m-%d %H:%M:%S')} UTC")
+        for task in self.tasks.values():
+            name = f"`{task.ctx.command.qualified_name}`" if task.ctx.command else "unknown"
+            resources = "".join(f", {key} {value}" for key, value in task.resources.items())
+            paginator.add_line(f"{task.index}: {name}, invoked at "
+                               f"{task.ctx.message.created_at.strftime('%Y-%m-%d %H:%M:%S')} UTC, "
+                               f"running for {natural_time(task.elapsed).strip()}{resources}")
+
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        return await interface.send_to(ctx)
+
+    @Feature.Command(parent="jsk_tasks", name="all", aliases=["asyncio"])
+    async def jsk_tasks_all(self, ctx: ContextA, *arguments: str):
+        """
+        Shows every unfinished asyncio task in the process, grouped by coroutine, with the most common first.
+
+        Arguments are an optional filter on coroutine names, and an optional amount of stacks, in either order.
+        Each group shows the await stack of up to that many of its oldest tasks (1 by default).
+        Ages count from when a task was first seen by this command or `jsk tasks diff`.
+        """
+
+        name_filter: typing.Optional[str] = None
+        stacks = 1
+
+        for argument in arguments:
+            if argument.isdigit():
+                stacks = int(argument)
+            elif name_filter is None:
+                name_filter = argument
             else:
-                paginator.add_line(f"{task.index}: unknown, invoked at "
-                                   f"{task.ctx.message.created_at.strftime('%Y-%m-%d %H:%M:%S')} UTC")
+                raise commands.BadArgument("Expected at most one name filter and one amount of stacks.")
+
+        lines = format_task_groups(name_filter, stacks=max(min(stacks, 20), 0))
+
+        paginator = WrappedPaginator(prefix='```', suffix='```', max_size=1980)
+
+        for line in lines:
+            paginator.add_line(line)
+
+        interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
+        return await interface.send_to(ctx)
+
+    @Feature.Command(parent="jsk_tasks", name="diff", aliases=["growth"])
+    async def jsk_tasks_diff(self, ctx: ContextA, limit: int = 20):
+        """
+        Counts every unfinished asyncio task by coroutine, showing which grew since the last count.
+
+        Coroutines whose task count keeps growing between runs are likely leaking tasks.
+        """
+
+        snapshot = take_task_snapshot()
+        previous = self.task_snapshots[-1] if self.task_snapshots else None
+        self.task_snapshots.append(snapshot)
+
+        if previous is None:
+            lines = [f"{snapshot.total} unfinished task(s). Most common coroutines (run again to see growth):", ""]
+            lines.extend(f"{count:>6} {name}" for name, count in snapshot.counts.most_common(limit))
+        else:
+            growth = task_growth(previous, snapshot)
+            lines = [
+                f"{snapshot.total} unfinished task(s), {snapshot.total - previous.total:+} "
+                f"since the count {snapshot.taken_at - previous.taken_at:.0f}s ago:",
+                ""
+            ]
+            lines.extend(f"{count:>6} {delta:>+6} {name}" for name, count, delta in growth[:limit])
+
+            if not growth:
+                lines.append("No coroutine's task count changed.")
+
+        paginator = WrappedPaginator(prefix='```', suffix='```', max_size=1980)
+
+        for line in lines:
+            paginator.add_line(line)
 
         interface = PaginatorInterface(ctx.bot, paginator, owner=ctx.author)
         return await interface.send_to(ctx)
@@ -103,7 +177,7 @@ class RootCommand(Feature):
 
         if index == "~":
             task_count = len(self.tasks)
-            for task in self.tasks:
+            for task in self.tasks.values():
                 if task.task:
                     task.task.cancel()
             self.tasks.clear()
@@ -113,12 +187,10 @@ class RootCommand(Feature):
             raise commands.BadArgument('Literal for "index" not recognized.')
 
         if index == -1:
-            task = self.tasks.pop()
+            _, task = self.tasks.popitem()
         else:
-            task = discord.utils.get(self.tasks, index=index)
-            if task:
-                self.tasks.remove(task)
-            else:
+            task = self.tasks.pop(index, None)
+            if not task:
                 return await ctx.send("Unknown task.")
 
         if task.task:
@@ -157,23 +229,37 @@ class RootCommand(Feature):
         os.remove(zip_filename)
 
     @Feature.Command(parent="jsk", name="memory")
-    async def jsk_memory(self, ctx: ContextA):
+    async def jsk_memory(self, ctx: ContextA, collect: bool = False):
+        lines: typing.List[str] = []
+
         if psutil:
             proc = psutil.Process()
-            mem_info = proc.memory_full_info()
-            memory_summary = (
-                f"RSS: {natural_size(mem_info.rss)}\n"
-                f"VMS: {natural_size(mem_info.vms)}\n"
-                f"Shared: {natural_size(mem_info.shared)}\n"
-                f"Text: {natural_size(mem_info.text)}\n"
-                f"Lib: {natural_size(mem_info.lib)}\n"
-                f"Data: {natural_size(mem_info.data)}\n"
-                f"Dirty: {natural_size(mem_info.dirty)}"
-            )
-            await ctx.send(f"Memory Info:\n```\n{memory_summary}\n```")
+            # memory_full_info reads /proc/pid/smaps on Linux, which is slow for large processes
+            mem_info = await executor_function(proc.memory_full_info)()
+
+            # Which of these are available depends on the platform
+            for field, label in (
+                ('rss', 'RSS'), ('vms', 'VMS'), ('uss', 'USS'), ('pss', 'PSS'), ('swap', 'Swap'),
+                ('shared', 'Shared'), ('text', 'Text'), ('lib', 'Lib'), ('data', 'Data'), ('dirty', 'Dirty'),
+            ):
+                value = getattr(mem_info, field, None)
+                if value is not None:
+                    lines.append(f"{label}: {natural_size(value)}")
         else:
-            await ctx.send("psutil is not available, cannot retrieve memory info.")
+            lines.append("psutil is not available, cannot retrieve memory info.")
+
+        lines.append("")
+        lines.append(f"GC {'enabled' if gc.isenabled() else 'DISABLED'}, thresholds {gc.get_threshold()}, "
+                     f"pending counts {gc.get_count()}, {gc.get_freeze_count()} frozen objects")
+
+        for generation, stats in enumerate(gc.get_stats()):
+            lines.append(f"Gen {generation}: {stats['collections']} collections, {stats['collected']} collected, "
+                         f"{stats['uncollectable']} uncollectable")
+
+        if collect:
+            collected, duration = collect_garbage()
+            lines.append("")
+            lines.append(f"Full collection: {collected} objects collected in {natural_time(duration).strip()}")
 
-        import gc
-        gc.collect()
-        await ctx.send("Garbage collection run.")
+        memory_summary = "\n".join(lines)
+        await ctx.send(f"Memory Info:\n```\n{memory_summary}\n```")
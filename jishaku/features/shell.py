@@ -114,8 +114,9 @@ class ShellFeature(Feature):
             argument: Codeblock = argument  # type: ignore
 
         async with ReplResponseReactor(ctx.message):
-            with self.submit(ctx):
+            with self.submit(ctx) as command_task:
                 with ShellReader(argument.content, escape_ansi=not Flags.use_ansi(ctx)) as reader:
+                    command_task.resources['pid'] = reader.process.pid
                     prefix = "```" + reader.highlight
 
                     paginator = WrappedPaginator(prefix=prefix, max_size=1975)
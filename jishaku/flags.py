@@ -183,6 +183,35 @@ class Flags(metaclass=FlagMeta):  # pylint: disable=too-few-public-methods
         # Otherwise let the caller decide
         return None
 
+    # Flag to indicate permtrace and permaudit should cache results in an index kept up to date by gateway events
+    PERMISSION_INDEX: bool
+
+    # The amount of extensions jsk load and jsk reload will load at the same time
+    LOAD_CONCURRENCY: int = 1
+
+    # The file jsk sync stores the hashes of synced command payloads in, so unchanged targets are skipped across restarts.
+    # If unset, the hashes are only kept in memory.
+    SYNC_HASH_FILE: str
+
+    # Flag to indicate the latency and status of every request made by the bot's REST client should be recorded from startup
+    HTTP_METRICS: bool
+
+    # The port to serve metrics in the Prometheus text format on, at /metrics. If unset, metrics aren't served.
+    METRICS_PORT: int = 0
+
+    # The address the metrics endpoint binds to. This should stay local unless the endpoint is behind something that restricts access.
+    METRICS_HOST: str = '127.0.0.1'
+
+    # The amount of seconds a command-task can run for before it is cancelled. If unset, tasks can run forever.
+    TASK_TIMEOUT: int = 0
+
+    # The amount of seconds of process CPU time a command-task can use before it is cancelled. If unset, CPU time isn't limited.
+    TASK_CPU_LIMIT: int = 0
+
+    # The amount of MiB the process' resident memory can grow by while a command-task runs before it is cancelled.
+    # If unset, or psutil isn't installed, memory isn't limited.
+    TASK_MEMORY_LIMIT: int = 0
+
     # Flag to indicate usage of braille J in shutdown command
     USE_BRAILLE_J: bool
 
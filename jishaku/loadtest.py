@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.loadtest
+~~~~~~~~~~~~~~~~
+
+Functions for running an invocation many times concurrently and summarizing how it performed.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import collections
+import time
+import typing
+
+from jishaku.math import mean_stddev, natural_time, percentile
+
+__all__ = ('LoadTestResult', 'run_load', 'format_load_result')
+
+
+class LoadTestResult(typing.NamedTuple):
+    """
+    The outcome of a load test.
+
+    ``latencies`` holds how long each finished invocation took in seconds, in the order they finished,
+    including those that failed. ``errors`` counts failed invocations by exception type name.
+    """
+
+    latencies: typing.List[float]
+    errors: typing.Counter[str]
+    elapsed: float
+    peak_concurrency: int
+
+    @property
+    def throughput(self) -> float:
+        """
+        The amount of invocations finished per second.
+        """
+
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+
+async def run_load(
+    invoke: typing.Callable[[int], typing.Awaitable[typing.Any]],
+    times: int,
+    concurrency: int = 1,
+    rate: float = 0.0
+) -> LoadTestResult:
+    """
+    Calls ``invoke`` with each index from 0 to ``times``, awaiting up to ``concurrency`` of them at once.
+
+    If ``rate`` is given, invocations are started no faster than that many per second,
+    on a fixed schedule so that slow invocations don't push later ones back further than they have to.
+
+    Exceptions raised by ``invoke`` are counted rather than propagated, except cancellation,
+    which cancels every invocation in progress.
+    """
+
+    indices = iter(range(times))
+    latencies: typing.List[float] = []
+    errors: typing.Counter[str] = collections.Counter()
+    active = 0
+    peak = 0
+    start = time.perf_counter()
+
+    async def worker():
+        nonlocal active, peak
+
+        for index in indices:
+            if rate:
+                await asyncio.sleep(start + index / rate - time.perf_counter())
+
+            active += 1
+            peak = max(peak, active)
+            began = time.perf_counter()
+
+            try:
+                await invoke(index)
+            except Exception as error:  # pylint: disable=broad-except
+                errors[type(getattr(error, 'original', None) or error).__name__] += 1
+            finally:
+                latencies.append(time.perf_counter() - began)
+                active -= 1
+
+    await asyncio.gather(*(worker() for _ in range(max(min(concurrency, times), 1))))
+
+    return LoadTestResult(latencies, errors, time.perf_counter() - start, peak)
+
+
+def format_load_result(result: LoadTestResult) -> typing.List[str]:
+    """
+    Returns a summary of a load test's throughput, latency percentiles and errors.
+    """
+
+    lines = [
+        f"{len(result.latencies)} invocation(s) in {natural_time(result.elapsed).strip()}, "
+        f"{result.throughput:.2f}/s, at most {result.peak_concurrency} at once",
+    ]
+
+    if result.latencies:
+        average, stddev = mean_stddev(result.latencies)
+        lines.append(f"Latency: mean {natural_time(average).strip()} \N{PLUS-MINUS SIGN} {natural_time(stddev).strip()}")
+        lines.append(", ".join(
+            f"{label} {natural_time(percentile(result.latencies, fraction)).strip()}"
+            for label, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))
+        ))
+
+    failed = sum(result.errors.values())
+
+    if failed:
+        lines.append(
+            f"{failed} failed: " + ", ".join(f"{error}: {count}" for error, count in result.errors.most_common())
+        )
+    else:
+        lines.append("No errors")
+
+    return lines
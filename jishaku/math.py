@@ -68,6 +68,27 @@ def mean_stddev(collection: typing.Collection[float]) -> typing.Tuple[float, flo
     return (average, stddev)
 
 
+def percentile(collection: typing.Iterable[float], fraction: float) -> float:
+    """
+    Takes a collection of floats and returns the value below which the given fraction (0 to 1) of them fall,
+    interpolating between the closest two readings.
+    E.g.:
+        [1, 2, 3, 4], 0.5 -> 2.5
+        [1, 2, 3, 4], 0.9 -> 3.7
+    """
+
+    readings = sorted(collection)
+
+    if not readings:
+        raise ValueError("Cannot take the percentile of an empty collection")
+
+    position = max(min(fraction, 1.0), 0.0) * (len(readings) - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(readings) - 1)
+
+    return readings[lower] + (readings[upper] - readings[lower]) * (position - lower)
+
+
 def format_stddev(collection: typing.Collection[float]) -> str:
     """
     Takes a collection of floats and produces a mean (+ stddev, if multiple values exist) string.
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.memory
+~~~~~~~~~~~~~~
+
+Functions for inspecting the memory usage of the running process.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import collections
+import gc
+import time
+import tracemalloc
+import typing
+
+from jishaku.math import natural_size
+
+__all__ = ('SNAPSHOT_GROUPINGS', 'take_snapshot', 'format_snapshot_diff', 'Census', 'take_census', 'census_growth',
+           'collect_garbage')
+
+SNAPSHOT_GROUPINGS = ('lineno', 'filename', 'traceback')
+
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    """
+    Takes a tracemalloc snapshot, excluding allocations made by tracemalloc and the import system.
+
+    Raises RuntimeError if tracemalloc is not tracing.
+    """
+
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+
+def format_snapshot_diff(
+    old: tracemalloc.Snapshot,
+    new: tracemalloc.Snapshot,
+    key_type: str = 'lineno',
+    limit: int = 25
+) -> str:
+    """
+    Compares two snapshots, returning a report of the locations whose allocations grew or shrank the most.
+
+    ``key_type`` can be any of ``SNAPSHOT_GROUPINGS``.
+    """
+
+    if key_type not in SNAPSHOT_GROUPINGS:
+        raise ValueError(f"Unknown grouping {key_type!r}, expected one of {', '.join(SNAPSHOT_GROUPINGS)}")
+
+    stats = new.compare_to(old, key_type)
+
+    total = sum(stat.size_diff for stat in stats)
+    lines = [f"Total change: {'+' if total >= 0 else '-'}{natural_size(abs(total))} across {len(stats)} locations", ""]
+
+    for index, stat in enumerate(stats[:limit], start=1):
+        lines.append(
+            f"#{index}: {'+' if stat.size_diff >= 0 else '-'}{natural_size(abs(stat.size_diff))} "
+            f"({stat.count_diff:+} blocks), now {natural_size(stat.size)} in {stat.count} blocks"
+        )
+
+        if key_type == 'traceback':
+            lines.extend(f"    {line}" for line in stat.traceback.format(most_recent_first=True))
+        else:
+            frame = stat.traceback[0]
+            lines.append(f"    {frame.filename}" if key_type == 'filename' else f"    {frame.filename}:{frame.lineno}")
+
+    return "\n".join(lines)
+
+
+class Census(typing.NamedTuple):
+    """
+    A count of live, garbage collector tracked objects by type.
+
+    ``gc_counts`` is :func:`gc.get_count` and ``collections`` is how many times each generation has been collected,
+    both as they were when the census was taken.
+    """
+
+    taken_at: float
+    counts: typing.Counter[str]
+    total: int
+    gc_counts: typing.Tuple[int, ...]
+    collections: typing.Tuple[int, ...]
+
+
+def type_name(kind: type) -> str:
+    """
+    Returns the fully qualified name of a type, e.g. ``discord.member.Member``.
+    """
+
+    module = getattr(kind, '__module__', None)
+    qualname = getattr(kind, '__qualname__', kind.__name__)
+
+    if module in (None, 'builtins'):
+        return qualname
+
+    return f"{module}.{qualname}"
+
+
+def take_census() -> Census:
+    """
+    Counts every object tracked by the garbage collector by type.
+
+    All generations are read at once, so objects promoted between generations while counting aren't counted twice.
+    This holds the GIL for as long as it runs, so it should be run in an executor.
+    """
+
+    objects = gc.get_objects()
+    by_type: typing.Counter[type] = collections.Counter(map(type, objects))
+    total = len(objects)
+    del objects
+
+    counts: typing.Counter[str] = collections.Counter()
+
+    for kind, count in by_type.items():
+        counts[type_name(kind)] += count
+
+    return Census(
+        time.time(),
+        counts,
+        total,
+        gc.get_count(),
+        tuple(stats['collections'] for stats in gc.get_stats())
+    )
+
+
+def census_growth(old: Census, new: Census) -> typing.List[typing.Tuple[str, int, int]]:
+    """
+    Compares two censuses, returning (type name, current count, change) for every type whose count changed,
+    sorted by the largest growth first.
+    """
+
+    changes = [
+        (name, new.counts[name], new.counts[name] - old.counts[name])
+        for name in set(old.counts) | set(new.counts)
+        if new.counts[name] != old.counts[name]
+    ]
+
+    changes.sort(key=lambda change: (change[2], change[1]), reverse=True)
+    return changes
+
+
+def collect_garbage() -> typing.Tuple[int, float]:
+    """
+    Runs a full garbage collection, returning (objects collected, seconds taken).
+
+    A collection of a generation also collects every younger generation,
+    so one full collection is all it takes to collect everything.
+    """
+
+    start = time.perf_counter()
+    collected = gc.collect(2)
+    return collected, time.perf_counter() - start
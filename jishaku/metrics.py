@@ -0,0 +1,786 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.metrics
+~~~~~~~~~~~~~~~
+
+Bounded metric stores, and instrumentation of the bot's REST client.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import bisect
+import collections
+import contextvars
+import logging
+import math
+import os
+import time
+import typing
+import weakref
+
+import discord
+from aiohttp import web
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+__all__ = (
+    'LATENCY_BUCKETS', 'Histogram', 'RouteStats', 'HTTPMetrics', 'CommandStats', 'CommandMetrics', 'prometheus_histogram',
+    'LoopLagMonitor', 'bot_metrics', 'process_metrics', 'MetricsServer'
+)
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS: typing.Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, float('inf')
+)
+
+# The route of the request currently being made in this context, so rate limit log records can be attributed to it
+CURRENT_ROUTE: 'contextvars.ContextVar[typing.Optional[str]]' = contextvars.ContextVar('jishaku_current_route', default=None)
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets, so memory use stays the same no matter how many are made.
+
+    Parameters
+    -----------
+    buckets: Sequence[float]
+        The ascending upper bounds of each bucket. The last should be infinity, so no observation is out of range.
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'minimum', 'maximum')
+
+    def __init__(self, buckets: typing.Sequence[float] = LATENCY_BUCKETS):
+        self.bounds: typing.Tuple[float, ...] = tuple(buckets)
+        self.counts: typing.List[int] = [0] * len(self.bounds)
+        self.count: int = 0
+        self.total: float = 0.0
+        self.minimum: float = float('inf')
+        self.maximum: float = 0.0
+
+    def observe(self, value: float):
+        """
+        Records an observation.
+        """
+
+        self.counts[min(bisect.bisect_left(self.bounds, value), len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def mean(self) -> float:
+        """
+        The mean of all observations, or 0 if there are none.
+        """
+
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, fraction: float) -> float:
+        """
+        Estimates the value below which the given fraction (0 to 1) of observations fall.
+
+        The estimate interpolates within the bucket the quantile falls in,
+        and is clamped to the smallest and largest observations seen.
+        """
+
+        if not self.count:
+            return 0.0
+
+        rank = max(min(fraction, 1.0), 0.0) * self.count
+        cumulative = 0
+
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = min(self.bounds[index], self.maximum)
+                estimate = lower + (upper - lower) * ((rank - cumulative) / count)
+                return max(min(estimate, self.maximum), self.minimum)
+
+            cumulative += count
+
+        return self.maximum
+
+    def cumulative(self) -> typing.List[typing.Tuple[float, int]]:
+        """
+        Returns (upper bound, observations at or below it) for each bucket, as used by Prometheus.
+        """
+
+        result: typing.List[typing.Tuple[float, int]] = []
+        running = 0
+
+        for bound, count in zip(self.bounds, self.counts):
+            running += count
+            result.append((bound, running))
+
+        return result
+
+
+def prometheus_labels(labels: typing.Dict[str, str]) -> str:
+    """
+    Formats labels for the Prometheus text format, escaping their values.
+    """
+
+    if not labels:
+        return ""
+
+    def escape(value: str) -> str:
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return "{" + ",".join(f'{name}="{escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def prometheus_value(value: float) -> str:
+    """
+    Formats a number for the Prometheus text format.
+    """
+
+    if value == float('inf'):
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_histogram(name: str, labels: typing.Dict[str, str], histogram: Histogram) -> typing.List[str]:
+    """
+    Returns the Prometheus text format samples of a histogram with the given labels.
+    """
+
+    lines = [
+        f"{name}_bucket{prometheus_labels({**labels, 'le': prometheus_value(bound)})} {count}"
+        for bound, count in histogram.cumulative()
+    ]
+
+    lines.append(f"{name}_sum{prometheus_labels(labels)} {prometheus_value(histogram.total)}")
+    lines.append(f"{name}_count{prometheus_labels(labels)} {histogram.count}")
+    return lines
+
+
+class RouteStats:  # pylint: disable=too-few-public-methods
+    """
+    The latencies, response statuses and rate limit waits of requests to one route.
+    """
+
+    __slots__ = ('latency', 'statuses', 'rate_limited', 'rate_limits')
+
+    def __init__(self):
+        self.latency: Histogram = Histogram()
+        self.statuses: typing.Counter[str] = collections.Counter()
+        # Seconds spent waiting for rate limits, and how many times one was hit
+        self.rate_limited: float = 0.0
+        self.rate_limits: int = 0
+
+    @property
+    def errors(self) -> int:
+        """
+        How many requests did not succeed.
+        """
+
+        return sum(count for status, count in self.statuses.items() if not status.startswith('2'))
+
+
+class RateLimitHandler(logging.Handler):
+    """
+    Picks up the rate limit warnings discord.py logs, recording how long each request will wait.
+    """
+
+    def __init__(self, metrics: 'HTTPMetrics'):
+        super().__init__(logging.WARNING)
+        self.metrics = metrics
+
+    def emit(self, record: logging.LogRecord):
+        message = str(record.msg)
+
+        # Only the warnings for a retried 429 and for a global rate limit carry the wait, as their last argument
+        if 'Retrying in' not in message or not isinstance(record.args, tuple) or not record.args:
+            return
+
+        if '429' not in message and not message.startswith('Global rate limit'):
+            return
+
+        try:
+            retry_after = float(record.args[-1])  # type: ignore
+        except (TypeError, ValueError):
+            return
+
+        self.metrics.record_rate_limit(CURRENT_ROUTE.get(), retry_after)
+
+
+class HTTPMetrics:
+    """
+    Records the latency and outcome of every request made through a :class:`discord.http.HTTPClient`.
+
+    Requests are grouped by route (method and path template, e.g. ``POST /channels/{channel_id}/messages``),
+    so the amount of routes tracked stays bounded.
+    Time spent waiting on rate limits that responded with a 429, including the global rate limit,
+    is taken from discord.py's log warnings, so it is only seen if the ``discord.http`` logger lets warnings through.
+    Waits for buckets discord.py already knew were exhausted are not logged by discord.py,
+    and are only reflected in the latency of the request.
+    """
+
+    def __init__(self):
+        self.routes: typing.Dict[str, RouteStats] = {}
+        self.started_at: float = time.time()
+        self.http: typing.Optional[typing.Any] = None
+        self.handler: RateLimitHandler = RateLimitHandler(self)
+        self.original_request: typing.Optional[typing.Callable[..., typing.Awaitable[typing.Any]]] = None
+
+    @property
+    def installed(self) -> bool:
+        """
+        Whether requests are currently being recorded.
+        """
+
+        return self.http is not None
+
+    def route(self, key: typing.Optional[str]) -> RouteStats:
+        """
+        Returns the stats for a route, creating them if needed.
+        """
+
+        key = key or 'unknown'
+
+        try:
+            return self.routes[key]
+        except KeyError:
+            stats = self.routes[key] = RouteStats()
+            return stats
+
+    def record_rate_limit(self, key: typing.Optional[str], seconds: float):
+        """
+        Records a wait on a rate limit.
+        """
+
+        stats = self.route(key)
+        stats.rate_limited += seconds
+        stats.rate_limits += 1
+
+    @property
+    def rate_limited(self) -> float:
+        """
+        The total time requests spent waiting on rate limits, in seconds.
+        """
+
+        return sum(stats.rate_limited for stats in self.routes.values())
+
+    def reset(self):
+        """
+        Forgets everything recorded so far.
+        """
+
+        self.routes.clear()
+        self.started_at = time.time()
+
+    async def request(self, route: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        """
+        Makes a request through the original HTTP client method, recording its latency and status.
+        """
+
+        assert self.original_request is not None
+
+        if self.http is None:
+            # Uninstalled, but something wrapped this method after it was installed, so it couldn't be removed
+            return await self.original_request(route, **kwargs)
+
+        key = f"{route.method} {route.path}"
+        token = CURRENT_ROUTE.set(key)
+        start = time.perf_counter()
+        status = '2xx'
+
+        try:
+            return await self.original_request(route, **kwargs)
+        except discord.HTTPException as error:
+            status = str(error.status)
+            raise
+        except Exception as error:
+            status = type(error).__name__
+            raise
+        finally:
+            stats = self.route(key)
+            stats.latency.observe(time.perf_counter() - start)
+            stats.statuses[status] += 1
+            CURRENT_ROUTE.reset(token)
+
+    def install(self, http: typing.Any):
+        """
+        Starts recording requests made through the given HTTP client (usually ``bot.http``).
+        """
+
+        if self.http is not None:
+            self.uninstall()
+
+        self.original_request = http.request
+        self.http = http
+        http.request = self.request
+
+        logging.getLogger('discord.http').addHandler(self.handler)
+
+    def uninstall(self):
+        """
+        Stops recording requests, restoring the HTTP client's original method.
+        """
+
+        logging.getLogger('discord.http').removeHandler(self.handler)
+
+        if self.http is None:
+            return
+
+        # Only remove the wrapper if nothing else has wrapped the method since
+        wrapper = self.http.__dict__.get('request')
+
+        if getattr(wrapper, '__func__', None) is HTTPMetrics.request and getattr(wrapper, '__self__', None) is self:
+            del self.http.request
+            self.original_request = None
+
+        self.http = None
+
+    def prometheus(self) -> typing.List[str]:
+        """
+        Returns the recorded requests in the Prometheus text format.
+        """
+
+        lines = [
+            "# HELP discord_http_request_duration_seconds Time taken by requests to the Discord API, including rate limit waits.",
+            "# TYPE discord_http_request_duration_seconds histogram",
+        ]
+
+        for key, stats in self.routes.items():
+            lines.extend(prometheus_histogram('discord_http_request_duration_seconds', {'route': key}, stats.latency))
+
+        lines.append("# HELP discord_http_responses_total Responses from the Discord API by status.")
+        lines.append("# TYPE discord_http_responses_total counter")
+
+        for key, stats in self.routes.items():
+            lines.extend(
+                f"discord_http_responses_total{prometheus_labels({'route': key, 'status': status})} {count}"
+                for status, count in stats.statuses.items()
+            )
+
+        lines.append("# HELP discord_http_rate_limited_seconds_total Time spent waiting on rate limits that responded with a 429.")
+        lines.append("# TYPE discord_http_rate_limited_seconds_total counter")
+        lines.extend(
+            f"discord_http_rate_limited_seconds_total{prometheus_labels({'route': key})} {prometheus_value(stats.rate_limited)}"
+            for key, stats in self.routes.items() if stats.rate_limits
+        )
+
+        return lines
+
+
+class CommandStats:  # pylint: disable=too-few-public-methods
+    """
+    The latencies, errors and concurrency of invocations of one command.
+    """
+
+    __slots__ = ('latency', 'errors', 'peak_active')
+
+    def __init__(self):
+        self.latency: Histogram = Histogram()
+        # Failed invocations by error type
+        self.errors: typing.Counter[str] = collections.Counter()
+        # The most invocations that have run at once
+        self.peak_active: int = 0
+
+    @property
+    def invocations(self) -> int:
+        """
+        How many invocations have finished, successfully or not.
+        """
+
+        return self.latency.count
+
+
+class CommandMetrics:
+    """
+    Records the latency, errors and concurrency of prefix and application command invocations.
+
+    Prefix command invocations are tracked by their context, which is weakly referenced,
+    so invocations that never finish don't keep their context alive, and stop counting as running once it is collected.
+    Application commands don't dispatch an event when they fail,
+    so pending ones are checked whenever one starts or the metrics are read:
+    those that have failed are recorded as errors, and those older than ``expiry`` seconds are recorded as expired.
+
+    Parameters
+    -----------
+    max_pending: int
+        The most application command invocations tracked at once. Beyond this, the oldest are recorded as expired.
+    expiry: float
+        How long an application command invocation can run before it is recorded as expired, in seconds.
+        Defaults to 15 minutes, the lifetime of an interaction token.
+    """
+
+    def __init__(self, max_pending: int = 1000, expiry: float = 900.0):
+        self.max_pending = max_pending
+        self.expiry = expiry
+        self.commands: typing.Dict[str, CommandStats] = {}
+        self.started_at: float = time.time()
+        self.pending: 'weakref.WeakKeyDictionary[typing.Any, typing.Tuple[str, float]]' = weakref.WeakKeyDictionary()
+        # Interaction ID -> (command, start time, interaction)
+        self.pending_interactions: typing.OrderedDict[int, typing.Tuple[str, float, typing.Any]] = collections.OrderedDict()
+
+    def command(self, name: str) -> CommandStats:
+        """
+        Returns the stats for a command, creating them if needed.
+        """
+
+        try:
+            return self.commands[name]
+        except KeyError:
+            stats = self.commands[name] = CommandStats()
+            return stats
+
+    def active(self) -> typing.Counter[str]:
+        """
+        Returns the amount of invocations of each command currently running.
+        """
+
+        counts: typing.Counter[str] = collections.Counter(name for name, _ in self.pending.values())
+        counts.update(name for name, _, _ in self.pending_interactions.values())
+        return counts
+
+    def begin(self, name: str) -> float:
+        """
+        Records that an invocation of a command is starting, returning its start time.
+        """
+
+        stats = self.command(name)
+        # Counting from what's pending, rather than keeping a running count, means abandoned invocations can't inflate it
+        running = sum(1 for pending, _ in self.pending.values() if pending == name)
+        running += sum(1 for pending, _, _ in self.pending_interactions.values() if pending == name)
+        stats.peak_active = max(stats.peak_active, running + 1)
+        return time.perf_counter()
+
+    def end(self, name: str, start: float, error: typing.Optional[str] = None):
+        """
+        Records that an invocation of a command finished, with the type of error it failed with, if any.
+        """
+
+        stats = self.command(name)
+        stats.latency.observe(time.perf_counter() - start)
+
+        if error is not None:
+            stats.errors[error] += 1
+
+    def start_context(self, ctx: typing.Any):
+        """
+        Records the start of a prefix command invocation.
+        """
+
+        if ctx.command is None or ctx in self.pending:
+            return
+
+        name = ctx.command.qualified_name
+        self.pending[ctx] = (name, self.begin(name))
+
+    def finish_context(self, ctx: typing.Any, error: typing.Optional[BaseException] = None):
+        """
+        Records the end of a prefix command invocation. Invocations whose start wasn't recorded are ignored.
+        """
+
+        pending = self.pending.pop(ctx, None)
+
+        if pending is not None:
+            error = getattr(error, 'original', error)
+            self.end(*pending, error=None if error is None else type(error).__name__)
+
+    def start_interaction(self, interaction: typing.Any):
+        """
+        Records the start of an application command invocation.
+        """
+
+        data = interaction.data or {}
+        command = interaction.command
+        name = f"/{getattr(command, 'qualified_name', None) or data.get('name', 'unknown')}"
+
+        self.sweep()
+        self.pending_interactions[interaction.id] = (name, self.begin(name), interaction)
+
+    def finish_interaction(self, interaction: typing.Any):
+        """
+        Records the successful end of an application command invocation.
+        """
+
+        pending = self.pending_interactions.pop(interaction.id, None)
+
+        if pending is not None:
+            self.end(pending[0], pending[1])
+
+    def sweep(self):
+        """
+        Records pending application command invocations that have failed or expired.
+        """
+
+        now = time.perf_counter()
+
+        for interaction_id, (name, start, interaction) in list(self.pending_interactions.items()):
+            if getattr(interaction, 'command_failed', False):
+                error = 'AppCommandError'
+            elif now - start > self.expiry or len(self.pending_interactions) > self.max_pending:
+                error = 'Expired'
+            else:
+                continue
+
+            del self.pending_interactions[interaction_id]
+            self.end(name, start, error=error)
+
+    def reset(self):
+        """
+        Forgets everything recorded so far. Invocations still running are recorded once they finish.
+        """
+
+        self.commands.clear()
+        self.started_at = time.time()
+
+    def prometheus(self) -> typing.List[str]:
+        """
+        Returns the recorded invocations in the Prometheus text format.
+        """
+
+        self.sweep()
+
+        lines = [
+            "# HELP discord_command_duration_seconds Time taken by command invocations, successful or not.",
+            "# TYPE discord_command_duration_seconds histogram",
+        ]
+
+        for name, stats in self.commands.items():
+            lines.extend(prometheus_histogram('discord_command_duration_seconds', {'command': name}, stats.latency))
+
+        lines.append("# HELP discord_command_errors_total Failed command invocations by error type.")
+        lines.append("# TYPE discord_command_errors_total counter")
+
+        for name, stats in self.commands.items():
+            lines.extend(
+                f"discord_command_errors_total{prometheus_labels({'command': name, 'error': error})} {count}"
+                for error, count in stats.errors.items()
+            )
+
+        active = self.active()
+        lines.append("# HELP discord_command_active Command invocations currently running.")
+        lines.append("# TYPE discord_command_active gauge")
+        lines.extend(f"discord_command_active{prometheus_labels({'command': name})} {active[name]}" for name in self.commands)
+
+        lines.append("# HELP discord_command_peak_active The most invocations of a command that have run at once.")
+        lines.append("# TYPE discord_command_peak_active gauge")
+        lines.extend(
+            f"discord_command_peak_active{prometheus_labels({'command': name})} {stats.peak_active}"
+            for name, stats in self.commands.items()
+        )
+
+        return lines
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from sleeps, which grows when something blocks the loop.
+
+    Parameters
+    -----------
+    interval: float
+        How long each sleep is, in seconds.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.lag: Histogram = Histogram()
+        self.last: float = 0.0
+        self.task: typing.Optional['asyncio.Task[None]'] = None
+
+    async def run(self):
+        """
+        Measures lag until cancelled.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.last = max(loop.time() - start - self.interval, 0.0)
+            self.lag.observe(self.last)
+
+    def start(self):
+        """
+        Starts measuring lag in the background.
+        """
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        """
+        Stops measuring lag.
+        """
+
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def prometheus(self) -> typing.List[str]:
+        """
+        Returns the measured lag in the Prometheus text format.
+        """
+
+        return [
+            "# HELP asyncio_loop_lag_seconds How late the event loop woke up from sleeps.",
+            "# TYPE asyncio_loop_lag_seconds histogram",
+            *prometheus_histogram('asyncio_loop_lag_seconds', {}, self.lag),
+            "# HELP asyncio_loop_lag_last_seconds How late the event loop woke up from the most recent sleep.",
+            "# TYPE asyncio_loop_lag_last_seconds gauge",
+            f"asyncio_loop_lag_last_seconds {prometheus_value(self.last)}",
+        ]
+
+
+def gauge(name: str, description: str, samples: typing.Iterable[typing.Tuple[typing.Dict[str, str], float]]) -> typing.List[str]:
+    """
+    Returns the Prometheus text format lines of a gauge, skipping samples that aren't finite numbers.
+    """
+
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+    lines.extend(
+        f"{name}{prometheus_labels(labels)} {prometheus_value(value)}"
+        for labels, value in samples if math.isfinite(value)
+    )
+    return lines
+
+
+def bot_metrics(bot: typing.Any) -> typing.List[str]:
+    """
+    Returns the gateway latency, entity counts and cache sizes of a bot in the Prometheus text format.
+    """
+
+    latencies = getattr(bot, 'latencies', None) or [(getattr(bot, 'shard_id', None) or 0, bot.latency)]
+
+    # The public properties copy each cache into a new list, so the underlying mappings are measured instead
+    # pylint: disable=protected-access
+    connection = bot._connection
+    caches = {
+        'guilds': connection._guilds,
+        'users': connection._users,
+        'emojis': connection._emojis,
+        'stickers': connection._stickers,
+        'messages': connection._messages or (),
+        'private_channels': connection._private_channels,
+        'voice_clients': connection._voice_clients,
+    }
+    members = sum(len(guild._members) for guild in connection._guilds.values())
+    # pylint: enable=protected-access
+
+    return [
+        *gauge(
+            'discord_gateway_latency_seconds', "Time between sending a gateway heartbeat and it being acknowledged.",
+            (({'shard': str(shard_id)}, latency) for shard_id, latency in latencies)
+        ),
+        *gauge(
+            'discord_cache_size', "Amount of each kind of object cached by the bot.",
+            (({'cache': name}, len(cache)) for name, cache in caches.items())
+        ),
+        *gauge(
+            'discord_member_cache_size', "Amount of members cached across all guilds.",
+            [({}, members)]
+        ),
+        *gauge('asyncio_tasks', "Amount of asyncio tasks that haven't finished.", [({}, len(asyncio.all_tasks()))]),
+    ]
+
+
+def process_metrics() -> typing.List[str]:
+    """
+    Returns the memory use, CPU time and threads of this process in the Prometheus text format.
+
+    This needs psutil; without it, nothing is returned.
+    """
+
+    if not psutil:
+        return []
+
+    process = psutil.Process()
+
+    with process.oneshot():
+        memory = process.memory_info()
+        cpu = process.cpu_times()
+        threads = process.num_threads()
+        files = process.num_fds() if os.name == 'posix' else process.num_handles()
+
+    return [
+        *gauge('process_resident_memory_bytes', "Resident memory size in bytes.", [({}, memory.rss)]),
+        *gauge('process_virtual_memory_bytes', "Virtual memory size in bytes.", [({}, memory.vms)]),
+        "# HELP process_cpu_seconds_total Total user and system CPU time spent in seconds.",
+        "# TYPE process_cpu_seconds_total counter",
+        f"process_cpu_seconds_total {prometheus_value(cpu.user + cpu.system)}",
+        *gauge('process_threads', "Amount of OS threads.", [({}, threads)]),
+        *gauge('process_open_fds', "Amount of open file descriptors or handles.", [({}, files)]),
+    ]
+
+
+class MetricsServer:
+    """
+    Serves metrics in the Prometheus text format at ``/metrics``.
+
+    Parameters
+    -----------
+    collect: Callable[[], str]
+        Called on every scrape to produce the metrics text.
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, collect: typing.Callable[[], str]):
+        self.collect = collect
+        self.runner: typing.Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> typing.Optional[str]:
+        """
+        The URL metrics are served at, if the server is running.
+        """
+
+        if self.runner is None or not self.runner.addresses:
+            return None
+
+        host, port = self.runner.addresses[0][:2]
+        return f"http://{host}:{port}/metrics"
+
+    async def handle(self, _request: web.Request) -> web.Response:
+        """
+        Responds to a scrape.
+        """
+
+        return web.Response(body=self.collect().encode('utf-8'), headers={'Content-Type': self.CONTENT_TYPE})
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0):
+        """
+        Starts serving on the given host and port. A port of 0 picks any free port.
+        """
+
+        if self.runner is not None:
+            await self.stop()
+
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+
+        try:
+            await web.TCPSite(runner, host, port).start()
+        except BaseException:
+            await runner.cleanup()
+            raise
+
+        self.runner = runner
+
+    async def stop(self):
+        """
+        Stops serving.
+        """
+
+        runner, self.runner = self.runner, None
+
+        if runner is not None:
+            await runner.cleanup()
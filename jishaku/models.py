@@ -15,6 +15,7 @@ import copy
 import typing
 
 import discord
+from discord.ext.commands.view import StringView
 
 from jishaku.types import ContextT
 
@@ -41,3 +42,60 @@ async def copy_context_with(
 
     # obtain and return a context of the same type
     return await ctx.bot.get_context(alt_message, cls=type(ctx))
+
+
+class ContextTemplate(typing.Generic[ContextT]):
+    """
+    A context that has been resolved once, and can be cloned cheaply to invoke its command many times.
+
+    Cloning skips copying the message, resolving the prefix and looking up the command,
+    which :func:`copy_context_with` and :meth:`Bot.get_context` do every time.
+    The template should not be invoked itself, as invoking a context consumes its view.
+
+    Parameters
+    -----------
+    ctx: Context
+        A context that hasn't been invoked yet, such as one returned by :func:`copy_context_with`.
+    """
+
+    __slots__ = ('ctx', 'index', 'previous')
+
+    def __init__(self, ctx: ContextT):
+        self.ctx: ContextT = ctx
+        # Where the view was left after the prefix and command name were read
+        self.index: int = ctx.view.index
+        self.previous: int = ctx.view.previous
+
+    @classmethod
+    async def from_context(cls, ctx: ContextT, **kwargs: typing.Any) -> 'ContextTemplate[ContextT]':
+        """
+        Makes a template from a context with changed message properties, as in :func:`copy_context_with`.
+        """
+
+        return cls(await copy_context_with(ctx, **kwargs))
+
+    def clone(self) -> ContextT:
+        """
+        Makes a new context from this template, ready to be invoked.
+
+        Attributes set on the template, such as those added by an overridden :meth:`Bot.get_context`, are kept,
+        while the state that invoking a context changes is reset.
+        """
+
+        alt_ctx = copy.copy(self.ctx)
+
+        view = StringView(self.ctx.view.buffer)
+        view.index = self.index
+        view.previous = self.previous
+
+        alt_ctx.view = view
+        alt_ctx.args = []
+        alt_ctx.kwargs = {}
+        alt_ctx.invoked_parents = list(self.ctx.invoked_parents)
+        alt_ctx.invoked_subcommand = None
+        alt_ctx.subcommand_passed = None
+        alt_ctx.command_failed = False
+        alt_ctx.current_parameter = None
+        alt_ctx.current_argument = None
+
+        return alt_ctx
@@ -11,16 +11,30 @@ Functions for managing and searching modules.
 
 """
 
+import ast
+import asyncio
+import collections
+import concurrent.futures
+import hashlib
 import importlib.metadata
+import importlib.util
+import os
 import pathlib
+import sys
+import threading
+import time
+import traceback
 import typing
 
+import discord
 from braceexpand import braceexpand
 from discord.ext import commands
 
+from jishaku.math import natural_time
 from jishaku.types import BotT, ContextA
 
-__all__ = ('find_extensions_in', 'resolve_extensions', 'package_version', 'ExtensionConverter')
+__all__ = ('find_extensions_in', 'resolve_extensions', 'extension_dependencies', 'ExtensionLoadResult', 'load_extensions',
+           'add_load_results', 'ExtensionTracker', 'watch_files', 'package_version', 'ExtensionConverter')
 
 
 if typing.TYPE_CHECKING:
@@ -31,34 +45,142 @@ else:
 _ExtensionConverterBase = commands.Converter[typing.List[str]]
 
 
-def find_extensions_in(path: typing.Union[str, pathlib.Path]) -> typing.List[str]:
+class DirectoryScan(typing.NamedTuple):
+    """
+    The contents of a directory that matter for finding extensions.
+    """
+
+    mtime_ns: int
+    modules: typing.Tuple[str, ...]
+    directories: typing.Tuple[str, ...]
+    is_package: bool
+
+
+# absolute directory path -> the result of the last scan, valid while the directory's modification time is unchanged
+SCAN_CACHE: typing.OrderedDict[str, DirectoryScan] = collections.OrderedDict()
+# The most directory listings kept, least recently used first out
+SCAN_CACHE_SIZE = 4096
+# Directories are scanned from several threads at once, so the cache's order and size are changed under a lock
+SCAN_CACHE_LOCK = threading.Lock()
+# The amount of directories that must be scanned at once before a thread pool is used
+PARALLEL_SCAN_THRESHOLD = 8
+
+
+def scan_directory(path: str) -> typing.Optional[DirectoryScan]:
+    """
+    Lists the modules and subdirectories of a directory, or returns None if it can't be read.
+
+    The result is cached until the directory's modification time changes,
+    which happens whenever an entry is added to, removed from or renamed in it.
+    """
+
+    key = os.path.abspath(path)
+
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        with SCAN_CACHE_LOCK:
+            SCAN_CACHE.pop(key, None)
+
+        return None
+
+    with SCAN_CACHE_LOCK:
+        cached = SCAN_CACHE.get(key)
+
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            SCAN_CACHE.move_to_end(key)
+            return cached
+
+    modules: typing.List[str] = []
+    directories: typing.List[str] = []
+    is_package = False
+
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    # Skips hidden directories and __pycache__
+                    if not entry.name.startswith(('.', '__')):
+                        directories.append(entry.name)
+                elif entry.name == '__init__.py':
+                    is_package = True
+                elif entry.name.endswith('.py'):
+                    modules.append(entry.name[:-3])
+    except OSError:
+        return None
+
+    scan = DirectoryScan(mtime_ns, tuple(sorted(modules)), tuple(sorted(directories)), is_package)
+
+    with SCAN_CACHE_LOCK:
+        SCAN_CACHE[key] = scan
+        SCAN_CACHE.move_to_end(key)
+
+        while len(SCAN_CACHE) > SCAN_CACHE_SIZE:
+            SCAN_CACHE.popitem(last=False)
+
+    return scan
+
+
+def scan_directories(paths: typing.List[str]) -> typing.List[typing.Optional[DirectoryScan]]:
+    """
+    Scans several directories, in parallel if there are enough of them.
+
+    The thread pool only lives as long as the call, so no threads are left behind once jishaku is unloaded.
+    """
+
+    if len(paths) < PARALLEL_SCAN_THRESHOLD:
+        return [scan_directory(path) for path in paths]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix='jishaku-scan') as pool:
+        return list(pool.map(scan_directory, paths))
+
+
+def find_extensions_in(path: typing.Union[str, pathlib.Path], recursive: bool = False) -> typing.List[str]:
     """
     Tries to find things that look like bot extensions in a directory.
+
+    Modules and packages (folders with an ``__init__.py``) in the directory are found.
+    If ``recursive`` is True, folders that aren't packages are searched as well, at any depth.
+    Packages are never searched, as their modules are considered part of the package's extension.
     """
 
     if not isinstance(path, pathlib.Path):
         path = pathlib.Path(path)
 
-    if not path.is_dir():
+    parts = path.parts
+    if parts and parts[0] == '.':
+        parts = parts[1:]
+
+    root = scan_directory(str(path))
+
+    if root is None:
         return []
 
     extension_names: typing.List[str] = []
+    level: typing.List[typing.Tuple[typing.Tuple[str, ...], DirectoryScan]] = [(parts, root)]
+
+    while level:
+        subdirectories: typing.List[typing.Tuple[typing.Tuple[str, ...], str]] = []
 
-    # Find extensions directly in this folder
-    for subpath in path.glob('*.py'):
-        parts = subpath.with_suffix('').parts
-        if parts[0] == '.':
-            parts = parts[1:]
+        for directory_parts, scan in level:
+            # Find extensions directly in this folder
+            extension_names.extend('.'.join((*directory_parts, module)) for module in scan.modules)
+            subdirectories.extend(
+                ((*directory_parts, name), os.path.join(path, *directory_parts[len(parts):], name))
+                for name in scan.directories
+            )
 
-        extension_names.append('.'.join(parts))
+        level = []
 
-    # Find extensions as subfolder modules
-    for subpath in path.glob('*/__init__.py'):
-        parts = subpath.parent.parts
-        if parts[0] == '.':
-            parts = parts[1:]
+        # Find extensions as subfolder modules, and folders to search next
+        for (directory_parts, _), scan in zip(subdirectories, scan_directories([directory for _, directory in subdirectories])):
+            if scan is None:
+                continue
 
-        extension_names.append('.'.join(parts))
+            if scan.is_package:
+                extension_names.append('.'.join(directory_parts))
+            elif recursive:
+                level.append((directory_parts, scan))
 
     return extension_names
 
@@ -70,7 +192,11 @@ def resolve_extensions(bot: BotT, name: str) -> typing.List[str]:
 
     exts: typing.List[str] = []
     for ext in braceexpand(name):
-        if ext.endswith('.*'):
+        if ext.endswith('.**'):
+            module_parts = ext[:-3].split('.')
+            path = pathlib.Path(*module_parts)
+            exts.extend(find_extensions_in(path, recursive=True))
+        elif ext.endswith('.*'):
             module_parts = ext[:-2].split('.')
             path = pathlib.Path(*module_parts)
             exts.extend(find_extensions_in(path))
@@ -82,6 +208,464 @@ def resolve_extensions(bot: BotT, name: str) -> typing.List[str]:
     return exts
 
 
+def extension_dependencies(name: str) -> typing.List[str]:
+    """
+    Returns the extensions an extension declares it depends on, through a module-level
+    ``__extension_dependencies__`` list or tuple of extension names.
+
+    The declaration is read from the extension's source without importing it,
+    so this reflects the source on disk even if an older version of the extension is loaded.
+    Extensions that can't be found or parsed are treated as having no dependencies.
+    """
+
+    try:
+        spec = importlib.util.find_spec(name)
+    except Exception:  # pylint: disable=broad-except
+        # find_spec imports parent packages, so this can raise just about anything
+        return []
+
+    if spec is None or not spec.origin or not spec.has_location:
+        return []
+
+    try:
+        tree = ast.parse(pathlib.Path(spec.origin).read_bytes(), filename=spec.origin)
+    except (OSError, SyntaxError, ValueError):
+        return []
+
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == '__extension_dependencies__' for target in node.targets
+        ):
+            try:
+                dependencies = ast.literal_eval(node.value)
+            except ValueError:
+                return []
+
+            if isinstance(dependencies, (list, tuple)):
+                return [dependency for dependency in dependencies if isinstance(dependency, str)]
+
+    return []
+
+
+class ExtensionLoadResult(typing.NamedTuple):
+    """
+    The outcome of loading or reloading a single extension.
+    """
+
+    extension: str
+    reloaded: bool
+    elapsed: float
+    error: typing.Optional[BaseException] = None
+
+
+async def load_extensions(
+    bot: BotT,
+    extensions: typing.Iterable[str],
+    *,
+    concurrency: int = 1
+) -> typing.List[ExtensionLoadResult]:
+    """
+    Loads the given extensions, or reloads them if they are already loaded,
+    running up to ``concurrency`` loads at once.
+
+    An extension waits for any of its declared dependencies (see :func:`extension_dependencies`)
+    that are being loaded in the same call, and is not loaded if one of them fails.
+    Extensions with circular dependencies are not loaded at all.
+
+    Results are returned in the order the extensions were given.
+    """
+
+    names = list(dict.fromkeys(extensions))
+    dependencies = {
+        name: [dependency for dependency in extension_dependencies(name) if dependency in names and dependency != name]
+        for name in names
+    }
+
+    # Find extensions that are part of a dependency cycle, as they would wait on each other forever
+    cyclic: typing.Set[str] = set()
+    visiting: typing.List[str] = []
+    visited: typing.Set[str] = set()
+
+    def visit(name: str):
+        if name in visiting:
+            cyclic.update(visiting[visiting.index(name):])
+            return
+
+        if name in visited:
+            return
+
+        visiting.append(name)
+
+        for dependency in dependencies[name]:
+            visit(dependency)
+
+        visiting.pop()
+        visited.add(name)
+
+    for name in names:
+        visit(name)
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    tasks: typing.Dict[str, 'asyncio.Task[ExtensionLoadResult]'] = {}
+
+    async def load(name: str) -> ExtensionLoadResult:
+        reloaded = name in bot.extensions
+
+        if name in cyclic:
+            return ExtensionLoadResult(name, reloaded, 0.0, commands.ExtensionError(
+                f"Extension {name!r} has circular dependencies: {', '.join(sorted(cyclic))}", name=name
+            ))
+
+        for dependency in dependencies[name]:
+            if (await tasks[dependency]).error is not None:
+                return ExtensionLoadResult(name, reloaded, 0.0, commands.ExtensionError(
+                    f"Extension {name!r} was not loaded because its dependency {dependency!r} failed to load", name=name
+                ))
+
+        async with semaphore:
+            reloaded = name in bot.extensions
+            method = bot.reload_extension if reloaded else bot.load_extension
+            start = time.perf_counter()
+
+            try:
+                await discord.utils.maybe_coroutine(method, name)
+            except Exception as exc:  # pylint: disable=broad-except
+                return ExtensionLoadResult(name, reloaded, time.perf_counter() - start, exc)
+
+            return ExtensionLoadResult(name, reloaded, time.perf_counter() - start)
+
+    for name in names:
+        tasks[name] = asyncio.ensure_future(load(name))
+
+    return list(await asyncio.gather(*tasks.values()))
+
+
+def add_load_results(paginator: commands.Paginator, results: typing.List[ExtensionLoadResult]):
+    """
+    Adds a line for each extension load result to a paginator, with a traceback for failures.
+    """
+
+    for result in results:
+        icon = (
+            "\N{CLOCKWISE RIGHTWARDS AND LEFTWARDS OPEN CIRCLE ARROWS}"
+            if result.reloaded else
+            "\N{INBOX TRAY}"
+        )
+        exc = result.error
+
+        if exc is None:
+            paginator.add_line(f"{icon} `{result.extension}` ({natural_time(result.elapsed).strip()})", empty=True)
+            continue
+
+        if isinstance(exc, commands.ExtensionFailed) and exc.__cause__:
+            cause = exc.__cause__
+            traceback_data = ''.join(traceback.format_exception(type(cause), cause, cause.__traceback__, 8))
+        else:
+            traceback_data = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__, 2))
+
+        paginator.add_line(
+            f"{icon}\N{WARNING SIGN} `{result.extension}`\n```py\n{traceback_data}\n```",
+            empty=True
+        )
+
+
+def module_origin(name: str) -> typing.Optional[str]:
+    """
+    Returns the path of a module's source file, or None if it doesn't have one.
+    """
+
+    module = sys.modules.get(name)
+
+    if module is not None:
+        origin = getattr(module, '__file__', None)
+    else:
+        try:
+            spec = importlib.util.find_spec(name)
+        except Exception:  # pylint: disable=broad-except
+            # find_spec imports parent packages, so this can raise just about anything
+            return None
+
+        origin = spec.origin if spec is not None and spec.has_location else None
+
+    return origin if origin and origin.endswith('.py') else None
+
+
+def source_imports(name: str, path: str) -> typing.Set[str]:
+    """
+    Returns the names of everything a module's source imports, resolving relative imports.
+
+    For ``from x import y``, both ``x`` and ``x.y`` are included, as ``y`` may be a submodule.
+    """
+
+    try:
+        tree = ast.parse(pathlib.Path(path).read_bytes(), filename=path)
+    except (OSError, SyntaxError, ValueError):
+        return set()
+
+    package = name if os.path.basename(path) == '__init__.py' else name.rpartition('.')[0]
+    imports: typing.Set[str] = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            try:
+                base = importlib.util.resolve_name('.' * node.level + (node.module or ''), package)
+            except (ImportError, ValueError):
+                continue
+
+            imports.add(base)
+            imports.update(f"{base}.{alias.name}" for alias in node.names if alias.name != '*')
+
+    return imports
+
+
+class SourceFingerprint(typing.NamedTuple):
+    """
+    Identifies the state of a source file.
+    """
+
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+class ExtensionTracker:
+    """
+    Tracks the source files of extensions, and the modules in their package they import (transitively),
+    so that only extensions whose source changed since they were last loaded need reloading.
+
+    Files are compared by modification time and size first, and by content hash only if those differ,
+    so touching a file without changing it doesn't count as a change.
+
+    The imports of each file are cached by modification time and size, so finding an extension's sources
+    only parses the files that changed.
+
+    Parameters
+    -----------
+    baseline: float
+        A UNIX timestamp. Extensions that have never been recorded are considered changed
+        if any of their files were modified after this time.
+    """
+
+    def __init__(self, baseline: typing.Optional[float] = None):
+        self.baseline: float = time.time() if baseline is None else baseline
+        # extension name -> {module name: path}
+        self.sources: typing.Dict[str, typing.Dict[str, str]] = {}
+        # extension name -> when it was recorded, used instead of the baseline for modules it newly imports
+        self.recorded_at: typing.Dict[str, float] = {}
+        # path -> fingerprint at the time it was recorded
+        self.fingerprints: typing.Dict[str, SourceFingerprint] = {}
+        # (module name, path) -> (modification time in nanoseconds, size, imports)
+        self.imports: typing.Dict[typing.Tuple[str, str], typing.Tuple[int, int, typing.Set[str]]] = {}
+
+    def source_imports(self, name: str, path: str) -> typing.Set[str]:
+        """
+        Returns the names of everything a module's source imports, reusing the last result if the file is unchanged.
+        """
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return set()
+
+        cached = self.imports.get((name, path))
+
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        imports = source_imports(name, path)
+        self.imports[(name, path)] = (stat.st_mtime_ns, stat.st_size, imports)
+        return imports
+
+    def find_sources(self, extension: str) -> typing.Dict[str, str]:
+        """
+        Returns {module name: path} for an extension and every module in its top-level package that it imports, transitively.
+        """
+
+        root = extension.partition('.')[0]
+        sources: typing.Dict[str, str] = {}
+        pending = [extension]
+
+        while pending:
+            name = pending.pop()
+
+            if name in sources:
+                continue
+
+            path = module_origin(name)
+
+            if path is None:
+                continue
+
+            sources[name] = path
+            pending.extend(
+                imported for imported in self.source_imports(name, path)
+                if (imported == root or imported.startswith(f"{root}.")) and imported not in sources
+            )
+
+        return sources
+
+    @staticmethod
+    def fingerprint(path: str, previous: typing.Optional[SourceFingerprint] = None) -> typing.Optional[SourceFingerprint]:
+        """
+        Returns the fingerprint of a file, or None if it can't be read.
+
+        If the file's modification time and size match the previous fingerprint, it is reused instead of hashing the file.
+        """
+
+        try:
+            stat = os.stat(path)
+
+            if previous is not None and (stat.st_mtime_ns, stat.st_size) == previous[:2]:
+                return previous
+
+            with open(path, 'rb') as file:
+                digest = hashlib.sha1(file.read()).hexdigest()
+        except OSError:
+            return None
+
+        return SourceFingerprint(stat.st_mtime_ns, stat.st_size, digest)
+
+    def record(self, *extensions: str):
+        """
+        Records the current state of extensions' sources, e.g. after they are successfully loaded.
+
+        This reads every source file, so it should be run in an executor.
+        """
+
+        for extension in extensions:
+            self.recorded_at[extension] = time.time()
+            self.sources[extension] = sources = self.find_sources(extension)
+
+            for path in sources.values():
+                fingerprint = self.fingerprint(path, self.fingerprints.get(path))
+
+                if fingerprint is not None:
+                    self.fingerprints[path] = fingerprint
+
+    def directories(self, extensions: typing.Iterable[str]) -> typing.Set[str]:
+        """
+        Returns the directories holding the sources of extensions, finding the sources of any not yet recorded.
+        """
+
+        directories: typing.Set[str] = set()
+
+        for extension in extensions:
+            sources = self.sources.get(extension)
+
+            if sources is None:
+                sources = self.sources[extension] = self.find_sources(extension)
+
+            directories.update(os.path.dirname(path) for path in sources.values())
+
+        return directories
+
+    def forget(self, extension: str):
+        """
+        Stops tracking an extension, e.g. after it is unloaded.
+        """
+
+        self.sources.pop(extension, None)
+        self.recorded_at.pop(extension, None)
+
+    def changes(self, extension: str) -> typing.List[str]:
+        """
+        Returns the names of the extension's modules (including itself) whose source changed since it was recorded.
+
+        This reads every source file, so it should be run in an executor.
+        """
+
+        known = self.sources.get(extension)
+        baseline = self.recorded_at.get(extension, self.baseline)
+
+        # Re-scan imports, as the extension may import something new since it was recorded
+        sources = self.find_sources(extension)
+        changed: typing.List[str] = []
+
+        for name, path in sources.items():
+            previous = self.fingerprints.get(path)
+
+            if known is None or previous is None or name not in known:
+                try:
+                    if os.stat(path).st_mtime > baseline:
+                        changed.append(name)
+                except OSError:
+                    changed.append(name)
+
+                continue
+
+            fingerprint = self.fingerprint(path, previous)
+
+            if fingerprint is None or fingerprint.digest != previous.digest:
+                changed.append(name)
+            elif fingerprint is not previous:
+                # Touched, but the content is the same
+                self.fingerprints[path] = fingerprint
+
+        return changed
+
+
+def scan_sources(directories: typing.Iterable[str]) -> typing.Dict[str, int]:
+    """
+    Returns {path: modification time in nanoseconds} for every Python file directly in the given directories.
+    """
+
+    mtimes: typing.Dict[str, int] = {}
+
+    for directory in directories:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.py') and entry.is_file():
+                        mtimes[entry.path] = entry.stat().st_mtime_ns
+        except OSError:
+            continue
+
+    return mtimes
+
+
+async def watch_files(
+    directories: typing.Callable[[], typing.Iterable[str]],
+    *,
+    interval: float = 1.0,
+    debounce: float = 0.5
+) -> typing.AsyncIterator[typing.Set[str]]:
+    """
+    Polls directories for created, modified or deleted Python files, yielding the set of changed paths.
+
+    ``directories`` is called in the executor before every poll, so the watched directories can change over time.
+    A burst of changes (e.g. a deploy or a branch switch) is yielded as one set,
+    once a poll ``debounce`` seconds after the last change sees nothing new.
+
+    Scanning is done in an executor, so large directories don't block the event loop.
+    """
+
+    loop = asyncio.get_running_loop()
+    previous = await loop.run_in_executor(None, lambda: scan_sources(directories()))
+
+    while True:
+        await asyncio.sleep(interval)
+        changed: typing.Set[str] = set()
+
+        while True:
+            current = await loop.run_in_executor(None, lambda: scan_sources(directories()))
+            burst = {
+                path for path in current.keys() | previous.keys()
+                if current.get(path) != previous.get(path)
+            }
+            previous = current
+
+            if not burst:
+                break
+
+            changed |= burst
+            await asyncio.sleep(debounce)
+
+        if changed:
+            yield changed
+
+
 def package_version(package_name: str) -> typing.Optional[str]:
     """
     Returns package version as a string, or None if it couldn't be found.
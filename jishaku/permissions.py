@@ -0,0 +1,480 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.permissions
+~~~~~~~~~~~~~~~~~~~
+
+Functions and classes for resolving effective Discord permissions using integer bitmasks.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import collections
+import typing
+
+import discord
+
+__all__ = ('ALL_PERMISSIONS', 'PERMISSION_NAMES', 'PermissionTrace', 'PermissionResolver', 'PermissionIndex',
+           'audit_permissions')
+
+ALL_PERMISSIONS: int = discord.Permissions.all().value
+ALL_CHANNEL_PERMISSIONS: int = discord.Permissions.all_channel().value
+ADMINISTRATOR: int = discord.Permissions(administrator=True).value
+VIEW_CHANNEL: int = discord.Permissions(view_channel=True).value
+PERMISSION_BITS: int = ALL_PERMISSIONS.bit_length()
+
+# Maps the bit index of each permission to its name, e.g. 3 -> 'administrator'
+PERMISSION_NAMES: typing.Dict[int, str] = {
+    discord.Permissions(**{name: True}).value.bit_length() - 1: name
+    for name, _ in discord.Permissions.all()
+}
+
+Reasons = typing.List[typing.Optional[str]]
+# (permission value, reasons if tracing, whether Administrator was granted)
+Resolution = typing.Tuple[int, typing.Optional[Reasons], bool]
+
+
+def mark_reasons(reasons: typing.Optional[Reasons], mask: int, reason: str):
+    """
+    Sets the reason for every bit set in the mask.
+    """
+
+    if reasons is None:
+        return
+
+    while mask:
+        lowest = mask & -mask
+        reasons[lowest.bit_length() - 1] = reason
+        mask ^= lowest
+
+
+class PermissionTrace(typing.NamedTuple):
+    """
+    The result of a permission resolution.
+
+    ``reasons`` is indexed by permission bit, and holds the most fundamental reason that permission
+    is allowed or denied. It is None if the resolution was done without tracing.
+    """
+
+    value: int
+    reasons: typing.Optional[Reasons] = None
+
+    @property
+    def permissions(self) -> discord.Permissions:
+        """
+        The resolved permissions as a discord.Permissions object.
+        """
+
+        return discord.Permissions(self.value)
+
+    def has(self, mask: int) -> bool:
+        """
+        Returns whether every permission in the mask is allowed.
+        """
+
+        return self.value & mask == mask
+
+    def explain(self) -> typing.Iterator[typing.Tuple[str, bool, typing.Optional[str]]]:
+        """
+        Yields (permission name, allowed, reason) for every known permission.
+        """
+
+        for bit, name in PERMISSION_NAMES.items():
+            yield name, bool(self.value >> bit & 1), self.reasons[bit] if self.reasons else None
+
+
+class PermissionResolver:
+    """
+    Resolves effective permissions within a single guild the same way Discord does,
+    folding allow and deny bitmasks layer by layer.
+
+    Role permissions are captured once when the resolver is created,
+    so the same resolver can be reused cheaply across many channels and role combinations.
+
+    Parameters
+    -----------
+    guild: discord.Guild
+        The guild to resolve permissions in.
+    """
+
+    def __init__(self, guild: discord.Guild):
+        self.owner_id: typing.Optional[int] = guild.owner_id
+        self.default_role_id: int = guild.default_role.id
+        # role ID -> (permission value, name, position)
+        self.roles: typing.Dict[int, typing.Tuple[int, str, int]] = {
+            role.id: (role.permissions.value, role.name, role.position)
+            for role in guild.roles
+        }
+
+    def base(
+        self,
+        role_ids: typing.Iterable[int],
+        members: typing.Optional[typing.Mapping[int, str]] = None,
+        *,
+        trace: bool = True
+    ) -> Resolution:
+        """
+        Resolves the server-wide permissions for a set of roles (and optionally, members).
+
+        Returns the permission value, the reasons (if tracing) and whether this grants Administrator.
+        """
+
+        if members and self.owner_id in members:
+            reasons = [f"<@{self.owner_id}> owns the server"] * PERMISSION_BITS if trace else None
+            return ALL_PERMISSIONS, reasons, True
+
+        value = self.roles[self.default_role_id][0]
+        reasons = ["it is the server-wide @everyone permission"] * PERMISSION_BITS if trace else None
+        administrator = False
+
+        # Apply from the lowest role upwards, so the lowest-level reason for each permission is kept
+        roles = sorted((self.roles[role_id] for role_id in set(role_ids) if role_id in self.roles), key=lambda role: role[2])
+
+        for role_value, role_name, _ in roles:
+            # Roles can only ever allow permissions
+            granted = role_value & ~value
+            value |= granted
+            mark_reasons(reasons, granted, f"it is the server-wide {role_name} permission")
+
+            if role_value & ADMINISTRATOR:
+                administrator = True
+                granted = ALL_PERMISSIONS & ~value
+                value |= granted
+                mark_reasons(reasons, granted, f"it is granted by Administrator on the server-wide {role_name} permission")
+
+        return value, reasons, administrator
+
+    def apply_overwrites(
+        self,
+        value: int,
+        reasons: typing.Optional[Reasons],
+        channel: discord.abc.GuildChannel,
+        role_ids: typing.Collection[int],
+        members: typing.Optional[typing.Mapping[int, str]] = None
+    ) -> int:
+        """
+        Applies a channel's overwrites on top of a server-wide permission value, updating reasons if given.
+        """
+
+        overwrites: typing.List[discord.abc._Overwrites] = channel._overwrites  # type: ignore  # pylint: disable=protected-access
+
+        # @everyone overwrite first
+        for overwrite in overwrites:
+            if overwrite.id == self.default_role_id:
+                mark_reasons(reasons, overwrite.deny & value, "it is the channel's @everyone overwrite")
+                value &= ~overwrite.deny
+                mark_reasons(reasons, overwrite.allow & ~value, "it is the channel's @everyone overwrite")
+                value |= overwrite.allow
+                break
+
+        role_overwrites = [
+            overwrite for overwrite in overwrites
+            if overwrite.is_role() and overwrite.id != self.default_role_id and overwrite.id in role_ids
+        ]
+
+        # Denies are applied BEFORE allows, always
+        for overwrite in role_overwrites:
+            if reasons is not None:
+                mark_reasons(reasons, overwrite.deny & value, f"it is the channel's {self.role_name(overwrite.id)} overwrite")
+            value &= ~overwrite.deny
+
+        for overwrite in role_overwrites:
+            if reasons is not None:
+                mark_reasons(reasons, overwrite.allow & ~value, f"it is the channel's {self.role_name(overwrite.id)} overwrite")
+            value |= overwrite.allow
+
+        if members:
+            value = self.apply_member_overwrite(value, reasons, channel, members)
+
+        return value
+
+    @staticmethod
+    def apply_member_overwrite(
+        value: int,
+        reasons: typing.Optional[Reasons],
+        channel: discord.abc.GuildChannel,
+        members: typing.Mapping[int, str]
+    ) -> int:
+        """
+        Applies the first of a channel's member overwrites that targets one of the members,
+        on top of a value that already has the role overwrites applied.
+        """
+
+        for overwrite in channel._overwrites:  # type: ignore  # pylint: disable=protected-access
+            if overwrite.is_member() and overwrite.id in members:
+                reason = f"it is the channel's {members[overwrite.id]} overwrite"
+                mark_reasons(reasons, overwrite.deny & value, reason)
+                value &= ~overwrite.deny
+                mark_reasons(reasons, overwrite.allow & ~value, reason)
+                value |= overwrite.allow
+                break
+
+        return value
+
+    def role_name(self, role_id: int) -> str:
+        """
+        Returns the name of a role in this guild, or its ID if it is not known.
+        """
+
+        role = self.roles.get(role_id)
+        return role[1] if role else str(role_id)
+
+    def resolve(
+        self,
+        channel: discord.abc.GuildChannel,
+        role_ids: typing.Iterable[int],
+        members: typing.Optional[typing.Mapping[int, str]] = None,
+        *,
+        trace: bool = True
+    ) -> PermissionTrace:
+        """
+        Resolves the effective permissions in a channel for a set of roles, and optionally members.
+
+        ``members`` maps member IDs to how they should be referred to in reasons (e.g. their mention).
+        If one of them owns the guild, all permissions are granted.
+        If ``trace`` is False, reasons are not recorded, which is faster.
+        """
+
+        role_ids = set(role_ids)
+        value, reasons, administrator = self.base(role_ids, members, trace=trace)
+
+        # If Administrator was granted, there is no reason to even do channel permissions
+        if not administrator:
+            value = self.apply_overwrites(value, reasons, channel, role_ids, members)
+
+        return PermissionTrace(value, reasons)
+
+
+class PermissionIndex:
+    """
+    A cache of permission resolutions, keyed by guild, channel and role set.
+
+    Members with the same roles share entries, so once a channel has been resolved for a role set,
+    resolving it again (for any member with those roles) is a dictionary lookup.
+
+    Entries are never refreshed by themselves: whoever owns the index must invalidate guilds,
+    channels and member groups as roles, channels and members change.
+
+    Parameters
+    -----------
+    max_entries: int
+        The amount of channel entries kept before the whole index is cleared.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries: int = max_entries
+        self.entry_count: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self.resolvers: typing.Dict[int, PermissionResolver] = {}
+        # guild ID -> role set -> server-wide resolution
+        self.bases: typing.Dict[int, typing.Dict[typing.FrozenSet[int], Resolution]] = {}
+        # guild ID -> channel ID -> role set -> channel resolution (before member overwrites)
+        self.channels: typing.Dict[int, typing.Dict[int, typing.Dict[typing.FrozenSet[int], Resolution]]] = {}
+        # guild ID -> (member count, role set -> member IDs)
+        self.groups: typing.Dict[int, typing.Tuple[int, typing.Dict[typing.FrozenSet[int], typing.List[int]]]] = {}
+
+    def __len__(self) -> int:
+        return self.entry_count
+
+    def resolver(self, guild: discord.Guild) -> PermissionResolver:
+        """
+        Returns the cached resolver for a guild, creating it if necessary.
+        """
+
+        resolver = self.resolvers.get(guild.id)
+
+        if resolver is None:
+            resolver = self.resolvers[guild.id] = PermissionResolver(guild)
+
+        return resolver
+
+    def member_groups(self, guild: discord.Guild) -> typing.Dict[typing.FrozenSet[int], typing.List[int]]:
+        """
+        Returns the cached members of a guild, grouped by their set of roles. The guild owner is excluded.
+        """
+
+        member_count, groups = self.groups.get(guild.id, (-1, {}))
+
+        # Checking the count catches members added by chunking, which has no per-member event
+        if member_count != len(guild.members):
+            groups = collections.defaultdict(list)
+
+            for member in guild.members:
+                if member.id != guild.owner_id:
+                    groups[frozenset(member._roles)].append(member.id)  # type: ignore  # pylint: disable=protected-access
+
+            groups = dict(groups)
+            self.groups[guild.id] = (len(guild.members), groups)
+
+        return groups
+
+    def lookup(
+        self,
+        guild: discord.Guild,
+        channel: discord.abc.GuildChannel,
+        role_ids: typing.FrozenSet[int],
+        *,
+        trace: bool = True
+    ) -> Resolution:
+        """
+        Returns the resolution for a role set in a channel, before any member overwrites are applied.
+
+        Returned reasons are shared with the cache, and must be copied before being modified.
+        A traced entry can serve untraced lookups, but not the other way around.
+        """
+
+        channel_entries = self.channels.setdefault(guild.id, {}).setdefault(channel.id, {})
+        entry = channel_entries.get(role_ids)
+
+        if entry is not None and (entry[1] is not None or not trace):
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+
+        resolver = self.resolver(guild)
+        bases = self.bases.setdefault(guild.id, {})
+        base = bases.get(role_ids)
+
+        if base is None or (trace and base[1] is None):
+            base = bases[role_ids] = resolver.base(role_ids, trace=trace)
+
+        value, reasons, administrator = base
+        reasons = list(reasons) if trace and reasons is not None else None
+
+        if not administrator:
+            value = resolver.apply_overwrites(value, reasons, channel, role_ids)
+
+        if entry is None:
+            if self.entry_count >= self.max_entries:
+                self.clear()
+                channel_entries = self.channels.setdefault(guild.id, {}).setdefault(channel.id, {})
+
+            self.entry_count += 1
+
+        entry = channel_entries[role_ids] = (value, reasons, administrator)
+        return entry
+
+    def resolve(
+        self,
+        channel: discord.abc.GuildChannel,
+        role_ids: typing.Iterable[int],
+        members: typing.Optional[typing.Mapping[int, str]] = None,
+        *,
+        trace: bool = True
+    ) -> PermissionTrace:
+        """
+        Resolves the effective permissions in a channel the same way as :meth:`PermissionResolver.resolve`,
+        using and populating the cache.
+        """
+
+        guild = channel.guild
+
+        if members and guild.owner_id in members:
+            return self.resolver(guild).resolve(channel, role_ids, members, trace=trace)
+
+        value, reasons, administrator = self.lookup(guild, channel, frozenset(role_ids), trace=trace)
+        reasons = list(reasons) if trace and reasons is not None else None
+
+        if members and not administrator:
+            value = PermissionResolver.apply_member_overwrite(value, reasons, channel, members)
+
+        return PermissionTrace(value, reasons)
+
+    def invalidate(self, guild_id: int, channel_id: typing.Optional[int] = None):
+        """
+        Drops everything cached for a guild (e.g. when its roles change), or only for one of its channels.
+        """
+
+        if channel_id is None:
+            self.resolvers.pop(guild_id, None)
+            self.bases.pop(guild_id, None)
+            self.groups.pop(guild_id, None)
+            removed = self.channels.pop(guild_id, {})
+            self.entry_count -= sum(map(len, removed.values()))
+        else:
+            removed = self.channels.get(guild_id, {}).pop(channel_id, {})
+            self.entry_count -= len(removed)
+
+    def invalidate_members(self, guild_id: int):
+        """
+        Drops the cached member groups of a guild, e.g. when a member's roles change.
+        """
+
+        self.groups.pop(guild_id, None)
+
+    def clear(self):
+        """
+        Drops everything cached.
+        """
+
+        self.resolvers.clear()
+        self.bases.clear()
+        self.channels.clear()
+        self.groups.clear()
+        self.entry_count = 0
+
+
+async def audit_permissions(
+    guild: discord.Guild,
+    channels: typing.Optional[typing.Iterable[discord.abc.GuildChannel]] = None,
+    *,
+    batch_size: int = 10,
+    index: typing.Optional[PermissionIndex] = None
+) -> typing.AsyncIterator[typing.Tuple[discord.abc.GuildChannel, typing.Dict[int, int]]]:
+    """
+    Resolves the effective permissions of every cached member of a guild in every channel (or the given channels).
+
+    Yields (channel, {member ID: permission value}) for each channel.
+
+    Members are grouped by their set of roles, so the server-wide and role overwrite calculations
+    are only done once per distinct role set, and only members with their own overwrite in a channel
+    are resolved individually. Like Discord, members that cannot view a channel are given no channel permissions in it.
+
+    If an ``index`` is given, its cached results are used and populated, so repeated audits are faster.
+
+    The event loop is yielded to after every ``batch_size`` channels.
+    """
+
+    # An empty index is falsy, so it has to be checked against None to be filled
+    index = PermissionIndex() if index is None else index
+    groups = index.member_groups(guild)
+
+    for position, channel in enumerate(guild.channels if channels is None else channels):
+        if position and position % batch_size == 0:
+            await asyncio.sleep(0)
+
+        member_overwrites = {
+            overwrite.id for overwrite in channel._overwrites  # type: ignore  # pylint: disable=protected-access
+            if overwrite.is_member()
+        }
+
+        results: typing.Dict[int, int] = {}
+
+        if guild.owner_id is not None:
+            results[guild.owner_id] = ALL_PERMISSIONS
+
+        for role_ids, member_ids in groups.items():
+            group_value, _, administrator = index.lookup(guild, channel, role_ids, trace=False)
+
+            if administrator:
+                results.update(dict.fromkeys(member_ids, group_value))
+                continue
+
+            for member_id in member_ids:
+                if member_id in member_overwrites:
+                    member_value = PermissionResolver.apply_member_overwrite(group_value, None, channel, {member_id: ''})
+                else:
+                    member_value = group_value
+
+                if not member_value & VIEW_CHANNEL:
+                    member_value &= ~ALL_CHANNEL_PERMISSIONS
+
+                results[member_id] = member_value
+
+        yield channel, results
@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.profiling
+~~~~~~~~~~~~~~~~~
+
+Profilers and profiling helpers used to find out what a live bot is spending its time on.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import collections
+import contextlib
+import cProfile
+import importlib.abc
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import types
+import typing
+
+__all__ = ('StackSampler', 'SampleSummary', 'ProfiledCoroutine', 'format_profile_stats', 'dump_profile_stats',
+           'ImportRecord', 'ImportProfiler', 'format_import_tree', 'format_load_profile')
+
+T = typing.TypeVar('T')
+
+# Stands in for the outermost frames of a stack deeper than a sampler's max_depth
+TRUNCATED_FRAME = "(truncated)"
+
+
+class SampleSummary(typing.NamedTuple):
+    """
+    The amount of samples a single frame was seen in.
+
+    ``own`` counts samples where this frame was at the top of the stack (i.e. actually executing),
+    ``total`` counts samples where this frame was anywhere in the stack.
+    """
+
+    frame: str
+    own: int
+    total: int
+
+
+class StackSampler:
+    """
+    A low-overhead statistical profiler.
+
+    This runs a background thread that periodically reads the current frame of every
+    running thread (via :func:`sys._current_frames`) and counts how often each unique stack is seen.
+
+    If the sampler is started from within an event loop, samples taken from the loop's thread
+    are additionally labelled with the asyncio task that was running at the time.
+
+    Parameters
+    -----------
+    interval: float
+        How long to wait between samples, in seconds.
+    max_depth: int
+        The maximum amount of frames recorded per stack. Frames are kept from the one executing outwards,
+        so on deeper stacks the outermost frames are dropped, and replaced by a single ``(truncated)`` frame.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: typing.Counter[typing.Tuple[str, ...]] = collections.Counter()
+        self.sample_count: int = 0
+
+        self.loop: typing.Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: typing.Optional[int] = None
+
+        self._labels: typing.Dict[types.CodeType, str] = {}
+        self._stop = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *_: typing.Any):
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the sampling thread is currently alive.
+        """
+
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts the sampling thread.
+        """
+
+        if self.running:
+            raise RuntimeError("This sampler is already running")
+
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
+        else:
+            self.loop_thread = threading.get_ident()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="jishaku-stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the sampling thread, waiting for it to finish.
+        """
+
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def label(self, code: types.CodeType) -> str:
+        """
+        Produces a human readable (and collapsed-stack safe) label for a code object.
+        """
+
+        try:
+            return self._labels[code]
+        except KeyError:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+            self._labels[code] = label
+            return label
+
+    def sample(self):
+        """
+        Takes a single sample of every thread other than the sampling thread itself.
+        """
+
+        current = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for ident, frame in sys._current_frames().items():  # pylint: disable=protected-access
+            if ident == current:
+                continue
+
+            stack: typing.List[str] = []
+            cursor: typing.Optional[types.FrameType] = frame
+
+            # Walking from the executing frame means the cost of a sample is bounded by max_depth
+            while cursor is not None and len(stack) < self.max_depth:
+                stack.append(self.label(cursor.f_code))
+                cursor = cursor.f_back
+
+            if cursor is not None:
+                stack.append(TRUNCATED_FRAME)
+
+            stack.reverse()
+
+            root = [f"thread:{thread_names.get(ident, ident)}"]
+
+            if ident == self.loop_thread and self.loop is not None:
+                try:
+                    task = asyncio.current_task(self.loop)
+                except RuntimeError:
+                    task = None
+
+                if task is not None:
+                    root.append(f"task:{task.get_name()}")
+
+            self.samples[tuple(root + stack)] += 1
+
+        self.sample_count += 1
+
+    def collapsed(self) -> str:
+        """
+        Returns the samples in the 'collapsed stack' format.
+
+        This is the format consumed by flamegraph.pl, speedscope, inferno and similar tools:
+        one line per unique stack, frames separated by semicolons, followed by the sample count.
+        """
+
+        return "\n".join(
+            f"{';'.join(stack)} {count}"
+            for stack, count in sorted(self.samples.items(), key=lambda item: item[1], reverse=True)
+        )
+
+    def summary(self) -> typing.List[SampleSummary]:
+        """
+        Returns per-frame sample counts, sorted by the amount of samples spent directly in that frame.
+
+        Thread and task labels, and the frame standing in for truncated frames, are not included.
+        """
+
+        own: typing.Counter[str] = collections.Counter()
+        total: typing.Counter[str] = collections.Counter()
+
+        for stack, count in self.samples.items():
+            frames = [frame for frame in stack if frame != TRUNCATED_FRAME and not frame.startswith(('thread:', 'task:'))]
+
+            if not frames:
+                continue
+
+            own[frames[-1]] += count
+
+            for frame in set(frames):
+                total[frame] += count
+
+        return sorted(
+            (SampleSummary(frame, own[frame], count) for frame, count in total.items()),
+            key=lambda entry: (entry.own, entry.total),
+            reverse=True
+        )
+
+
+class ProfiledCoroutine(typing.Generic[T]):
+    """
+    Wraps a coroutine so that a :class:`cProfile.Profile` is only enabled while that coroutine is being stepped.
+
+    Because the profiler is disabled whenever the coroutine yields back to the event loop,
+    work done by unrelated tasks in the meantime does not pollute the results.
+
+    .. code:: python3
+
+        profiler = cProfile.Profile()
+        await ProfiledCoroutine(command.invoke(ctx), profiler)
+    """
+
+    __slots__ = ('coro', 'profiler')
+
+    def __init__(self, coro: typing.Coroutine[typing.Any, typing.Any, T], profiler: cProfile.Profile):
+        self.coro = coro
+        self.profiler = profiler
+
+    def __await__(self) -> typing.Generator[typing.Any, typing.Any, T]:
+        return self  # type: ignore
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> typing.Any:
+        return self.send(None)
+
+    def send(self, value: typing.Any) -> typing.Any:
+        """
+        Steps the wrapped coroutine with profiling enabled.
+        """
+
+        self.profiler.enable()
+        try:
+            return self.coro.send(value)
+        finally:
+            self.profiler.disable()
+
+    def throw(self, *args: typing.Any) -> typing.Any:
+        """
+        Throws an exception into the wrapped coroutine with profiling enabled.
+        """
+
+        self.profiler.enable()
+        try:
+            return self.coro.throw(*args)
+        finally:
+            self.profiler.disable()
+
+    def close(self):
+        """
+        Closes the wrapped coroutine.
+        """
+
+        self.coro.close()
+
+
+def format_profile_stats(profiler: cProfile.Profile, sort: str = 'cumulative', limit: int = 40) -> str:
+    """
+    Produces the standard :mod:`pstats` report for a profiler, sorted and limited to a number of entries.
+    """
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(sort).print_stats(limit)
+
+    return stream.getvalue().strip()
+
+
+def dump_profile_stats(profiler: cProfile.Profile) -> bytes:
+    """
+    Serializes a profiler's results in the same format as :meth:`pstats.Stats.dump_stats`,
+    so they can be loaded by ``pstats``, snakeviz and similar tools.
+    """
+
+    stats = pstats.Stats(profiler)
+    return marshal.dumps(stats.stats)  # type: ignore
+
+
+class ImportRecord:
+    """
+    The time taken to execute a module, including the modules it imported while doing so.
+    """
+
+    __slots__ = ('name', 'elapsed', 'children')
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.elapsed: float = 0.0
+        self.children: typing.List[ImportRecord] = []
+
+    @property
+    def own(self) -> float:
+        """
+        The time spent executing this module itself, excluding the modules it imported.
+        """
+
+        return max(self.elapsed - sum(child.elapsed for child in self.children), 0.0)
+
+    def __repr__(self) -> str:
+        return f"<ImportRecord name={self.name!r} elapsed={self.elapsed:.6f} children={len(self.children)}>"
+
+
+class TimedLoader:
+    """
+    A loader proxy that times the execution of a module for an :class:`ImportProfiler`.
+
+    The original loader is restored on the module once it has been executed,
+    so the proxy does not outlive the import.
+    """
+
+    def __init__(self, loader: typing.Any, profiler: 'ImportProfiler'):
+        self.loader = loader
+        self.profiler = profiler
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self.loader, name)
+
+    def create_module(self, spec: typing.Any) -> typing.Optional[types.ModuleType]:
+        """
+        Delegates module creation to the original loader.
+        """
+
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module: types.ModuleType):
+        """
+        Executes the module with the original loader, recording how long it takes.
+        """
+
+        if getattr(module, '__loader__', None) is self:
+            module.__loader__ = self.loader
+        if getattr(module.__spec__, 'loader', None) is self:
+            module.__spec__.loader = self.loader  # type: ignore
+
+        with self.profiler.record(module.__name__):
+            self.loader.exec_module(module)
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    """
+    Records how long every module imported while it is active takes to execute, as a tree of nested imports.
+
+    It is installed at the front of :data:`sys.meta_path`, and wraps the loaders returned by the other finders.
+    Modules that were already imported are not recorded, as importing them again takes no time.
+
+    .. code:: python3
+
+        with ImportProfiler() as profiler:
+            await bot.load_extension('cogs.example')
+
+        print(format_import_tree(profiler.roots))
+    """
+
+    def __init__(self):
+        self.roots: typing.List[ImportRecord] = []
+        self.local = threading.local()
+
+    def find_spec(self, fullname: str, path: typing.Any, target: typing.Any = None) -> typing.Any:
+        """
+        Finds the spec using the remaining finders, wrapping its loader so execution is timed.
+        """
+
+        if getattr(self.local, 'finding', False):
+            return None
+
+        self.local.finding = True
+
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+
+                spec = finder.find_spec(fullname, path, target)
+
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self.local.finding = False
+
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module') and not isinstance(spec.loader, TimedLoader):
+            spec.loader = TimedLoader(spec.loader, self)
+
+        return spec
+
+    @property
+    def stack(self) -> typing.List[ImportRecord]:
+        """
+        The records of the imports currently executing in this thread, innermost last.
+        """
+
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+
+        return self.local.stack
+
+    @contextlib.contextmanager
+    def record(self, name: str) -> typing.Generator[ImportRecord, None, None]:
+        """
+        Times the block as the execution of a module, nested under the import currently executing.
+        """
+
+        stack = self.stack
+        entry = ImportRecord(name)
+        (stack[-1].children if stack else self.roots).append(entry)
+        stack.append(entry)
+
+        start = time.perf_counter()
+
+        try:
+            yield entry
+        finally:
+            entry.elapsed = time.perf_counter() - start
+            stack.pop()
+
+    def find(self, name: str) -> typing.Optional[ImportRecord]:
+        """
+        Returns the most recent top-level record for a module, if there is one.
+        """
+
+        for entry in reversed(self.roots):
+            if entry.name == name:
+                return entry
+
+        return None
+
+    def start(self):
+        """
+        Starts recording imports.
+        """
+
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def stop(self):
+        """
+        Stops recording imports.
+        """
+
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def __enter__(self) -> 'ImportProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, *_: typing.Any):
+        self.stop()
+
+
+def format_import_tree(
+    records: typing.Iterable[ImportRecord],
+    threshold: float = 0.001,
+    max_depth: int = 8
+) -> str:
+    """
+    Formats import records as an indented tree with the slowest imports first,
+    showing the total and own time of each.
+
+    Imports taking less than ``threshold`` seconds, or nested deeper than ``max_depth``, are summarized.
+    """
+
+    lines: typing.List[str] = []
+
+    def add(entries: typing.Iterable[ImportRecord], depth: int):
+        hidden = 0
+        hidden_time = 0.0
+
+        for entry in sorted(entries, key=lambda entry: entry.elapsed, reverse=True):
+            if entry.elapsed < threshold or depth >= max_depth:
+                hidden += 1
+                hidden_time += entry.elapsed
+                continue
+
+            lines.append(f"{entry.elapsed * 1000:9.2f}ms {entry.own * 1000:9.2f}ms  {'  ' * depth}{entry.name}")
+            add(entry.children, depth + 1)
+
+        if hidden:
+            lines.append(f"{hidden_time * 1000:9.2f}ms {'':>11}  {'  ' * depth}({hidden} more)")
+
+    lines.append(f"{'total':>11} {'own':>11}  module")
+    add(records, 0)
+
+    return "\n".join(lines)
+
+
+def format_load_profile(
+    loads: typing.Iterable[typing.Tuple[str, float, typing.Optional[ImportRecord]]],
+    records: typing.Iterable[ImportRecord],
+    threshold: float = 0.001
+) -> str:
+    """
+    Formats the time taken to load extensions, slowest first, followed by the import tree.
+
+    ``loads`` holds (extension name, total load time, import record) for each extension.
+    Whatever part of the load time isn't spent importing the extension is attributed to its setup.
+    """
+
+    lines = [f"{'total':>11} {'import':>11} {'setup':>11}  extension"]
+
+    for name, total, record in sorted(loads, key=lambda load: load[1], reverse=True):
+        imported = record.elapsed if record else 0.0
+        lines.append(f"{total * 1000:9.2f}ms {imported * 1000:9.2f}ms {max(total - imported, 0.0) * 1000:9.2f}ms  {name}")
+
+    lines.extend(["", format_import_tree(records, threshold=threshold)])
+
+    return "\n".join(lines)
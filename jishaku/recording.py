@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.recording
+~~~~~~~~~~~~~~~~~
+
+Functions for recording command invocations to a JSON-lines log and replaying them later.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import collections
+import json
+import time
+import typing
+
+from jishaku.math import mean_stddev, natural_time, percentile
+
+if typing.TYPE_CHECKING:
+    import discord
+    from discord.ext import commands
+
+__all__ = ('RecordedInvocation', 'CommandRecorder', 'load_recording', 'ReplayResult', 'replay', 'format_replay_result')
+
+
+class RecordedInvocation(typing.NamedTuple):
+    """
+    A command invocation, as recorded from the message that invoked it.
+
+    ``timestamp`` is when the message was sent, in seconds since the epoch.
+    """
+
+    timestamp: float
+    content: str
+    author_id: int
+    channel_id: int
+
+    @classmethod
+    def from_message(cls, message: 'discord.Message') -> 'RecordedInvocation':
+        """
+        Records an invocation from the message that invoked it.
+        """
+
+        return cls(message.created_at.timestamp(), message.content, message.author.id, message.channel.id)
+
+    def to_json(self) -> str:
+        """
+        Returns this invocation as a single line of compact JSON.
+        """
+
+        return json.dumps(
+            {'ts': round(self.timestamp, 3), 'content': self.content, 'author': self.author_id, 'channel': self.channel_id},
+            separators=(',', ':'),
+            ensure_ascii=False
+        )
+
+    @classmethod
+    def from_json(cls, line: str) -> 'RecordedInvocation':
+        """
+        Reads an invocation from a line written by :meth:`to_json`.
+        """
+
+        data = json.loads(line)
+        return cls(float(data['ts']), str(data['content']), int(data['author']), int(data['channel']))
+
+
+class CommandRecorder:
+    """
+    Keeps the most recent command invocations while recording.
+
+    Parameters
+    -----------
+    max_size: int
+        The most invocations to keep. Once reached, the oldest are forgotten.
+    """
+
+    def __init__(self, max_size: int = 100_000):
+        self.invocations: typing.Deque[RecordedInvocation] = collections.deque(maxlen=max_size)
+        self.recording: bool = False
+        self.started_at: float = time.time()
+
+    def start(self):
+        """
+        Starts recording, forgetting anything recorded before.
+        """
+
+        self.invocations.clear()
+        self.started_at = time.time()
+        self.recording = True
+
+    def stop(self):
+        """
+        Stops recording. What was recorded so far is kept.
+        """
+
+        self.recording = False
+
+    def record(self, message: 'discord.Message'):
+        """
+        Records the invocation a message made, if recording.
+        """
+
+        if self.recording:
+            self.invocations.append(RecordedInvocation.from_message(message))
+
+    def export(self) -> str:
+        """
+        Returns every recorded invocation as JSON lines.
+        """
+
+        return "".join(invocation.to_json() + "\n" for invocation in self.invocations)
+
+
+def load_recording(text: str) -> typing.List[RecordedInvocation]:
+    """
+    Reads invocations from JSON lines, oldest first. Blank lines are skipped.
+
+    Raises ValueError naming the line number if a line can't be read.
+    """
+
+    invocations: typing.List[RecordedInvocation] = []
+
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+
+        try:
+            invocations.append(RecordedInvocation.from_json(line))
+        except (ValueError, KeyError, TypeError) as error:
+            raise ValueError(f"Line {number} is not a recorded invocation: {error}") from error
+
+    invocations.sort(key=lambda invocation: invocation.timestamp)
+    return invocations
+
+
+class ReplayResult(typing.NamedTuple):
+    """
+    The outcome of a replay.
+
+    ``latencies`` and ``errors`` are keyed by the qualified name of each command replayed.
+    Invocations whose context couldn't be made have no latency, and their errors are keyed by the message's first word instead.
+    ``skipped`` counts invocations that didn't resolve to a command.
+    """
+
+    latencies: typing.Dict[str, typing.List[float]]
+    errors: typing.Dict[str, typing.Counter[str]]
+    skipped: int
+    elapsed: float
+
+
+def unresolved_name(invocation: RecordedInvocation) -> str:
+    """
+    Names an invocation that couldn't be resolved to a command, by the first word of its message.
+    """
+
+    words = invocation.content.split(maxsplit=1)
+    return f"{words[0] if words else '(empty)'} (unresolved)"
+
+
+async def replay(
+    invocations: typing.Sequence[RecordedInvocation],
+    make_context: typing.Callable[[RecordedInvocation], typing.Awaitable['commands.Context[typing.Any]']],
+    speed: float = 1.0,
+    concurrency: int = 100
+) -> ReplayResult:
+    """
+    Replays invocations by invoking the context ``make_context`` makes for each.
+    Invocations go through :meth:`Command.invoke`, so checks, cooldowns and hooks apply as they normally would.
+
+    Invocations start at the same offsets from each other as when they were recorded, divided by ``speed``,
+    so they overlap as they did originally, with no more than ``concurrency`` in progress at once.
+    If ``speed`` is 0, they are run one at a time, as fast as possible.
+
+    Exceptions raised by commands or by ``make_context`` are counted rather than propagated, except cancellation,
+    which cancels every invocation in progress.
+    """
+
+    latencies: typing.Dict[str, typing.List[float]] = collections.defaultdict(list)
+    errors: typing.Dict[str, typing.Counter[str]] = collections.defaultdict(collections.Counter)
+    skipped = 0
+    start = time.perf_counter()
+
+    async def run(invocation: RecordedInvocation):
+        nonlocal skipped
+
+        try:
+            ctx = await make_context(invocation)
+        except Exception as error:  # pylint: disable=broad-except
+            # There's no command to count this under without a context, so it's counted under how the message started
+            errors[unresolved_name(invocation)][type(error).__name__] += 1
+            return
+
+        if ctx.command is None:
+            skipped += 1
+            return
+
+        name = ctx.command.qualified_name
+        began = time.perf_counter()
+
+        try:
+            await ctx.command.invoke(ctx)
+        except Exception as error:  # pylint: disable=broad-except
+            errors[name][type(getattr(error, 'original', None) or error).__name__] += 1
+        finally:
+            latencies[name].append(time.perf_counter() - began)
+
+    if speed <= 0:
+        for invocation in invocations:
+            await run(invocation)
+    elif invocations:
+        first = invocations[0].timestamp
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        pending: typing.Set['asyncio.Task[None]'] = set()
+
+        async def run_and_release(invocation: RecordedInvocation):
+            try:
+                await run(invocation)
+            finally:
+                semaphore.release()
+
+        # Invocations are started from this one loop as they come due, rather than all waiting in tasks of their own
+        try:
+            for invocation in invocations:
+                await asyncio.sleep(start + (invocation.timestamp - first) / speed - time.perf_counter())
+                await semaphore.acquire()
+
+                task = asyncio.get_running_loop().create_task(run_and_release(invocation))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            for task in list(pending):
+                task.cancel()
+
+    return ReplayResult(dict(latencies), dict(errors), skipped, time.perf_counter() - start)
+
+
+def format_replay_result(result: ReplayResult) -> typing.List[str]:
+    """
+    Returns a summary of a replay, with the latency and errors of each command, slowest mean first.
+    """
+
+    replayed = sum(map(len, result.latencies.values()))
+    lines = [
+        f"Replayed {replayed} invocation(s) of {len(result.latencies)} command(s) in {natural_time(result.elapsed).strip()}"
+        f"{f', skipped {result.skipped} that matched no command' if result.skipped else ''}"
+    ]
+
+    for name, latencies in sorted(result.latencies.items(), key=lambda item: mean_stddev(item[1])[0], reverse=True):
+        average, _ = mean_stddev(latencies)
+        lines.append(name)
+        lines.append(
+            f"  {len(latencies)} invocation(s), mean {natural_time(average).strip()}, "
+            f"p90 {natural_time(percentile(latencies, 0.9)).strip()}, max {natural_time(max(latencies)).strip()}"
+        )
+
+        if name in result.errors:
+            lines.append("  Errors: " + ", ".join(f"{error}: {count}" for error, count in result.errors[name].most_common()))
+
+    for name, errors in result.errors.items():
+        if name not in result.latencies:
+            lines.append(name)
+            lines.append("  Failed before invoking: " + ", ".join(f"{error}: {count}" for error, count in errors.most_common()))
+
+    return lines
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.sync
+~~~~~~~~~~~~
+
+Helpers for syncing application commands to Discord only when they have changed.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import typing
+
+import aiohttp
+import discord
+
+__all__ = ('payload_hash', 'SyncHashStore', 'SyncEvent', 'SyncScheduler')
+
+T = typing.TypeVar('T')
+
+# discord.RateLimited only exists in newer versions of discord.py
+RATE_LIMITED: typing.Any = getattr(discord, 'RateLimited', ())
+
+
+def payload_hash(payload: typing.Any) -> str:
+    """
+    Returns a stable hash of an application command payload.
+
+    Keys are sorted before hashing, so the same commands always hash the same regardless of dict ordering.
+    """
+
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class SyncHashStore:
+    """
+    Remembers the hash of the payload last synced to each target (a guild ID, or None for global commands).
+
+    Hashes are kept per application, so several bots can share a file.
+    If a path is given, hashes are loaded from and saved to it as JSON, so they persist across restarts.
+    Otherwise, they are only kept in memory.
+
+    Parameters
+    -----------
+    path: Optional[str]
+        The file to persist hashes to.
+    """
+
+    def __init__(self, path: typing.Optional[str] = None):
+        self.path: typing.Optional[str] = path
+        self.hashes: typing.Dict[str, str] = {}
+
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                data = {}
+
+            if isinstance(data, dict):
+                self.hashes = {str(key): str(value) for key, value in data.items()}
+
+    @staticmethod
+    def key(application_id: int, target: typing.Optional[int]) -> str:
+        """
+        Returns the key a target's hash is stored under.
+        """
+
+        return f"{application_id}:{'global' if target is None else target}"
+
+    def get(self, application_id: int, target: typing.Optional[int]) -> typing.Optional[str]:
+        """
+        Returns the hash of the payload last synced to a target, if known.
+        """
+
+        return self.hashes.get(self.key(application_id, target))
+
+    def set(self, application_id: int, target: typing.Optional[int], digest: str):
+        """
+        Records the hash of a payload that was just synced to a target.
+        """
+
+        self.hashes[self.key(application_id, target)] = digest
+
+    def discard(self, application_id: int, target: typing.Optional[int]):
+        """
+        Forgets a target's hash, so its next sync isn't skipped.
+        """
+
+        self.hashes.pop(self.key(application_id, target), None)
+
+    def save(self):
+        """
+        Writes the hashes to the file, if there is one.
+
+        The file is replaced atomically, so an interrupted save can't corrupt it.
+        """
+
+        if not self.path:
+            return
+
+        temporary = f"{self.path}.tmp"
+
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.hashes, file, indent=1, sort_keys=True)
+
+        os.replace(temporary, self.path)
+
+
+class SyncEvent(typing.NamedTuple):
+    """
+    Progress of a single sync job.
+
+    ``status`` is one of 'retrying', 'synced' or 'failed'.
+    For 'retrying', ``delay`` is how long the job will wait before its next attempt.
+    """
+
+    target: typing.Optional[int]
+    status: str
+    attempt: int
+    result: typing.Any = None
+    error: typing.Optional[BaseException] = None
+    delay: float = 0.0
+
+
+class SyncScheduler:
+    """
+    Runs sync jobs concurrently, retrying failed ones with exponential backoff.
+
+    All application command syncs share a rate limit, so when any job is rate limited,
+    every job waits out the limit before starting its next request, instead of each of them hitting it in turn.
+    Errors that retrying can't fix (e.g. invalid commands) are not retried.
+
+    Parameters
+    -----------
+    concurrency: int
+        The maximum amount of jobs running at once.
+    retries: int
+        How many times a job is retried before it is considered failed.
+    backoff: float
+        The delay before the first retry, in seconds. This doubles with every further retry.
+    max_backoff: float
+        The longest delay between retries, in seconds.
+    """
+
+    def __init__(self, concurrency: int = 4, retries: int = 3, backoff: float = 1.0, max_backoff: float = 30.0):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # Event loop time at which the shared rate limit is expected to be over
+        self.resume_at: float = 0.0
+
+    def retry_delay(self, error: BaseException, attempt: int) -> typing.Optional[float]:
+        """
+        Returns how long to wait before retrying after an error, or None if it shouldn't be retried.
+        """
+
+        if attempt > self.retries:
+            return None
+
+        retry_after: typing.Optional[float] = None
+
+        if isinstance(error, RATE_LIMITED):
+            retry_after = error.retry_after  # type: ignore
+        elif isinstance(error, discord.HTTPException) and error.status == 429:
+            headers = getattr(error.response, 'headers', None) or {}
+
+            try:
+                retry_after = float(headers.get('Retry-After', self.backoff))
+            except ValueError:
+                retry_after = self.backoff
+
+        if retry_after is not None:
+            loop = asyncio.get_event_loop()
+            self.resume_at = max(self.resume_at, loop.time() + retry_after)
+            return retry_after
+
+        if (
+            (isinstance(error, discord.HTTPException) and error.status >= 500)
+            or isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, OSError))
+        ):
+            return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+        return None
+
+    async def wait_for_rate_limit(self):
+        """
+        Waits until the shared rate limit is expected to be over.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        while self.resume_at > loop.time():
+            await asyncio.sleep(self.resume_at - loop.time())
+
+    async def run(
+        self,
+        jobs: typing.Iterable[typing.Tuple[typing.Optional[int], typing.Callable[[], typing.Awaitable[T]]]]
+    ) -> typing.AsyncIterator[SyncEvent]:
+        """
+        Runs (target, job) pairs, yielding events as jobs are retried, succeed or fail.
+
+        Each job is a callable returning a new awaitable, so it can be attempted more than once.
+        If the iteration is stopped early, the remaining jobs are cancelled.
+        """
+
+        queue: 'asyncio.Queue[SyncEvent]' = asyncio.Queue()
+        semaphore = asyncio.Semaphore(max(self.concurrency, 1))
+
+        async def worker(target: typing.Optional[int], job: typing.Callable[[], typing.Awaitable[T]]):
+            attempt = 0
+
+            while True:
+                attempt += 1
+
+                async with semaphore:
+                    await self.wait_for_rate_limit()
+
+                    try:
+                        result = await job()
+                    except Exception as error:  # pylint: disable=broad-except
+                        delay = self.retry_delay(error, attempt)
+
+                        if delay is None:
+                            queue.put_nowait(SyncEvent(target, 'failed', attempt, error=error))
+                            return
+
+                        queue.put_nowait(SyncEvent(target, 'retrying', attempt, error=error, delay=delay))
+                    else:
+                        queue.put_nowait(SyncEvent(target, 'synced', attempt, result=result))
+                        return
+
+                # Wait outside of the semaphore, so other jobs can run in the meantime
+                await asyncio.sleep(delay)
+
+        tasks = [asyncio.ensure_future(worker(target, job)) for target, job in jobs]
+        remaining = len(tasks)
+
+        try:
+            while remaining:
+                event = await queue.get()
+
+                if event.status != 'retrying':
+                    remaining -= 1
+
+                yield event
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.tasks
+~~~~~~~~~~~~~
+
+Functions for inspecting every asyncio task running in the process.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import collections
+import time
+import typing
+import weakref
+
+__all__ = ('task_name', 'task_age', 'format_task_stack', 'TaskSnapshot', 'take_task_snapshot', 'task_growth',
+           'format_task_groups')
+
+# When each task was first seen by an inspection. asyncio doesn't record when tasks are created,
+# so ages count from the first inspection that saw the task, and are a lower bound.
+FIRST_SEEN: 'weakref.WeakKeyDictionary[asyncio.Task[typing.Any], float]' = weakref.WeakKeyDictionary()
+
+
+def task_name(task: 'asyncio.Task[typing.Any]') -> str:
+    """
+    Returns the qualified name of the coroutine a task is running, e.g. ``Client.connect``.
+    """
+
+    coro = task.get_coro()
+    return getattr(coro, '__qualname__', None) or getattr(coro, '__name__', None) or type(coro).__name__
+
+
+def all_tasks(now: typing.Optional[float] = None) -> typing.List['asyncio.Task[typing.Any]']:
+    """
+    Returns every unfinished task on the running event loop, recording when each was first seen.
+    """
+
+    now = time.monotonic() if now is None else now
+    tasks = [task for task in asyncio.all_tasks() if not task.done()]
+
+    for task in tasks:
+        FIRST_SEEN.setdefault(task, now)
+
+    return tasks
+
+
+def task_age(task: 'asyncio.Task[typing.Any]', now: typing.Optional[float] = None) -> float:
+    """
+    Returns how long ago a task was first seen, in seconds.
+    """
+
+    now = time.monotonic() if now is None else now
+    return now - FIRST_SEEN.setdefault(task, now)
+
+
+def format_task_stack(task: 'asyncio.Task[typing.Any]', limit: int = 8) -> typing.List[str]:
+    """
+    Returns the await stack a task is suspended in, outermost first, as 'file:line in function' lines.
+
+    Only the innermost ``limit`` frames are kept.
+    """
+
+    lines: typing.List[str] = []
+    awaiting: typing.Any = task.get_coro()
+
+    # Task.get_stack only gives the outermost frame of a suspended coroutine, so follow what each coroutine awaits instead
+    while awaiting is not None:
+        frame = getattr(awaiting, 'cr_frame', None) or getattr(awaiting, 'gi_frame', None) or getattr(awaiting, 'ag_frame', None)
+
+        if frame is None:
+            break
+
+        lines.append(f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}")
+        awaiting = (
+            getattr(awaiting, 'cr_await', None) or getattr(awaiting, 'gi_yieldfrom', None) or getattr(awaiting, 'ag_await', None)
+        )
+
+    if not lines:
+        # Running or unusual tasks, where get_stack can see the frames directly
+        lines = [
+            f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+            for frame in task.get_stack(limit=limit)
+        ]
+
+    return lines[-limit:]
+
+
+class TaskSnapshot(typing.NamedTuple):
+    """
+    A count of unfinished asyncio tasks by coroutine name.
+    """
+
+    taken_at: float
+    counts: typing.Counter[str]
+
+    @property
+    def total(self) -> int:
+        """
+        The total amount of tasks counted.
+        """
+
+        return sum(self.counts.values())
+
+
+def take_task_snapshot() -> TaskSnapshot:
+    """
+    Counts every unfinished task on the running event loop by coroutine name.
+    """
+
+    return TaskSnapshot(time.time(), collections.Counter(map(task_name, all_tasks())))
+
+
+def task_growth(old: TaskSnapshot, new: TaskSnapshot) -> typing.List[typing.Tuple[str, int, int]]:
+    """
+    Compares two snapshots, returning (coroutine name, current count, change) for every name whose count changed,
+    sorted by the largest growth first.
+    """
+
+    changes = [
+        (name, new.counts[name], new.counts[name] - old.counts[name])
+        for name in set(old.counts) | set(new.counts)
+        if new.counts[name] != old.counts[name]
+    ]
+
+    changes.sort(key=lambda change: (change[2], change[1]), reverse=True)
+    return changes
+
+
+def format_task_groups(
+    name_filter: typing.Optional[str] = None,
+    stacks: int = 1,
+    stack_limit: int = 8
+) -> typing.List[str]:
+    """
+    Returns a report of every unfinished task on the running event loop except the current one,
+    grouped by coroutine name, with the most common groups first.
+
+    Each group shows its count and the age of its oldest and newest tasks,
+    followed by the stacks of up to ``stacks`` of its tasks, oldest first.
+    If ``name_filter`` is given, only groups whose name contains it are included.
+    """
+
+    now = time.monotonic()
+    current = asyncio.current_task()
+    groups: typing.Dict[str, typing.List['asyncio.Task[typing.Any]']] = collections.defaultdict(list)
+    tasks = [task for task in all_tasks(now) if task is not current]
+
+    for task in tasks:
+        groups[task_name(task)].append(task)
+
+    if name_filter:
+        groups = {name: group for name, group in groups.items() if name_filter.lower() in name.lower()}
+
+    shown = sum(map(len, groups.values()))
+
+    if name_filter:
+        lines = [f"{shown} of {len(tasks)} unfinished task(s), across {len(groups)} coroutine(s) matching {name_filter!r}", ""]
+    else:
+        lines = [f"{shown} unfinished task(s) across {len(groups)} coroutine(s)", ""]
+
+    for name, group in sorted(groups.items(), key=lambda item: (-len(item[1]), item[0])):
+        group.sort(key=lambda task: task_age(task, now), reverse=True)
+        oldest, newest = task_age(group[0], now), task_age(group[-1], now)
+        lines.append(f"{len(group):>6} x {name} (oldest seen {oldest:.0f}s ago, newest {newest:.0f}s ago)")
+
+        for task in group[:stacks]:
+            lines.append(f"         {task.get_name()}:")
+            lines.extend(f"           {frame}" for frame in format_task_stack(task, stack_limit) or ["(no frames)"])
+
+    return lines
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku manual context template benchmark
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+This benchmark compares making a context for each repetition of a command with copy_context_with,
+as jsk repeat used to, against cloning a ContextTemplate.
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import time
+from unittest import mock
+
+import discord
+from discord.ext import commands
+
+from jishaku.math import natural_time
+from jishaku.models import ContextTemplate, copy_context_with
+from tests.test_model import make_message
+
+ITERATIONS = 1000
+ROUNDS = 5
+
+
+async def main():
+    bot = commands.Bot(commands.when_mentioned_or('?', '!', 'jsk '), intents=discord.Intents.none())
+    bot._connection.user = mock.MagicMock(id=1)
+
+    @bot.group(invoke_without_command=True)
+    async def parent(ctx):
+        pass
+
+    @parent.command()
+    async def child(ctx, number: int, *, text: str):
+        pass
+
+    ctx = await bot.get_context(make_message(bot, "?hello"))
+    content = "?parent child 5 some text"
+
+    async def copying(invoke: bool):
+        for _ in range(ITERATIONS):
+            alt_ctx = await copy_context_with(ctx, content=content)
+
+            if invoke:
+                await alt_ctx.command.reinvoke(alt_ctx)
+
+    async def cloning(invoke: bool):
+        template = await ContextTemplate.from_context(ctx, content=content)
+
+        for _ in range(ITERATIONS):
+            alt_ctx = template.clone()
+
+            if invoke:
+                await alt_ctx.command.reinvoke(alt_ctx)
+
+    for invoke in (False, True):
+        print("Making contexts and invoking them:" if invoke else "Making contexts only:")
+
+        for name, function in (("copy_context_with", copying), ("ContextTemplate", cloning)):
+            timings = []
+
+            for _ in range(ROUNDS):
+                start = time.perf_counter()
+                await function(invoke)
+                timings.append(time.perf_counter() - start)
+
+            print(f"{name:>20}: best of {ROUNDS}, {natural_time(min(timings))} for {ITERATIONS} repetitions")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
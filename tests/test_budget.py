@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.budget test
+~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from jishaku.budget import ResourceSample, TaskBudget, TaskSupervisor, budget_exceeded
+
+
+def test_budget_exceeded():
+    baseline = ResourceSample(1.0, 100 * 1024 * 1024)
+
+    assert not TaskBudget()
+    assert budget_exceeded(TaskBudget(), 1000.0, baseline, ResourceSample(1000.0, 2 ** 40)) is None
+
+    assert "timeout" in budget_exceeded(TaskBudget(timeout=5.0), 6.0, baseline, baseline)
+    assert budget_exceeded(TaskBudget(timeout=5.0), 4.0, baseline, baseline) is None
+
+    assert "CPU time" in budget_exceeded(TaskBudget(cpu_time=2.0), 0.0, baseline, ResourceSample(3.5, baseline.rss))
+    assert budget_exceeded(TaskBudget(cpu_time=2.0), 0.0, baseline, ResourceSample(2.5, baseline.rss)) is None
+
+    memory = TaskBudget(memory=10 * 1024 * 1024)
+    assert "memory" in budget_exceeded(memory, 0.0, baseline, ResourceSample(1.0, 111 * 1024 * 1024))
+    assert budget_exceeded(memory, 0.0, baseline, ResourceSample(1.0, 109 * 1024 * 1024)) is None
+    # Without psutil, memory isn't limited
+    assert budget_exceeded(memory, 0.0, baseline, ResourceSample(1.0, None)) is None
+
+
+@pytest.mark.asyncio
+async def test_task_supervisor():
+    exceeded = []
+
+    async def on_exceeded(cmdtask, reason):
+        exceeded.append((cmdtask.index, reason))
+
+    tasks = {}
+    supervisor = TaskSupervisor(tasks, on_exceeded, interval=0.01)
+
+    def submit(index, budget):
+        task = asyncio.get_running_loop().create_task(asyncio.sleep(10))
+        tasks[index] = SimpleNamespace(index=index, task=task, elapsed=0.0, budget=budget, baseline=ResourceSample(0.0, None))
+        return task
+
+    slow = submit(1, TaskBudget(timeout=0.05))
+    unlimited = submit(2, TaskBudget())
+
+    supervisor.start()
+    await asyncio.sleep(0.05)
+    assert not exceeded
+
+    tasks[1].elapsed = 0.1
+    await asyncio.sleep(0.05)
+
+    assert [index for index, _ in exceeded] == [1]
+    assert "timeout" in exceeded[0][1]
+    assert list(tasks) == [2]
+
+    with pytest.raises(asyncio.CancelledError):
+        await slow
+
+    # With no budgeted tasks left, the supervisor stops by itself
+    assert not supervisor.running
+    assert not unlimited.done()
+    unlimited.cancel()
@@ -86,6 +86,17 @@ async def test_cog_attributes(bot):
 
     assert not cog.tasks
 
+    with cog.submit("mock 3") as first, cog.submit("mock 4") as second:
+        assert list(cog.tasks) == [3, 4]
+        assert cog.tasks[4] is second
+        assert first.elapsed >= 0
+        assert not first.resources
+
+        cog.tasks.pop(3)
+        assert list(cog.tasks) == [4]
+
+    assert not cog.tasks
+
 
 @pytest.mark.asyncio
 async def test_cog_check(bot):
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.loadtest test
+~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+
+import pytest
+
+from jishaku.loadtest import format_load_result, run_load
+
+
+@pytest.mark.asyncio
+async def test_run_load():
+    seen = []
+
+    async def invoke(index):
+        seen.append(index)
+        await asyncio.sleep(0.02)
+
+        if index % 5 == 0:
+            raise ValueError()
+
+    result = await run_load(invoke, 20, concurrency=10)
+
+    assert sorted(seen) == list(range(20))
+    assert len(result.latencies) == 20
+    assert result.peak_concurrency == 10
+    assert result.errors == {'ValueError': 4}
+    # Running 10 at once takes about as long as two invocations, rather than twenty
+    assert result.elapsed < 0.2
+
+    lines = format_load_result(result)
+    assert lines[0].startswith("20 invocation(s)")
+    assert "p99" in lines[2]
+    assert lines[-1] == "4 failed: ValueError: 4"
+
+    # Pacing spreads the starts out, even with more concurrency than needed
+    paced = await run_load(invoke, 5, concurrency=5, rate=50.0)
+    assert paced.elapsed >= 0.08
+    assert paced.peak_concurrency <= 2
+
+
+@pytest.mark.asyncio
+async def test_run_load_cancel():
+    started = []
+
+    async def invoke(index):
+        started.append(index)
+        await asyncio.sleep(10)
+
+    task = asyncio.get_running_loop().create_task(run_load(invoke, 100, concurrency=3))
+    await asyncio.sleep(0.02)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert started == [0, 1, 2]
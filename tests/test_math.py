@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.math test
+~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import pytest
+
+from jishaku.math import mean_stddev, percentile
+
+
+def test_percentile():
+    readings = [4.0, 1.0, 3.0, 2.0]
+
+    assert percentile(readings, 0.0) == 1.0
+    assert percentile(readings, 0.5) == 2.5
+    assert percentile(readings, 0.9) == pytest.approx(3.7)
+    assert percentile(readings, 1.0) == 4.0
+    assert percentile([5.0], 0.99) == 5.0
+    assert percentile(iter(readings), 2.0) == 4.0
+
+    with pytest.raises(ValueError):
+        percentile([], 0.5)
+
+
+def test_mean_stddev():
+    assert mean_stddev([2.0, 4.0, 4.0, 4.0, 5.0, 5.0, 7.0, 9.0]) == (5.0, pytest.approx(2.138, abs=1e-3))
+    assert mean_stddev([3.0]) == (3.0, 0.0)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.memory test
+~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import tracemalloc
+
+import pytest
+
+from jishaku.memory import SNAPSHOT_GROUPINGS, census_growth, format_snapshot_diff, take_census, take_snapshot
+
+
+def allocate_blocks():
+    return [bytearray(1024) for _ in range(512)]
+
+
+@pytest.fixture
+def tracing():
+    tracemalloc.start(5)
+    try:
+        yield
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("key_type", SNAPSHOT_GROUPINGS)
+def test_snapshot_diff(tracing, key_type):  # pylint: disable=redefined-outer-name,unused-argument
+    old = take_snapshot()
+    blocks = allocate_blocks()
+    new = take_snapshot()
+
+    report = format_snapshot_diff(old, new, key_type)
+
+    assert report.startswith("Total change: +")
+    assert "test_memory.py" in report
+    assert blocks
+
+    with pytest.raises(ValueError):
+        format_snapshot_diff(old, new, "nonsense")
+
+
+def test_snapshot_not_tracing():
+    with pytest.raises(RuntimeError):
+        take_snapshot()
+
+
+class CensusMarker:
+    pass
+
+
+def test_census():
+    old = take_census()
+    markers = [CensusMarker() for _ in range(100)]
+    new = take_census()
+
+    name = f"{__name__}.CensusMarker"
+
+    assert new.counts[name] - old.counts[name] == 100
+    assert sum(new.counts.values()) == new.total
+    assert len(new.gc_counts) == len(new.collections) == 3
+
+    growth = census_growth(old, new)
+    assert (name, new.counts[name], 100) in growth
+    assert growth == sorted(growth, key=lambda change: (change[2], change[1]), reverse=True)
+    assert markers
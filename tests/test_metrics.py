@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.metrics test
+~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+
+import aiohttp
+import discord
+import pytest
+
+from jishaku.metrics import CommandMetrics, Histogram, HTTPMetrics, LoopLagMonitor, MetricsServer
+
+
+def test_histogram():
+    histogram = Histogram((0.1, 0.2, 0.5, float('inf')))
+    assert histogram.quantile(0.5) == 0.0
+
+    for value in (0.05, 0.15, 0.15, 0.3, 2.0):
+        histogram.observe(value)
+
+    assert histogram.count == 5
+    assert histogram.mean == pytest.approx(0.53)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.cumulative() == [(0.1, 1), (0.2, 3), (0.5, 4), (float('inf'), 5)]
+
+    # Estimates fall within the bucket holding the quantile, and never outside what was observed
+    assert 0.1 <= histogram.quantile(0.5) <= 0.2
+    assert histogram.quantile(0.0) == 0.05
+    assert histogram.quantile(1.0) == 2.0
+
+
+class FakeHTTPClient:
+    async def request(self, route, **kwargs):
+        await asyncio.sleep(0)
+
+        if route.path.endswith('limited'):
+            logging.getLogger('discord.http').warning(
+                'We are being rate limited. %s %s responded with 429. Retrying in %.2f seconds.', route.method, route.path, 1.5
+            )
+        elif route.path.endswith('global'):
+            logging.getLogger('discord.http').warning('Global rate limit has been hit. Retrying in %.2f seconds.', 0.5)
+        elif route.path.endswith('missing'):
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "")  # type: ignore
+
+        return kwargs
+
+
+@pytest.mark.asyncio
+async def test_http_metrics():
+    http = FakeHTTPClient()
+    metrics = HTTPMetrics()
+    metrics.install(http)
+
+    try:
+        assert await http.request(SimpleNamespace(method='GET', path='/a'), json=1) == {'json': 1}
+        await http.request(SimpleNamespace(method='GET', path='/a'))
+        await http.request(SimpleNamespace(method='POST', path='/limited'))
+        await http.request(SimpleNamespace(method='POST', path='/global'))
+
+        with pytest.raises(discord.NotFound):
+            await http.request(SimpleNamespace(method='GET', path='/missing'))
+    finally:
+        metrics.uninstall()
+
+    assert 'request' not in http.__dict__
+    await http.request(SimpleNamespace(method='GET', path='/a'))
+
+    assert metrics.routes['GET /a'].latency.count == 2
+    assert metrics.routes['GET /a'].statuses == {'2xx': 2}
+    assert metrics.routes['GET /missing'].statuses == {'404': 1}
+    assert metrics.routes['GET /missing'].errors == 1
+    assert metrics.routes['POST /limited'].rate_limits == 1
+    assert metrics.routes['POST /global'].rate_limits == 1
+    assert metrics.rate_limited == 2.0
+
+    metrics.reset()
+    assert not metrics.routes
+
+
+class FakeContext:
+    def __init__(self, name):
+        self.command = SimpleNamespace(qualified_name=name)
+
+
+def test_command_metrics():
+    metrics = CommandMetrics(expiry=60)
+
+    first, second, third = FakeContext("jsk py"), FakeContext("jsk py"), FakeContext("jsk sh")
+    metrics.start_context(first)
+    metrics.start_context(second)
+    metrics.start_context(third)
+    assert metrics.active() == {"jsk py": 2, "jsk sh": 1}
+
+    metrics.finish_context(first)
+    metrics.finish_context(second, SimpleNamespace(original=ValueError()))
+    metrics.finish_context(third, RuntimeError())
+    # Unknown invocations are ignored
+    metrics.finish_context(FakeContext("jsk py"))
+
+    stats = metrics.commands["jsk py"]
+    assert (stats.invocations, stats.peak_active) == (2, 2)
+    assert stats.errors == {'ValueError': 1}
+    assert metrics.commands["jsk sh"].errors == {'RuntimeError': 1}
+
+    # Invocations that never finish don't keep their context alive, or count as running
+    metrics.start_context(FakeContext("jsk py"))
+    assert not metrics.pending
+    assert not metrics.active()
+
+    completed = SimpleNamespace(id=1, data={'name': 'ping'}, command=None, command_failed=False)
+    failed = SimpleNamespace(id=2, data={}, command=SimpleNamespace(qualified_name='tag get'), command_failed=False)
+    metrics.start_interaction(completed)
+    metrics.start_interaction(failed)
+    metrics.finish_interaction(completed)
+
+    failed.command_failed = True
+    metrics.sweep()
+    assert metrics.commands["/ping"].invocations == 1
+    assert metrics.commands["/tag get"].errors == {'AppCommandError': 1}
+    assert not metrics.pending_interactions
+
+    export = "\n".join(metrics.prometheus())
+    assert '# TYPE discord_command_duration_seconds histogram' in export
+    assert 'discord_command_duration_seconds_bucket{command="jsk py",le="+Inf"} 2' in export
+    assert 'discord_command_duration_seconds_count{command="/ping"} 1' in export
+    assert 'discord_command_errors_total{command="jsk sh",error="RuntimeError"} 1' in export
+    assert 'discord_command_peak_active{command="jsk py"} 2' in export
+
+
+@pytest.mark.asyncio
+async def test_metrics_server():
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.02)
+
+    # Blocking the loop shows up as lag
+    time.sleep(0.05)
+    await asyncio.sleep(0.02)
+    monitor.stop()
+    assert monitor.lag.maximum >= 0.03
+
+    server = MetricsServer(lambda: "\n".join(monitor.prometheus()) + "\n")
+    assert server.url is None
+    await server.start('127.0.0.1', 0)
+
+    try:
+        assert server.url and server.url.startswith("http://127.0.0.1:")
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(server.url) as response:
+                assert response.status == 200
+                assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+                assert 'asyncio_loop_lag_seconds_count' in await response.text()
+    finally:
+        await server.stop()
+
+    assert server.url is None
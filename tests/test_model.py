@@ -9,9 +9,13 @@ jishaku.models tests
 
 """
 
+from unittest import mock
+
+import discord
 import pytest
+from discord.ext import commands
 
-from jishaku.models import copy_context_with
+from jishaku.models import ContextTemplate, copy_context_with
 from tests import utils
 
 
@@ -25,3 +29,48 @@ async def test_context_copy():
 
         alt_message._update.assert_called_once()
         assert alt_message._update.call_args[0] == ({"content": 3},)
+
+
+def make_message(bot, content):
+    channel = mock.MagicMock(spec=discord.TextChannel, guild=None, id=2)
+    data = {
+        'id': 3, 'channel_id': 2, 'author': {'id': 4, 'username': 'user', 'discriminator': '0', 'avatar': None},
+        'content': content, 'attachments': [], 'embeds': [], 'edited_timestamp': None, 'type': 0, 'pinned': False,
+        'mention_everyone': False, 'tts': False, 'mentions': [], 'mention_roles': []
+    }
+    return discord.Message(state=bot._connection, channel=channel, data=data)
+
+
+@pytest.mark.asyncio
+async def test_context_template():
+    bot = commands.Bot('?', intents=discord.Intents.none())
+    bot._connection.user = mock.MagicMock(id=1)
+    calls = []
+
+    @bot.group(invoke_without_command=True)
+    async def parent(ctx):
+        calls.append(('parent',))
+
+    @parent.command()
+    async def child(ctx, number: int, *, text: str):
+        calls.append((ctx.invoked_parents, number, text))
+
+    ctx = await bot.get_context(make_message(bot, "?hello"))
+    template = await ContextTemplate.from_context(ctx, content="?parent child 5 some text")
+
+    assert template.ctx.command is parent
+    # Like an attribute added by an overridden get_context
+    template.ctx.custom = "kept"
+
+    for _ in range(3):
+        alt_ctx = template.clone()
+        assert alt_ctx.custom == "kept"
+        await alt_ctx.command.reinvoke(alt_ctx)
+
+        assert alt_ctx.command is child
+
+    # Parents don't pile up across clones, and the template itself is untouched
+    assert calls == [(['parent'], 5, "some text")] * 3
+    assert template.ctx.command is parent
+    assert not template.ctx.invoked_parents
+    assert not template.ctx.args
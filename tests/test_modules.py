@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.modules test
+~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import sys
+import textwrap
+import time
+
+import discord
+import pytest
+from discord.ext import commands
+
+from jishaku import modules
+from jishaku.modules import ExtensionTracker, extension_dependencies, find_extensions_in, load_extensions, resolve_extensions, watch_files
+
+EXTENSION_TEMPLATE = '''
+import asyncio
+
+__extension_dependencies__ = {dependencies!r}
+
+LOG = __import__('{package}').LOG
+
+
+async def setup(bot):
+    LOG.append(('start', __name__))
+    await asyncio.sleep({delay})
+    {body}
+    LOG.append(('end', __name__))
+'''
+
+
+@pytest.fixture(name="package")
+def package_fixture(tmp_path, monkeypatch, request):
+    name = f"jsk_test_{request.node.name.replace('[', '_').replace(']', '_')}"
+    root = tmp_path / name
+    root.mkdir()
+    (root / "__init__.py").write_text("LOG = []\n")
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def add(extension: str, dependencies=(), delay: float = 0.01, body: str = "pass"):
+        (root / f"{extension}.py").write_text(textwrap.dedent(EXTENSION_TEMPLATE.format(
+            dependencies=tuple(f"{name}.{dependency}" for dependency in dependencies),
+            package=name, delay=delay, body=body
+        )))
+        return f"{name}.{extension}"
+
+    yield name, add
+
+    for module in [module for module in sys.modules if module == name or module.startswith(f"{name}.")]:
+        del sys.modules[module]
+
+
+def test_extension_dependencies(package):
+    name, add = package
+    extension = add("a", dependencies=["b", "c"])
+
+    assert extension_dependencies(extension) == [f"{name}.b", f"{name}.c"]
+    assert extension_dependencies(add("b")) == []
+    assert extension_dependencies(f"{name}.missing") == []
+    assert extension_dependencies("") == []
+
+
+def test_extension_dependencies_broken_parent(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (tmp_path / "jsk_test_broken").mkdir()
+    (tmp_path / "jsk_test_broken" / "__init__.py").write_text("raise RuntimeError('broken')\n")
+    (tmp_path / "jsk_test_broken" / "extension.py").write_text("")
+
+    # Finding the extension imports its broken parent package, which shouldn't escape
+    assert extension_dependencies("jsk_test_broken.extension") == []
+    sys.modules.pop("jsk_test_broken", None)
+
+
+@pytest.mark.asyncio
+async def test_load_extensions(package):
+    name, add = package
+    bot = commands.Bot('?', intents=discord.Intents.none())
+
+    core = add("core", delay=0.05)
+    dependent = add("dependent", dependencies=["core"])
+    independent = add("independent")
+    broken = add("broken", body="raise RuntimeError('nope')")
+    skipped = add("skipped", dependencies=["broken"])
+    cycle_a = add("cycle_a", dependencies=["cycle_b"])
+    cycle_b = add("cycle_b", dependencies=["cycle_a"])
+
+    order = [dependent, core, independent, broken, skipped, cycle_a, cycle_b]
+    results = await load_extensions(bot, order, concurrency=4)
+    log = sys.modules[name].LOG
+
+    assert [result.extension for result in results] == order
+    assert {result.extension for result in results if result.error is None} == {core, dependent, independent}
+    assert isinstance(results[3].error, commands.ExtensionFailed)
+    assert "dependency" in str(results[4].error)
+    assert "circular" in str(results[5].error)
+    assert not any(result.reloaded for result in results)
+
+    # The dependent extension only started once its dependency finished,
+    # while the independent extension ran alongside the dependency
+    assert log.index(('end', core)) < log.index(('start', dependent))
+    assert log.index(('start', independent)) < log.index(('end', core))
+
+    results = await load_extensions(bot, [core, dependent])
+    assert all(result.reloaded and result.error is None for result in results)
+
+
+@pytest.mark.asyncio
+async def test_extension_tracker(package, tmp_path, monkeypatch):
+    name, add = package
+    bot = commands.Bot('?', intents=discord.Intents.none())
+
+    (tmp_path / name / "helpers.py").write_text("VALUE = 1\n")
+    (tmp_path / name / "unrelated.py").write_text("VALUE = 2\n")
+    first = add("first", body="from . import helpers")
+    second = add("second")
+
+    await load_extensions(bot, [first, second])
+
+    # Nothing was recorded yet, so anything modified after the baseline counts as changed
+    assert first in ExtensionTracker(baseline=0).changes(first)
+    tracker = ExtensionTracker(baseline=time.time() + 60)
+    assert tracker.changes(first) == []
+
+    tracker.record(first)
+    tracker.record(second)
+    # `from . import helpers` imports the package itself too
+    assert set(tracker.sources[first]) == {first, name, f"{name}.helpers"}
+
+    def modify(filename: str, text: str):
+        path = tmp_path / name / filename
+        path.write_text(text)
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    # Touching without changing content is not a change
+    modify("helpers.py", "VALUE = 1\n")
+    modify("unrelated.py", "VALUE = 3\n")
+    assert tracker.changes(first) == []
+    assert tracker.changes(second) == []
+
+    modify("helpers.py", "VALUE = 4\n")
+    assert tracker.changes(first) == [f"{name}.helpers"]
+    assert tracker.changes(second) == []
+
+    tracker.record(first)
+    assert tracker.changes(first) == []
+
+    # Imports are only parsed again for files that changed
+    parsed = []
+    original = modules.source_imports
+    monkeypatch.setattr(modules, 'source_imports', lambda *args: parsed.append(args[0]) or original(*args))
+
+    modify("helpers.py", "from . import unrelated\n")
+    assert set(tracker.find_sources(first)) == {first, name, f"{name}.helpers", f"{name}.unrelated"}
+    assert parsed == [f"{name}.helpers", f"{name}.unrelated"]
+
+
+@pytest.mark.asyncio
+async def test_watch_files(tmp_path):
+    watcher = watch_files(lambda: [str(tmp_path)], interval=0.01, debounce=0.05).__aiter__()
+    changes = asyncio.ensure_future(watcher.__anext__())
+
+    await asyncio.sleep(0.05)
+    (tmp_path / "notes.txt").write_text("ignored")
+    (tmp_path / "a.py").write_text("")
+    await asyncio.sleep(0.02)
+    (tmp_path / "b.py").write_text("")
+
+    # Both writes land in the same burst
+    assert await asyncio.wait_for(changes, 5) == {str(tmp_path / "a.py"), str(tmp_path / "b.py")}
+
+    changes = asyncio.ensure_future(watcher.__anext__())
+    (tmp_path / "a.py").unlink()
+    assert await asyncio.wait_for(changes, 5) == {str(tmp_path / "a.py")}
+
+    await watcher.aclose()
+
+
+def test_find_extensions_in(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    for file in (
+        "cogs/__init__.py", "cogs/alpha.py", "cogs/beta.py", "cogs/notes.txt",
+        "cogs/package/__init__.py", "cogs/package/helper.py",
+        "cogs/group/gamma.py", "cogs/group/deeper/delta.py", "cogs/group/deeper/package/__init__.py",
+        "cogs/__pycache__/alpha.py", "cogs/.hidden/epsilon.py",
+    ):
+        (tmp_path / file).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / file).write_text("")
+
+    assert find_extensions_in("cogs") == ["cogs.alpha", "cogs.beta", "cogs.package"]
+    assert find_extensions_in("./cogs") == ["cogs.alpha", "cogs.beta", "cogs.package"]
+    assert find_extensions_in("cogs", recursive=True) == [
+        "cogs.alpha", "cogs.beta", "cogs.package", "cogs.group.gamma", "cogs.group.deeper.delta", "cogs.group.deeper.package"
+    ]
+    assert find_extensions_in("missing") == []
+    assert find_extensions_in("cogs/alpha.py") == []
+
+    bot = commands.Bot('?', intents=discord.Intents.none())
+    assert resolve_extensions(bot, "cogs.group.**") == ["cogs.group.gamma", "cogs.group.deeper.delta", "cogs.group.deeper.package"]
+    assert resolve_extensions(bot, "cogs.group.*") == ["cogs.group.gamma"]
+
+    # Listings are cached until a directory's modification time changes
+    scan = modules.SCAN_CACHE[str(tmp_path / "cogs" / "group")]
+    assert find_extensions_in("cogs/group") == ["cogs.group.gamma"]
+    assert modules.SCAN_CACHE[str(tmp_path / "cogs" / "group")] is scan
+
+    (tmp_path / "cogs" / "group" / "zeta.py").write_text("")
+    os.utime(tmp_path / "cogs" / "group", ns=(scan.mtime_ns, scan.mtime_ns + 1_000_000_000))
+    assert find_extensions_in("cogs/group") == ["cogs.group.gamma", "cogs.group.zeta"]
+
+    # Listings of directories that no longer exist are dropped, and only the most recently used are kept
+    (tmp_path / "cogs" / "group" / "deeper" / "delta.py").unlink()
+    (tmp_path / "cogs" / "group" / "deeper" / "package" / "__init__.py").unlink()
+    (tmp_path / "cogs" / "group" / "deeper" / "package").rmdir()
+    (tmp_path / "cogs" / "group" / "deeper").rmdir()
+    assert find_extensions_in("cogs/group/deeper") == []
+    assert str(tmp_path / "cogs" / "group" / "deeper") not in modules.SCAN_CACHE
+
+    monkeypatch.setattr(modules, 'SCAN_CACHE_SIZE', 2)
+    find_extensions_in("cogs")
+    assert list(modules.SCAN_CACHE) == [str(tmp_path / "cogs" / "group"), str(tmp_path / "cogs" / "package")]
+
+
+def test_find_extensions_in_parallel(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    for index in range(modules.PARALLEL_SCAN_THRESHOLD * 2):
+        (tmp_path / "cogs" / f"group{index:02}").mkdir(parents=True)
+        (tmp_path / "cogs" / f"group{index:02}" / "extension.py").write_text("")
+
+    pools = []
+    pool_class = concurrent.futures.ThreadPoolExecutor
+
+    def make_pool(*args, **kwargs):
+        pools.append(pool_class(*args, **kwargs))
+        return pools[-1]
+
+    monkeypatch.setattr(concurrent.futures, 'ThreadPoolExecutor', make_pool)
+
+    assert find_extensions_in("cogs", recursive=True) == [
+        f"cogs.group{index:02}.extension" for index in range(modules.PARALLEL_SCAN_THRESHOLD * 2)
+    ]
+    # The pool is shut down once the scan is done
+    assert pools and all(pool._shutdown for pool in pools)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.permissions test
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from jishaku.permissions import ALL_PERMISSIONS, PERMISSION_NAMES, PermissionIndex, PermissionResolver, audit_permissions
+
+GUILD_ID = 1000
+OWNER_ID = 1
+MEMBER_ID = 2
+MODERATOR_ID = 2000
+ADMIN_ID = 3000
+
+
+def role(role_id: int, name: str, position: int, **permissions: bool):
+    return SimpleNamespace(id=role_id, name=name, position=position, permissions=discord.Permissions(**permissions))
+
+
+def overwrite(target_id: int, target_type: int, allow: discord.Permissions, deny: discord.Permissions):
+    return discord.abc._Overwrites({  # pylint: disable=protected-access
+        'id': target_id, 'type': target_type, 'allow': str(allow.value), 'deny': str(deny.value)  # type: ignore
+    })
+
+
+@pytest.fixture(name="guild")
+def guild_fixture():
+    everyone = role(GUILD_ID, "@everyone", 0, view_channel=True, send_messages=True)
+
+    return SimpleNamespace(
+        id=GUILD_ID,
+        owner_id=OWNER_ID,
+        default_role=everyone,
+        roles=[
+            everyone,
+            role(MODERATOR_ID, "Moderator", 1, manage_messages=True),
+            role(ADMIN_ID, "Admin", 2, administrator=True),
+        ]
+    )
+
+
+@pytest.fixture(name="channel")
+def channel_fixture(guild):
+    return SimpleNamespace(id=10, guild=guild, _overwrites=[
+        overwrite(GUILD_ID, 0, discord.Permissions.none(), discord.Permissions(send_messages=True)),
+        overwrite(MODERATOR_ID, 0, discord.Permissions(send_messages=True), discord.Permissions(view_channel=True)),
+        overwrite(MEMBER_ID, 1, discord.Permissions(view_channel=True), discord.Permissions(manage_messages=True)),
+    ])
+
+
+def test_permission_names():
+    assert PERMISSION_NAMES[3] == 'administrator'
+    assert set(PERMISSION_NAMES.values()) == {name for name, _ in discord.Permissions.all()}
+
+
+def test_everyone(guild, channel):
+    trace = PermissionResolver(guild).resolve(channel, [GUILD_ID])
+    explained = {name: (allowed, reason) for name, allowed, reason in trace.explain()}
+
+    assert trace.permissions.view_channel
+    assert not trace.permissions.send_messages
+    assert explained['send_messages'] == (False, "it is the channel's @everyone overwrite")
+    assert explained['read_messages'] == (True, "it is the server-wide @everyone permission")
+    assert explained['ban_members'] == (False, "it is the server-wide @everyone permission")
+
+
+def test_role_overwrites(guild, channel):
+    trace = PermissionResolver(guild).resolve(channel, [GUILD_ID, MODERATOR_ID])
+    explained = {name: (allowed, reason) for name, allowed, reason in trace.explain()}
+
+    assert explained['manage_messages'] == (True, "it is the server-wide Moderator permission")
+    assert explained['send_messages'] == (True, "it is the channel's Moderator overwrite")
+    assert explained['read_messages'] == (False, "it is the channel's Moderator overwrite")
+
+
+def test_member_overwrites(guild, channel):
+    trace = PermissionResolver(guild).resolve(channel, [GUILD_ID, MODERATOR_ID], {MEMBER_ID: "<@2>"})
+    explained = {name: (allowed, reason) for name, allowed, reason in trace.explain()}
+
+    assert explained['read_messages'] == (True, "it is the channel's <@2> overwrite")
+    assert explained['manage_messages'] == (False, "it is the channel's <@2> overwrite")
+
+    untraced = PermissionResolver(guild).resolve(channel, [GUILD_ID, MODERATOR_ID], {MEMBER_ID: "<@2>"}, trace=False)
+    assert untraced.value == trace.value
+    assert untraced.reasons is None
+
+
+def test_administrator_and_owner(guild, channel):
+    resolver = PermissionResolver(guild)
+
+    trace = resolver.resolve(channel, [GUILD_ID, MODERATOR_ID, ADMIN_ID])
+    explained = {name: (allowed, reason) for name, allowed, reason in trace.explain()}
+
+    assert trace.value == ALL_PERMISSIONS
+    assert explained['manage_messages'] == (True, "it is the server-wide Moderator permission")
+    assert explained['ban_members'] == (True, "it is granted by Administrator on the server-wide Admin permission")
+
+    trace = resolver.resolve(channel, [GUILD_ID], {OWNER_ID: "<@1>"})
+
+    assert trace.value == ALL_PERMISSIONS
+    assert all(reason == "<@1> owns the server" for _, _, reason in trace.explain())
+
+
+@pytest.mark.asyncio
+async def test_audit(guild, channel):
+    other_channel = SimpleNamespace(id=11, guild=guild, _overwrites=[])
+
+    guild.channels = [channel, other_channel]
+    guild.members = [
+        SimpleNamespace(id=OWNER_ID, _roles=[]),
+        SimpleNamespace(id=MEMBER_ID, _roles=[MODERATOR_ID]),
+        SimpleNamespace(id=3, _roles=[MODERATOR_ID]),
+        SimpleNamespace(id=4, _roles=[]),
+        SimpleNamespace(id=5, _roles=[ADMIN_ID]),
+    ]
+
+    resolver = PermissionResolver(guild)
+    results = [(audited_channel, values) async for audited_channel, values in audit_permissions(guild, batch_size=1)]
+
+    assert [audited_channel for audited_channel, _ in results] == guild.channels
+
+    for audited_channel, values in results:
+        assert values[OWNER_ID] == ALL_PERMISSIONS
+        assert values[5] == ALL_PERMISSIONS
+
+        for member in guild.members[1:4]:
+            members = {member.id: ''}
+            expected = resolver.resolve(audited_channel, member._roles, members, trace=False).value
+
+            if not expected & discord.Permissions.view_channel.flag:
+                expected &= ~discord.Permissions.all_channel().value
+
+            assert values[member.id] == expected
+
+    # Member 3 shares a role set with MEMBER_ID but has no member overwrite, so can't see the first channel
+    assert results[0][1][3] & discord.Permissions.all_channel().value == 0
+    assert discord.Permissions(results[0][1][MEMBER_ID]).view_channel
+    assert not discord.Permissions(results[0][1][MEMBER_ID]).manage_messages
+
+
+@pytest.mark.asyncio
+async def test_index(guild, channel):
+    guild.channels = [channel]
+    guild.members = [SimpleNamespace(id=MEMBER_ID, _roles=[MODERATOR_ID]), SimpleNamespace(id=3, _roles=[MODERATOR_ID])]
+
+    resolver = PermissionResolver(guild)
+    index = PermissionIndex()
+
+    for members in (None, {MEMBER_ID: "<@2>"}, {OWNER_ID: "<@1>"}):
+        for trace in (False, True, True):
+            expected = resolver.resolve(channel, [GUILD_ID, MODERATOR_ID], members, trace=trace)
+            assert index.resolve(channel, [GUILD_ID, MODERATOR_ID], members, trace=trace) == expected
+
+    # The untraced lookup was upgraded in place, and served every lookup after it
+    assert len(index) == 1
+    assert index.misses == 2
+
+    audited = [values async for _, values in audit_permissions(guild, index=index)]
+    assert audited == [values async for _, values in audit_permissions(guild)]
+    assert index.hits > 2
+
+    # An empty index is filled by an audit too
+    empty = PermissionIndex()
+    assert [values async for _, values in audit_permissions(guild, index=empty)] == audited
+    assert len(empty) and empty.misses
+
+    # Changing the channel is not seen until it is invalidated
+    assert not index.resolve(channel, [GUILD_ID]).permissions.send_messages
+    channel._overwrites = []
+    assert not index.resolve(channel, [GUILD_ID]).permissions.send_messages
+
+    index.invalidate(GUILD_ID, channel.id)
+    assert index.resolve(channel, [GUILD_ID]).permissions.send_messages
+
+    # Neither is a new role for a member
+    guild.members[1]._roles = [ADMIN_ID]
+    assert frozenset([ADMIN_ID]) not in index.member_groups(guild)
+
+    index.invalidate_members(GUILD_ID)
+    assert frozenset([ADMIN_ID]) in index.member_groups(guild)
+
+    index.invalidate(GUILD_ID)
+    assert len(index) == 0
+    assert not index.resolvers
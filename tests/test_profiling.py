@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.profiling test
+~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import cProfile
+import pstats
+import sys
+import threading
+import time
+
+import pytest
+
+from jishaku.profiling import (TRUNCATED_FRAME, ImportProfiler, ProfiledCoroutine, StackSampler, dump_profile_stats, format_import_tree, format_load_profile,
+                               format_profile_stats)
+
+
+def busy_function(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_stack_sampler():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_function, args=(stop,), name="busy-thread")
+    thread.start()
+
+    try:
+        with StackSampler(interval=0.001) as sampler:
+            time.sleep(0.2)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert not sampler.running
+    assert sampler.sample_count > 0
+
+    busy_stacks = [stack for stack in sampler.samples if stack[0] == "thread:busy-thread"]
+    assert busy_stacks
+    assert any(frame.startswith("busy_function (test_profiling.py:") for stack in busy_stacks for frame in stack)
+
+    for line in sampler.collapsed().splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+        assert stack.split(';')[0].startswith("thread:")
+
+    summary = sampler.summary()
+    assert all(entry.own <= entry.total for entry in summary)
+    assert not any(entry.frame.startswith(("thread:", "task:")) for entry in summary)
+
+
+def deep_function(depth: int, stop: threading.Event):
+    if depth:
+        deep_function(depth - 1, stop)
+    else:
+        busy_function(stop)
+
+
+def test_stack_sampler_max_depth():
+    stop = threading.Event()
+    thread = threading.Thread(target=deep_function, args=(50, stop), name="deep-thread")
+    thread.start()
+
+    try:
+        with StackSampler(interval=0.001, max_depth=5) as sampler:
+            time.sleep(0.1)
+    finally:
+        stop.set()
+        thread.join()
+
+    deep_stacks = [stack[1:] for stack in sampler.samples if stack[0] == "thread:deep-thread"]
+    assert deep_stacks
+
+    # The executing frames are kept, and the frames nearest the root are dropped
+    for stack in deep_stacks:
+        assert stack[0] == TRUNCATED_FRAME
+        assert len(stack) == 6
+
+    assert any(stack[-1].startswith("busy_function ") for stack in deep_stacks)
+    assert not any(entry.frame == TRUNCATED_FRAME for entry in sampler.summary())
+
+
+@pytest.mark.asyncio
+async def test_stack_sampler_tasks():
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+
+    try:
+        deadline = time.perf_counter() + 0.2
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+    finally:
+        sampler.stop()
+
+    assert any(
+        len(stack) > 1 and stack[1].startswith("task:")
+        for stack in sampler.samples
+    )
+
+    with pytest.raises(RuntimeError):
+        sampler.start()
+        sampler.start()
+
+    sampler.stop()
+
+
+def profiled_work():
+    return sum(range(10000))
+
+
+def unrelated_work():
+    return sum(range(10000))
+
+
+@pytest.mark.asyncio
+async def test_profiled_coroutine(tmp_path):
+    async def target():
+        for _ in range(5):
+            profiled_work()
+            await asyncio.sleep(0.01)
+
+        return "done"
+
+    async def unrelated():
+        for _ in range(5):
+            unrelated_work()
+            await asyncio.sleep(0.01)
+
+    profiler = cProfile.Profile()
+    other = asyncio.create_task(unrelated())
+
+    assert await ProfiledCoroutine(target(), profiler) == "done"
+    await other
+
+    report = format_profile_stats(profiler)
+    assert "profiled_work" in report
+    assert "unrelated_work" not in report
+
+    path = tmp_path / "profile.pstats"
+    path.write_bytes(dump_profile_stats(profiler))
+
+    functions = {name for _, _, name in pstats.Stats(str(path)).stats}  # type: ignore
+    assert "profiled_work" in functions
+
+
+def test_import_profiler(tmp_path, monkeypatch):
+    (tmp_path / "jsk_import_outer.py").write_text("import time\nimport jsk_import_inner\ntime.sleep(0.01)\n")
+    (tmp_path / "jsk_import_inner.py").write_text("import time\ntime.sleep(0.02)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    try:
+        with ImportProfiler() as profiler:
+            import jsk_import_outer  # type: ignore  # pylint: disable=import-outside-toplevel,import-error,unused-import
+    finally:
+        sys.modules.pop("jsk_import_outer", None)
+        sys.modules.pop("jsk_import_inner", None)
+
+    assert profiler not in sys.meta_path
+
+    outer = profiler.find("jsk_import_outer")
+    assert outer is not None
+    assert [child.name for child in outer.children] == ["jsk_import_inner"]
+    assert outer.elapsed >= 0.03
+    assert 0.01 <= outer.own < outer.elapsed
+
+    # The proxy loader doesn't outlive the import
+    assert type(jsk_import_outer.__loader__).__name__ != "TimedLoader"
+
+    tree = format_import_tree(profiler.roots)
+    assert tree.index("jsk_import_outer") < tree.index("  jsk_import_inner")
+
+    report = format_load_profile([("jsk_import_outer", outer.elapsed + 0.5, outer)], profiler.roots)
+    line = report.splitlines()[1]
+    assert line.endswith("500.00ms  jsk_import_outer")
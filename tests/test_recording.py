@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.recording test
+~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from jishaku.recording import CommandRecorder, RecordedInvocation, format_replay_result, load_recording, replay
+
+
+def fake_message(timestamp, content, author_id=1, channel_id=2):
+    return SimpleNamespace(
+        created_at=datetime.fromtimestamp(timestamp, timezone.utc), content=content,
+        author=SimpleNamespace(id=author_id), channel=SimpleNamespace(id=channel_id)
+    )
+
+
+def test_recording():
+    recorder = CommandRecorder(max_size=2)
+    recorder.record(fake_message(1.0, "?ignored"))
+    assert not recorder.invocations
+
+    recorder.start()
+    recorder.record(fake_message(10.0, "?ping"))
+    recorder.record(fake_message(11.5, "?echo \"ünïcode\"\nline", author_id=3, channel_id=4))
+    recorder.record(fake_message(12.0, "?ping"))
+    recorder.stop()
+    recorder.record(fake_message(13.0, "?ignored"))
+
+    # Only the most recent are kept
+    assert [invocation.timestamp for invocation in recorder.invocations] == [11.5, 12.0]
+
+    text = recorder.export()
+    assert text.count("\n") == 2
+    assert text.splitlines()[0] == '{"ts":11.5,"content":"?echo \\"ünïcode\\"\\nline","author":3,"channel":4}'
+
+    # Invocations come back oldest first, skipping blank lines
+    assert load_recording("\n".join(reversed(text.splitlines())) + "\n\n") == list(recorder.invocations)
+
+    with pytest.raises(ValueError, match="Line 3"):
+        load_recording(text + '{"ts": 1}\n')
+
+
+class FakeCommand:
+    def __init__(self, name, calls, fail=False):
+        self.qualified_name = name
+        self.calls = calls
+        self.fail = fail
+
+    async def invoke(self, ctx):
+        self.calls.append((ctx.invocation.content, time.perf_counter()))
+        await asyncio.sleep(0.01)
+
+        if self.fail:
+            raise ValueError()
+
+
+@pytest.mark.asyncio
+async def test_replay():
+    calls = []
+    commands = {'?ping': FakeCommand('ping', calls), '?fail': FakeCommand('fail', calls, fail=True)}
+    invocations = [
+        RecordedInvocation(100.0, "?ping", 1, 2),
+        RecordedInvocation(100.5, "?fail", 1, 2),
+        RecordedInvocation(101.0, "?missing", 1, 2),
+        RecordedInvocation(101.0, "?ping", 1, 2),
+        RecordedInvocation(101.0, "?broken context", 1, 2),
+    ]
+
+    async def make_context(invocation):
+        if invocation.content.startswith("?broken"):
+            raise KeyError(invocation.channel_id)
+
+        return SimpleNamespace(invocation=invocation, command=commands.get(invocation.content))
+
+    start = time.perf_counter()
+    result = await replay(invocations, make_context, speed=10.0)
+
+    # Original spacing divided by the speed
+    assert [content for content, _ in calls] == ["?ping", "?fail", "?ping"]
+    assert calls[1][1] - start == pytest.approx(0.05, abs=0.03)
+    assert calls[2][1] - start == pytest.approx(0.1, abs=0.03)
+
+    assert {name: len(latencies) for name, latencies in result.latencies.items()} == {'ping': 2, 'fail': 1}
+    assert result.errors == {'fail': {'ValueError': 1}, '?broken (unresolved)': {'KeyError': 1}}
+    assert result.skipped == 1
+
+    lines = format_replay_result(result)
+    assert lines[0].startswith("Replayed 3 invocation(s) of 2 command(s)")
+    assert "skipped 1" in lines[0]
+    assert "  Errors: ValueError: 1" in lines
+    assert lines[-2:] == ["?broken (unresolved)", "  Failed before invoking: KeyError: 1"]
+
+    # As fast as possible, one at a time
+    calls.clear()
+    result = await replay(invocations, make_context, speed=0)
+    assert len(calls) == 3
+    assert all(later - earlier >= 0.01 for (_, earlier), (_, later) in zip(calls, calls[1:]))
+
+    # Invocations recorded at the same time are held back past the concurrency limit
+    calls.clear()
+    burst = [RecordedInvocation(100.0, "?ping", 1, 2)] * 6
+    await replay(burst, make_context, speed=1.0, concurrency=2)
+    assert len(calls) == 6
+    assert calls[2][1] - calls[0][1] >= 0.01
+    assert calls[1][1] - calls[0][1] < 0.01
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.sync test
+~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from jishaku.sync import SyncHashStore, SyncScheduler, payload_hash
+
+
+def http_error(status: int, **headers: str):
+    return discord.HTTPException(SimpleNamespace(status=status, reason="", headers=headers), "")  # type: ignore
+
+
+def test_payload_hash():
+    payload = [{"name": "ping", "description": "Pong", "options": [{"name": "target", "type": 6}]}]
+    reordered = [{"options": [{"type": 6, "name": "target"}], "description": "Pong", "name": "ping"}]
+
+    assert payload_hash(payload) == payload_hash(reordered)
+    assert payload_hash(payload) != payload_hash([{**payload[0], "description": "Ping"}])
+    assert payload_hash([]) != payload_hash(payload)
+
+
+def test_sync_hash_store(tmp_path):
+    path = str(tmp_path / "sync.json")
+
+    store = SyncHashStore(path)
+    assert store.get(1, None) is None
+
+    store.set(1, None, "global-hash")
+    store.set(1, 100, "guild-hash")
+    store.set(2, 100, "other-bot-hash")
+    store.save()
+
+    loaded = SyncHashStore(path)
+    assert loaded.get(1, None) == "global-hash"
+    assert loaded.get(1, 100) == "guild-hash"
+    assert loaded.get(2, 100) == "other-bot-hash"
+    assert loaded.get(2, None) is None
+
+    loaded.discard(1, 100)
+    assert loaded.get(1, 100) is None
+
+    # Unreadable files start empty, and stores without a path never touch disk
+    (tmp_path / "broken.json").write_text("{")
+    assert not SyncHashStore(str(tmp_path / "broken.json")).hashes
+
+    memory = SyncHashStore()
+    memory.set(1, None, "hash")
+    memory.save()
+    assert memory.get(1, None) == "hash"
+
+
+@pytest.mark.asyncio
+async def test_sync_scheduler():
+    attempts = {}
+    running = []
+    peak = []
+
+    def job(target, errors):
+        async def attempt():
+            attempts[target] = attempts.get(target, 0) + 1
+            running.append(target)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(target)
+
+            if attempts[target] <= len(errors):
+                raise errors[attempts[target] - 1]
+            return target
+
+        return attempt
+
+    scheduler = SyncScheduler(concurrency=2, retries=2, backoff=0.01)
+    events = [event async for event in scheduler.run([
+        (None, job(None, [])),
+        (1, job(1, [http_error(503), OSError()])),
+        (2, job(2, [http_error(400)])),
+        (3, job(3, [http_error(500)] * 3)),
+    ])]
+
+    final = {event.target: event for event in events if event.status != 'retrying'}
+    assert final[None].status == 'synced' and final[None].result is None
+    assert final[1].status == 'synced' and final[1].attempt == 3
+    # Client errors aren't retried, and retries eventually run out
+    assert final[2].status == 'failed' and final[2].attempt == 1
+    assert final[3].status == 'failed' and final[3].attempt == 3
+    assert [event.delay for event in events if event.target == 1 and event.status == 'retrying'] == [0.01, 0.02]
+    assert max(peak) == 2
+
+
+@pytest.mark.asyncio
+async def test_sync_scheduler_rate_limit():
+    loop = asyncio.get_event_loop()
+    started = {}
+
+    async def limited():
+        if 'limited' not in started:
+            started['limited'] = loop.time()
+            raise http_error(429, **{'Retry-After': '0.2'})
+        return 'limited'
+
+    async def other():
+        await asyncio.sleep(0.05)
+        started['other'] = loop.time()
+        return 'other'
+
+    scheduler = SyncScheduler(concurrency=1)
+    events = [event async for event in scheduler.run([(1, limited), (2, other)])]
+
+    assert [event.status for event in events] == ['retrying', 'synced', 'synced']
+    assert events[0].delay == 0.2
+    # The other job waited out the rate limit, despite never being limited itself
+    assert started['other'] - started['limited'] >= 0.2
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""
+jishaku.tasks test
+~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2021 Devon (scarletcafe) R
+:license: MIT, see LICENSE for more details.
+
+"""
+
+import asyncio
+
+import pytest
+
+from jishaku.tasks import format_task_groups, format_task_stack, take_task_snapshot, task_growth
+
+
+async def leaky_inner(event: asyncio.Event):
+    await event.wait()
+
+
+async def leaky_outer(event: asyncio.Event):
+    await leaky_inner(event)
+
+
+@pytest.mark.asyncio
+async def test_task_inspection():
+    event = asyncio.Event()
+    before = take_task_snapshot()
+
+    tasks = [asyncio.ensure_future(leaky_outer(event)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    try:
+        # The stack follows the chain of awaits, not just the outermost coroutine
+        stack = format_task_stack(tasks[0])
+        assert [line.rsplit(' in ', 1)[1] for line in stack[:3]] == ['leaky_outer', 'leaky_inner', 'wait']
+        assert len(format_task_stack(tasks[0], limit=1)) == 1
+
+        after = take_task_snapshot()
+        assert after.counts['leaky_outer'] == 3
+        assert ('leaky_outer', 3, 3) in task_growth(before, after)
+
+        report = format_task_groups('leaky', stacks=2)
+        assert report[0] == f"3 of {after.total - 1} unfinished task(s), across 1 coroutine(s) matching 'leaky'"
+        assert "3 x leaky_outer" in report[2]
+        assert sum(1 for line in report if line.endswith("in leaky_inner")) == 2
+        assert format_task_groups()[0].startswith(f"{after.total - 1} unfinished task(s) across ")
+    finally:
+        event.set()
+        await asyncio.gather(*tasks)
+
+    assert not task_growth(before, take_task_snapshot())